@@ -0,0 +1,74 @@
+"""Time JSON report encoding on a synthetic 100k-row comparison.
+
+Usage: python examples/benchmark_json_encoding.py [ROWS]
+
+Reports encode time and throughput for each ``--json-style`` with the lazy result (rows
+pre-encoded from the snapshot) and with its plain-dict form (rows encoded by the flat-row
+backend: orjson when installed, else the stdlib), next to plain ``json.dumps``.
+"""
+
+import io
+import json
+import sys
+import time
+
+from package_comparison_tool.encoding import json_backend
+from package_comparison_tool.formatting import write_json
+from package_comparison_tool.result import CompareResult, PackageList
+from package_comparison_tool.snapshot import BranchSnapshot
+
+
+def synthetic_result(rows: int) -> CompareResult:
+    def _snapshot(branch: str, release: str) -> BranchSnapshot:
+        return BranchSnapshot.from_fields(
+            ((f"package-{i}", i % 3, f"{i % 17}.{i % 5}", release, ("x86_64", "noarch")[i % 2], 1700000000 + i, "")
+             for i in range(rows)),
+            branch=branch,
+        )
+
+    snap1, snap2 = _snapshot("sisyphus", "alt2"), _snapshot("p10", "alt1")
+    quarter = range(0, rows, 4)
+    return CompareResult(
+        branch1="sisyphus",
+        branch2="p10",
+        generated_at="2024-01-01T00:00:00+00:00",
+        buckets={
+            "packages_only_in_branch1": PackageList(snap1, quarter, branch="sisyphus"),
+            "packages_only_in_branch2": PackageList(snap2, range(1, rows, 4), branch="p10"),
+            "packages_with_higher_version_in_branch1": PackageList(snap1, range(2, rows, 4), branch="sisyphus"),
+            "packages_with_higher_version_in_branch2": PackageList(snap2, range(3, rows, 4), branch="p10"),
+        },
+        stats={"differences": rows},
+    )
+
+
+def _report(label: str, encode) -> None:
+    started = time.perf_counter()
+    size = len(encode().encode("utf8"))
+    elapsed = time.perf_counter() - started
+    print(f"{label:<42} {elapsed:7.3f}s {size / elapsed / 1e6:8.1f} MB/s {size / 1e6:8.1f} MB")
+
+
+def _written(result, style):
+    def _encode() -> str:
+        buffer = io.StringIO()
+        write_json(result, buffer, style=style)
+        return buffer.getvalue()
+
+    return _encode
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    lazy = synthetic_result(rows)
+    plain = lazy.to_dict()
+    print(f"{rows} rows, flat-row backend: {json_backend()}")
+    _report("json.dumps(indent=2, sort_keys=True)", lambda: json.dumps(plain, indent=2, sort_keys=True, ensure_ascii=False))
+    _report("json.dumps(compact, sort_keys=True)", lambda: json.dumps(plain, separators=(",", ":"), sort_keys=True, ensure_ascii=False))
+    for style in ("pretty", "compact"):
+        _report(f"write_json(lazy result, style={style})", _written(lazy, style))
+        _report(f"write_json(plain dicts, style={style})", _written(plain, style))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+import sys
+
+from package_comparison_tool.api import fetch_branch_snapshot, save_snapshot
+
+
+def main() -> None:
+    branch = sys.argv[1] if len(sys.argv) > 1 else input("Введите название ветки: ")
+    path = sys.argv[2] if len(sys.argv) > 2 else f"{branch}.snap"
+    snapshot = fetch_branch_snapshot(branch)
+    save_snapshot(snapshot, path)
+    print(f"Saved {len(snapshot)} packages of {branch} to {path}")
+    print(f"Compare offline with: package-comparison {branch} <other> --from-snapshot {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,581 @@
+"""asyncio-native fetch engine.
+
+Uses a minimal stdlib HTTP/1.1 client (``asyncio.open_connection``), so many branch fetches
+can share one event loop without a thread per request. Retry, timeout and header semantics
+follow the ``requests``-based engine in :mod:`package_comparison_tool.api`. Unlike that
+engine (a ``requests.Session``), this client:
+
+- does not follow redirects (a 3xx response is an error);
+- ignores proxy settings and other environment configuration (``HTTPS_PROXY``,
+  ``REQUESTS_CA_BUNDLE``, ``.netrc``);
+- verifies TLS with one shared default ``ssl`` context and takes no session, certificate or
+  adapter options;
+- opens one connection per request (``Connection: close``), with no keep-alive reuse.
+
+Use the sync engine (from threads) where any of these matter. CPU-bound work (filtering,
+indexing, diffing) runs in a worker thread, so comparisons do not stall the loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import ssl
+import zlib
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable, Mapping
+from contextlib import AsyncExitStack
+from re import Pattern
+from typing import Any, TypeVar
+from urllib.parse import urlencode, urlsplit
+
+from . import api
+from .api import DEFAULT_USER_AGENT, _iter_package_fields
+from .coalesce import SingleFlight, fetch_key
+from .compare import (
+    DiffEngine,
+    _check_engine,
+    _diff_branches,
+    _meta,
+    _name_filter,
+    _prepare_branch,
+    _prepare_snapshot,
+)
+from .exceptions import AltApiError, BranchNotFoundError, DeadlineExceededError
+from .models import PackageInfo
+from .result import CompareResult
+from .retry import RETRYABLE_STATUSES, Deadline, RetryBudget, RetryPolicy
+from .snapshot import BranchSnapshot, PackageFields
+from .streaming import DEFAULT_CHUNK_SIZE, PayloadParser
+from .version import VersionCache, use_version_cache
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+_TRANSPORT_ERRORS = (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, EOFError)
+_MAX_LINE = 64 * 1024
+_ssl_context: ssl.SSLContext | None = None
+
+
+def _default_ssl_context() -> ssl.SSLContext:
+    """The TLS context shared by every HTTPS request (loading CA certificates takes tens of ms)."""
+
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = ssl.create_default_context()
+    return _ssl_context
+
+
+class _AsyncResponse:
+    """Status, headers and a body reader for one HTTP/1.1 exchange."""
+
+    def __init__(
+        self,
+        *,
+        status: int,
+        reason: str,
+        headers: dict[str, str],
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        timeout_s: float,
+    ):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self._reader = reader
+        self._writer = writer
+        self._timeout_s = timeout_s
+        self._has_body = status not in (204, 304) and status >= 200
+
+    @property
+    def ok(self) -> bool:
+        return self.status < 400
+
+    async def _read(self, awaitable: Awaitable[T]) -> T:
+        return await asyncio.wait_for(awaitable, self._timeout_s)
+
+    async def _raw_chunks(self) -> AsyncIterator[bytes]:
+        if not self._has_body:
+            return
+
+        if "chunked" in self.headers.get("transfer-encoding", "").lower():
+            while True:
+                line = await self._read(self._reader.readline())
+                if not line:
+                    raise EOFError("connection closed inside chunked body")
+                try:
+                    size = int(line.split(b";", 1)[0].strip() or b"0", 16)
+                except ValueError:
+                    raise AltApiError(f"ALT RDB API sent a malformed chunk size: {line[:64]!r}") from None
+                if size == 0:
+                    while (await self._read(self._reader.readline())) not in (b"\r\n", b"\n", b""):
+                        pass  # discard trailers
+                    return
+                yield await self._read(self._reader.readexactly(size))
+                await self._read(self._reader.readline())
+            return
+
+        length = self.headers.get("content-length")
+        if length is not None:
+            try:
+                remaining = int(length)
+            except ValueError:
+                raise AltApiError(f"ALT RDB API sent a malformed Content-Length: {length[:64]!r}") from None
+            while remaining > 0:
+                data = await self._read(self._reader.read(min(remaining, DEFAULT_CHUNK_SIZE)))
+                if not data:
+                    raise EOFError("connection closed before the full body was received")
+                remaining -= len(data)
+                yield data
+            return
+
+        while data := await self._read(self._reader.read(DEFAULT_CHUNK_SIZE)):
+            yield data
+
+    async def iter_chunks(self) -> AsyncIterator[bytes]:
+        """Yield the decoded body (gzip/deflate content-encoding is undone)."""
+
+        encoding = self.headers.get("content-encoding", "").lower()
+        if encoding in ("gzip", "x-gzip"):
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == "deflate":
+            decompressor = zlib.decompressobj()
+        else:
+            async for chunk in self._raw_chunks():
+                yield chunk
+            return
+
+        async for chunk in self._raw_chunks():
+            if data := decompressor.decompress(chunk):
+                yield data
+        if tail := decompressor.flush():
+            yield tail
+
+    async def text(self) -> str:
+        parts = [chunk async for chunk in self.iter_chunks()]
+        return b"".join(parts).decode("utf8", errors="replace")
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+async def _http_get(url: str, *, headers: Mapping[str, str], timeout_s: float) -> _AsyncResponse:
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise AltApiError(f"Unsupported URL: {url}")
+
+    secure = parts.scheme == "https"
+    port = parts.port or (443 if secure else 80)
+    ssl_context = _default_ssl_context() if secure else None
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(parts.hostname, port, ssl=ssl_context, limit=_MAX_LINE),
+        timeout_s,
+    )
+
+    try:
+        target = parts.path or "/"
+        if parts.query:
+            target += f"?{parts.query}"
+        host = parts.hostname if parts.port is None else f"{parts.hostname}:{parts.port}"
+        request_headers = {"Host": host, "Accept-Encoding": "gzip, deflate", "Accept": "*/*"}
+        request_headers.update(headers)
+        request_headers["Connection"] = "close"
+
+        head = f"GET {target} HTTP/1.1\r\n" + "".join(f"{k}: {v}\r\n" for k, v in request_headers.items())
+        writer.write(head.encode("latin-1") + b"\r\n")
+        await asyncio.wait_for(writer.drain(), timeout_s)
+
+        status_line = await asyncio.wait_for(reader.readline(), timeout_s)
+        try:
+            _version, status, *reason = status_line.decode("latin-1").split(" ", 2)
+            status_code = int(status)
+        except ValueError as exc:
+            raise EOFError(f"malformed HTTP status line: {status_line!r}") from exc
+
+        response_headers: dict[str, str] = {}
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout_s)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            key = name.strip().lower()
+            value = value.strip()
+            response_headers[key] = f"{response_headers[key]}, {value}" if key in response_headers else value
+    except BaseException:
+        writer.close()
+        raise
+
+    return _AsyncResponse(
+        status=status_code,
+        reason=(reason[0].strip() if reason else ""),
+        headers=response_headers,
+        reader=reader,
+        writer=writer,
+        timeout_s=timeout_s,
+    )
+
+
+async def _request_with_retries(
+    url: str,
+    *,
+    timeout_s: float,
+    headers: Mapping[str, str],
+    policy: RetryPolicy,
+    budget: RetryBudget,
+    deadline: Deadline | None = None,
+) -> _AsyncResponse:
+    activity = f"fetching {url}"
+    attempt = 0
+    while True:
+        attempt += 1
+        attempt_timeout = deadline.timeout(timeout_s, activity) if deadline is not None else timeout_s
+        budget.record_attempt()
+        try:
+            response = await _http_get(url, headers=headers, timeout_s=attempt_timeout)
+        except _TRANSPORT_ERRORS as exc:
+            if deadline is not None and deadline.expired():
+                raise deadline.error(activity) from exc
+            delay = policy.next_delay(attempt, budget, deadline=deadline, activity=activity)
+            if delay is None:
+                raise AltApiError(f"Failed to fetch data from ALT RDB API: {exc!r}") from exc
+            logger.debug(
+                "Request to %s failed with %r (attempt %s/%s), retrying in %.2fs",
+                url,
+                exc,
+                attempt,
+                policy.max_attempts,
+                delay,
+            )
+        else:
+            if response.status not in RETRYABLE_STATUSES:
+                return response
+            try:
+                delay = policy.next_delay(
+                    attempt,
+                    budget,
+                    status=response.status,
+                    retry_after=response.headers.get("retry-after"),
+                    deadline=deadline,
+                    activity=activity,
+                )
+            except DeadlineExceededError:
+                response.close()
+                raise
+            if delay is None:
+                return response
+            logger.debug(
+                "ALT RDB API returned %s for %s (attempt %s/%s), retrying in %.2fs",
+                response.status,
+                url,
+                attempt,
+                policy.max_attempts,
+                delay,
+            )
+            response.close()
+
+        await asyncio.sleep(delay)
+
+
+async def _fetch_package_fields(
+    branch: str,
+    *,
+    timeout_s: float,
+    arches: set[str] | None,
+    max_packages: int | None,
+    user_agent: str | None,
+    headers: Mapping[str, str] | None,
+    retries: int,
+    retry_backoff: float,
+    retry_budget: RetryBudget | None,
+    deadline: Deadline | None,
+    semaphore: asyncio.Semaphore | None,
+    arch: str | None = None,
+    name_filter: Callable[[str], bool] | None = None,
+) -> list[PackageFields]:
+    if not branch:
+        raise ValueError("branch must be a non-empty string")
+
+    url = f"{api.ALT_RDB_API_BASE}/branch_binary_packages/{branch}"
+    if arch is not None:
+        url += f"?{urlencode({'arch': arch})}"
+    merged_headers = {"User-Agent": user_agent or DEFAULT_USER_AGENT}
+    if headers:
+        merged_headers.update(headers)
+
+    async with AsyncExitStack() as stack:
+        if semaphore is not None:
+            await stack.enter_async_context(semaphore)
+
+        response = await _request_with_retries(
+            url,
+            timeout_s=timeout_s,
+            headers=merged_headers,
+            policy=RetryPolicy(attempts=retries, backoff_factor=retry_backoff),
+            budget=retry_budget if retry_budget is not None else RetryBudget(),
+            deadline=deadline,
+        )
+        stack.callback(response.close)
+
+        if response.status == 404:
+            raise BranchNotFoundError(branch)
+        if not response.ok:
+            try:
+                snippet = (await response.text())[:200].replace("\n", " ")
+            except _TRANSPORT_ERRORS:
+                snippet = response.reason
+            raise AltApiError(f"ALT RDB API error {response.status} for {url}: {snippet}")
+
+        parser = PayloadParser()
+        rows: list[PackageFields] = []
+        try:
+            async for chunk in response.iter_chunks():
+                if deadline is not None:
+                    deadline.check(f"downloading {url}")
+                rows.extend(
+                    _iter_package_fields(parser.feed(chunk), arches=arches, max_packages=None, name_filter=name_filter)
+                )
+                if max_packages is not None and len(rows) >= max_packages:
+                    return rows[:max_packages]
+            rows.extend(
+                _iter_package_fields(parser.close(), arches=arches, max_packages=None, name_filter=name_filter)
+            )
+        except (*_TRANSPORT_ERRORS, zlib.error) as exc:
+            if deadline is not None and deadline.expired():
+                raise deadline.error(f"downloading {url}") from exc
+            raise AltApiError(f"Failed to fetch data from ALT RDB API: {exc!r}") from exc
+
+    return rows[:max_packages] if max_packages is not None else rows
+
+
+async def _gather_cancelling(*aws: Awaitable[T]) -> list[T]:
+    """Like ``asyncio.gather`` but cancels the remaining awaitables when one fails."""
+
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return list(await asyncio.gather(*tasks))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        with contextlib.suppress(BaseException):
+            await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def _fetch_branch_fields(
+    branch: str,
+    *,
+    arches: set[str] | None,
+    max_packages: int | None,
+    arch_query: bool,
+    **request_kwargs: Any,
+) -> list[PackageFields]:
+    """Fetch a branch, requesting each arch separately (and concurrently) when filtering."""
+
+    if not arches or not arch_query:
+        return await _fetch_package_fields(branch, arches=arches, max_packages=max_packages, **request_kwargs)
+
+    per_arch = await _gather_cancelling(
+        *(
+            _fetch_package_fields(branch, arches={arch}, max_packages=max_packages, arch=arch, **request_kwargs)
+            for arch in sorted(arches)
+        )
+    )
+    rows = [row for arch_rows in per_arch for row in arch_rows]
+    return rows[:max_packages] if max_packages is not None else rows
+
+
+async def fetch_branch_binary_packages_async(
+    branch: str,
+    *,
+    timeout_s: float = 30.0,
+    arches: set[str] | None = None,
+    max_packages: int | None = None,
+    user_agent: str | None = None,
+    headers: Mapping[str, str] | None = None,
+    retries: int = 3,
+    retry_backoff: float = 0.3,
+    retry_budget: RetryBudget | None = None,
+    deadline: Deadline | None = None,
+    semaphore: asyncio.Semaphore | None = None,
+    arch_query: bool = True,
+    name_filter: Callable[[str], bool] | None = None,
+    singleflight: SingleFlight[BranchSnapshot] | None = None,
+) -> list[PackageInfo]:
+    """Async counterpart of :func:`~package_comparison_tool.api.fetch_branch_binary_packages`.
+
+    The body is parsed incrementally as it arrives. ``semaphore`` bounds the number of
+    concurrent requests when shared between calls (e.g. across many comparisons). With
+    ``arches``, each arch is requested separately (``?arch=``) unless ``arch_query=False``.
+    Packages rejected by ``name_filter`` are skipped while parsing. ``singleflight`` shares
+    one download between concurrent identical calls, as in :func:`fetch_branch_snapshot_async`.
+    """
+
+    if singleflight is not None:
+        snapshot = await fetch_branch_snapshot_async(
+            branch,
+            timeout_s=timeout_s,
+            arches=arches,
+            max_packages=max_packages,
+            user_agent=user_agent,
+            headers=headers,
+            retries=retries,
+            retry_backoff=retry_backoff,
+            retry_budget=retry_budget,
+            deadline=deadline,
+            semaphore=semaphore,
+            arch_query=arch_query,
+            name_filter=name_filter,
+            singleflight=singleflight,
+        )
+        return snapshot.to_packages()
+
+    rows = await _fetch_branch_fields(
+        branch,
+        arches=arches,
+        max_packages=max_packages,
+        arch_query=arch_query,
+        timeout_s=timeout_s,
+        user_agent=user_agent,
+        headers=headers,
+        retries=retries,
+        retry_backoff=retry_backoff,
+        retry_budget=retry_budget,
+        deadline=deadline,
+        semaphore=semaphore,
+        name_filter=name_filter,
+    )
+    return [PackageInfo(*fields) for fields in rows]
+
+
+async def fetch_branch_snapshot_async(
+    branch: str,
+    *,
+    timeout_s: float = 30.0,
+    arches: set[str] | None = None,
+    max_packages: int | None = None,
+    user_agent: str | None = None,
+    headers: Mapping[str, str] | None = None,
+    retries: int = 3,
+    retry_backoff: float = 0.3,
+    retry_budget: RetryBudget | None = None,
+    deadline: Deadline | None = None,
+    semaphore: asyncio.Semaphore | None = None,
+    arch_query: bool = True,
+    name_filter: Callable[[str], bool] | None = None,
+    singleflight: SingleFlight[BranchSnapshot] | None = None,
+) -> BranchSnapshot:
+    """Async counterpart of :func:`~package_comparison_tool.api.fetch_branch_snapshot`.
+
+    With ``singleflight``, tasks on the same loop asking for the same branch concurrently
+    share one download; a cancelled waiter does not cancel it for the others.
+    """
+
+    async def _fetch() -> BranchSnapshot:
+        rows = await _fetch_branch_fields(
+            branch,
+            arches=arches,
+            max_packages=max_packages,
+            arch_query=arch_query,
+            timeout_s=timeout_s,
+            user_agent=user_agent,
+            headers=headers,
+            retries=retries,
+            retry_backoff=retry_backoff,
+            retry_budget=retry_budget,
+            deadline=deadline,
+            semaphore=semaphore,
+            name_filter=name_filter,
+        )
+        return BranchSnapshot.from_fields(rows, branch=branch)
+
+    if singleflight is None:
+        return await _fetch()
+
+    key = fetch_key(
+        branch,
+        arches=arches,
+        max_packages=max_packages,
+        arch_query=arch_query,
+        name_filter=name_filter,
+        headers={"User-Agent": user_agent or DEFAULT_USER_AGENT, **(headers or {})},
+    )
+    try:
+        return await singleflight.do_async(key, _fetch, timeout=None if deadline is None else deadline.remaining())
+    except TimeoutError:
+        if deadline is None:
+            raise
+        raise deadline.error(f"waiting for the in-flight fetch of {branch}") from None
+
+
+async def compare_packages_async(
+    branch1: str,
+    branch2: str,
+    *,
+    ignore_arch: bool = False,
+    arches: set[str] | None = None,
+    timeout_s: float = 30.0,
+    max_packages: int | None = None,
+    name_patterns: Iterable[Pattern[str]] | None = None,
+    user_agent: str | None = None,
+    headers: dict[str, str] | None = None,
+    retries: int = 3,
+    retry_backoff: float = 0.3,
+    max_total_retries: int | None = None,
+    deadline_s: float | None = None,
+    semaphore: asyncio.Semaphore | None = None,
+    snapshots: Mapping[str, BranchSnapshot] | None = None,
+    version_cache: VersionCache | None = None,
+    engine: DiffEngine = "hash",
+    singleflight: SingleFlight[BranchSnapshot] | None = None,
+) -> CompareResult:
+    """Async counterpart of :func:`~package_comparison_tool.compare.compare_packages`.
+
+    Both branches are fetched concurrently on the running loop; the result has the same
+    shape. Pass one ``semaphore`` to many calls to bound total concurrent requests, and one
+    ``singleflight`` to let concurrent calls share downloads of the same branch.
+    """
+
+    _check_engine(engine)
+    name_filter = _name_filter(name_patterns)
+    budget = RetryBudget(max_total_retries)
+    deadline = Deadline.after(deadline_s)
+    fetch_kwargs = dict(
+        timeout_s=timeout_s,
+        arches=arches,
+        max_packages=max_packages,
+        user_agent=user_agent,
+        headers=headers,
+        retries=retries,
+        retry_backoff=retry_backoff,
+        retry_budget=budget,
+        deadline=deadline,
+        semaphore=semaphore,
+        name_filter=name_filter,
+        singleflight=singleflight,
+    )
+
+    async def _fetch(branch: str) -> BranchSnapshot:
+        if snapshots and branch in snapshots:
+            return snapshots[branch]
+        return await fetch_branch_snapshot_async(branch, **fetch_kwargs)  # type: ignore[arg-type]
+
+    fetched1, fetched2 = await _gather_cancelling(_fetch(branch1), _fetch(branch2))
+
+    if deadline is not None:
+        deadline.check("comparing packages")
+
+    def _diff() -> CompareResult:
+        snap1 = _prepare_snapshot(fetched1, branch=branch1, name_filter=name_filter)
+        snap2 = _prepare_snapshot(fetched2, branch=branch2, name_filter=name_filter)
+        with use_version_cache(version_cache):
+            return _diff_branches(
+                _prepare_branch(branch1, snap1, ignore_arch=ignore_arch, engine=engine),
+                _prepare_branch(branch2, snap2, ignore_arch=ignore_arch, engine=engine),
+            )
+
+    # Indexing and diffing are CPU-bound; keep them off the loop.
+    result = await asyncio.to_thread(_diff)
+    result["meta"] = _meta(budget, None, version_cache)
+    return result
+
@@ -1,51 +1,70 @@
 from __future__ import annotations
 
+import contextvars
+import json
 import logging
 import time
-from collections.abc import Mapping
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import closing, nullcontext
+from itertools import chain, islice
+from typing import Any
+from urllib.parse import urlencode
 
 import requests
 from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 
-from . import __version__
-from .exceptions import AltApiError, BranchNotFoundError
+from . import __version__, profiling
+from .cache import CacheEntry, SnapshotCache
+from .coalesce import SingleFlight, fetch_key
+from .exceptions import AltApiError, BranchNotFoundError, DeadlineExceededError
+from .hedging import HedgeAfter, HedgeStats, parse_hedge_after
 from .models import PackageInfo
+from .profiling import StageProfiler, use_profiler
+from .retry import RETRYABLE_STATUSES, Deadline, RetryBudget, RetryPolicy
+from .snapshot import BranchSnapshot, PackageFields, load_snapshot, save_snapshot  # noqa: F401
+from .streaming import DEFAULT_CHUNK_SIZE, iter_payload_packages
 
 ALT_RDB_API_BASE = "https://rdb.altlinux.org/api/export"
 DEFAULT_USER_AGENT = f"package-comparison-tool/{__version__}"
-RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
 
 logger = logging.getLogger(__name__)
 
 
 def create_session(*, user_agent: str | None = None, retries: int = 3) -> requests.Session:
-    """Create a requests.Session with basic retry configuration.
+    """Create a requests.Session for talking to the ALT RDB API.
 
     This function is part of the public API; callers own the returned session and must close it.
+    The session does not retry on its own: the fetch functions own every attempt (see
+    :class:`~package_comparison_tool.retry.RetryPolicy`), so ``retries`` is accepted only for
+    backwards compatibility.
     """
 
     session = requests.Session()
     if user_agent:
         session.headers.update({"User-Agent": user_agent})
 
-    retry = Retry(
-        total=retries,
-        connect=retries,
-        read=retries,
-        status=retries,
-        backoff_factor=0.3,
-        status_forcelist=RETRYABLE_STATUSES,
-        allowed_methods=frozenset({"GET"}),
-        raise_on_status=False,
-    )
-
-    adapter = HTTPAdapter(max_retries=retry)
+    adapter = HTTPAdapter(max_retries=0)
     session.mount("https://", adapter)
     session.mount("http://", adapter)
     return session
 
 
+def _clone_session(base: requests.Session) -> requests.Session:
+    """Create a lightweight copy of a requests.Session for safe parallel use."""
+
+    clone = requests.Session()
+    clone.headers.update(base.headers)
+    clone.cookies.update(base.cookies)
+    clone.auth = base.auth
+    clone.verify = base.verify
+    clone.cert = base.cert
+    clone.proxies = dict(base.proxies)
+    clone.trust_env = base.trust_env
+
+    return clone
+
+
 def _merge_headers(
     session: requests.Session | None,
     *,
@@ -65,53 +84,184 @@ def _merge_headers(
     return merged
 
 
-def _sleep_backoff(attempt: int, backoff_factor: float) -> None:
-    delay = backoff_factor * (2 ** (attempt - 1))
-    time.sleep(delay)
+def _discard_response(future: Future[requests.Response]) -> None:
+    if future.exception() is None:
+        future.result().close()
 
 
-def _request_with_retries(
+def _hedged_get(
     session: requests.Session,
     url: str,
     *,
     timeout_s: float,
     headers: Mapping[str, str] | None,
-    retries: int,
-    backoff_factor: float,
+    hedge: HedgeStats,
 ) -> requests.Response:
-    attempts = max(1, retries)
-    last_exc: requests.RequestException | None = None
+    """GET ``url``, racing a second request on a fresh connection if headers are slow.
 
-    for attempt in range(1, attempts + 1):
+    Both requests stream, so a request is "done" as soon as its headers arrive. The first
+    successful response wins; the other one is closed when it completes (blocking socket
+    reads cannot be interrupted). The hedge uses a cloned session, never the caller's.
+    """
+
+    started = time.monotonic()
+    pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="altpkg-hedge")
+    try:
+        first = pool.submit(session.get, url, timeout=timeout_s, headers=headers, stream=True)
+        futures = [first]
+        delay = hedge.delay()
+        if not wait(futures, timeout=delay).done:
+            logger.debug("No response headers from %s after %.2fs, sending hedged request", url, delay)
+            hedge.record_hedge()
+            hedge_session = _clone_session(session)
+            second = pool.submit(hedge_session.get, url, timeout=timeout_s, headers=headers, stream=True)
+            second.add_done_callback(lambda _f: hedge_session.close())
+            futures.append(second)
+
+        winner: Future[requests.Response] | None = None
+        error: BaseException | None = None
+        pending = set(futures)
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                exc = future.exception()
+                if exc is None and winner is None:
+                    winner = future
+                elif exc is not None and error is None:
+                    error = exc
+
+        for future in futures:
+            if future is not winner:
+                future.add_done_callback(_discard_response)
+
+        if winner is None:
+            assert error is not None
+            raise error
+
+        hedge.record_request(time.monotonic() - started)
+        if winner is not first:
+            hedge.record_hedge_win()
+        return winner.result()
+    finally:
+        pool.shutdown(wait=False)
+
+
+def _request_with_retries(
+    session: requests.Session,
+    url: str,
+    *,
+    timeout_s: float,
+    headers: Mapping[str, str] | None,
+    policy: RetryPolicy,
+    budget: RetryBudget,
+    stream: bool = False,
+    deadline: Deadline | None = None,
+    hedge: HedgeStats | None = None,
+) -> requests.Response:
+    activity = f"fetching {url}"
+    attempt = 0
+    while True:
+        attempt += 1
+        attempt_timeout = deadline.timeout(timeout_s, activity) if deadline is not None else timeout_s
+        budget.record_attempt()
         try:
-            response = session.get(url, timeout=timeout_s, headers=headers)
-            if response.status_code in RETRYABLE_STATUSES and attempt < attempts:
-                logger.debug(
-                    "ALT RDB API returned %s for %s (attempt %s/%s), retrying",
-                    response.status_code,
-                    url,
-                    attempt,
-                    attempts,
-                )
-                response.close()
-                _sleep_backoff(attempt, backoff_factor)
-                continue
-            return response
+            if hedge is not None:
+                response = _hedged_get(session, url, timeout_s=attempt_timeout, headers=headers, hedge=hedge)
+            else:
+                response = session.get(url, timeout=attempt_timeout, headers=headers, stream=stream)
         except (requests.Timeout, requests.ConnectionError) as exc:
-            last_exc = exc
-            if attempt < attempts:
-                logger.debug("Request to %s failed with %s (attempt %s/%s), retrying", url, exc, attempt, attempts)
-                _sleep_backoff(attempt, backoff_factor)
-                continue
-            raise AltApiError(f"Failed to fetch data from ALT RDB API: {exc}") from exc
+            if deadline is not None and deadline.expired():
+                raise deadline.error(activity) from exc
+            delay = policy.next_delay(attempt, budget, deadline=deadline, activity=activity)
+            if delay is None:
+                raise AltApiError(f"Failed to fetch data from ALT RDB API: {exc}") from exc
+            logger.debug(
+                "Request to %s failed with %s (attempt %s/%s), retrying in %.2fs",
+                url,
+                exc,
+                attempt,
+                policy.max_attempts,
+                delay,
+            )
         except requests.RequestException as exc:  # other request errors are not retried
-            last_exc = exc
             raise AltApiError(f"Failed to fetch data from ALT RDB API: {exc}") from exc
+        else:
+            if response.status_code not in RETRYABLE_STATUSES:
+                return response
+            try:
+                delay = policy.next_delay(
+                    attempt,
+                    budget,
+                    status=response.status_code,
+                    retry_after=response.headers.get("Retry-After"),
+                    deadline=deadline,
+                    activity=activity,
+                )
+            except DeadlineExceededError:
+                response.close()
+                raise
+            if delay is None:
+                return response
+            logger.debug(
+                "ALT RDB API returned %s for %s (attempt %s/%s), retrying in %.2fs",
+                response.status_code,
+                url,
+                attempt,
+                policy.max_attempts,
+                delay,
+            )
+            response.close()
+
+        time.sleep(delay)
+
+
+def _check_response(response: requests.Response, *, branch: str, url: str) -> None:
+    if response.status_code == 404:
+        raise BranchNotFoundError(branch)
 
-    # If we ever exit the loop without returning/raising above
-    if last_exc is not None:
-        raise AltApiError(f"Failed to fetch data from ALT RDB API: {last_exc}") from last_exc
-    raise AltApiError("Failed to fetch data from ALT RDB API: unknown error")
+    if not response.ok:
+        # Retryable statuses were retried already; reaching here means we ran out of attempts.
+        snippet = response.text[:200].replace("\n", " ")
+        raise AltApiError(f"ALT RDB API error {response.status_code} for {url}: {snippet}")
+
+
+def _request_cached(
+    session: requests.Session,
+    url: str,
+    *,
+    cache: SnapshotCache,
+    timeout_s: float,
+    headers: Mapping[str, str],
+    policy: RetryPolicy,
+    budget: RetryBudget,
+    stream: bool = False,
+    deadline: Deadline | None = None,
+    hedge: HedgeStats | None = None,
+) -> tuple[CacheEntry | None, requests.Response | None]:
+    """Return either a cache entry to serve from or a live response to read and store."""
+
+    entry = cache.lookup(url)
+    if entry is not None and cache.is_fresh(entry):
+        logger.debug("Serving %s from cache (fresh)", url)
+        return entry, None
+
+    response = _request_with_retries(
+        session,
+        url,
+        timeout_s=timeout_s,
+        headers={**headers, **cache.validators(entry)},
+        policy=policy,
+        budget=budget,
+        stream=stream,
+        deadline=deadline,
+        hedge=hedge,
+    )
+    if response.status_code == 304 and entry is not None:
+        logger.debug("Serving %s from cache (not modified)", url)
+        response.close()
+        return cache.revalidated(entry), None
+
+    return None, response
 
 
 def fetch_branch_binary_packages(
@@ -125,6 +275,15 @@ def fetch_branch_binary_packages(
     headers: Mapping[str, str] | None = None,
     retries: int = 3,
     retry_backoff: float = 0.3,
+    stream: bool = False,
+    cache: SnapshotCache | None = None,
+    retry_budget: RetryBudget | None = None,
+    deadline: Deadline | None = None,
+    hedge_after_s: HedgeAfter | None = None,
+    hedge_stats: HedgeStats | None = None,
+    arch_query: bool = True,
+    name_filter: Callable[[str], bool] | None = None,
+    singleflight: SingleFlight[BranchSnapshot] | None = None,
 ) -> list[PackageInfo]:
     """Fetch binary packages for a branch from the ALT RDB API.
 
@@ -132,70 +291,389 @@ def fetch_branch_binary_packages(
     Caller-owned sessions are never closed. Headers are merged per request (session headers,
     then ``user_agent`` if provided, then explicit ``headers`` override everything) so
     user agents are honored even with custom sessions. Retry/backoff applies to timeouts,
-    connection errors, and 5xx/429 responses.
+    connection errors, and 5xx/429 responses: each request is tried at most ``retries`` times,
+    with full-jitter exponential backoff based on ``retry_backoff`` and ``Retry-After`` honored
+    on 429/503. Passing a shared ``retry_budget`` caps and counts retries across calls.
+    ``deadline`` bounds the whole fetch: attempt timeouts are clamped to the time left and
+    :class:`~package_comparison_tool.exceptions.DeadlineExceededError` is raised once it is spent.
+    ``hedge_after_s`` (seconds, or ``"auto"`` for the p95 of recent fetches) enables hedged
+    requests: when an attempt has no response headers after that delay, an identical request
+    is raced against it on a fresh connection. Pass ``hedge_stats`` to share hedge settings and
+    counters between calls.
+
+    With ``stream=True`` the body is parsed incrementally (see
+    :func:`iter_branch_binary_packages`) instead of being decoded as one JSON document.
+
+    ``name_filter`` (e.g. a :class:`~package_comparison_tool.filters.NameFilter`) is applied
+    while parsing: packages whose name it rejects are skipped before any object is built,
+    and they do not count towards ``max_packages``.
+
+    With ``arches``, the export endpoint is asked for each arch separately (``?arch=``) and
+    the arches are fetched concurrently and merged, so only matching packages are downloaded.
+    Rows are still filtered locally in case the server ignores the parameter; pass
+    ``arch_query=False`` to download the whole branch and filter on the client only.
+
+    When ``cache`` is given, the raw payload is stored on disk and later calls either serve
+    it directly (within the cache TTL) or revalidate it with a conditional GET.
+
+    With ``singleflight``, concurrent calls for the same branch, arch filter, name filter,
+    ``max_packages`` and request headers share one download (see :func:`fetch_branch_snapshot`);
+    each caller still gets its own list.
+    """
+    if singleflight is not None:
+        snapshot = fetch_branch_snapshot(
+            branch,
+            session=session,
+            timeout_s=timeout_s,
+            arches=arches,
+            max_packages=max_packages,
+            user_agent=user_agent,
+            headers=headers,
+            retries=retries,
+            retry_backoff=retry_backoff,
+            stream=stream,
+            cache=cache,
+            retry_budget=retry_budget,
+            deadline=deadline,
+            hedge_after_s=hedge_after_s,
+            hedge_stats=hedge_stats,
+            arch_query=arch_query,
+            name_filter=name_filter,
+            singleflight=singleflight,
+        )
+        return snapshot.to_packages()
+
+    fields = _iter_branch_fields(
+        branch,
+        arches=arches,
+        max_packages=max_packages,
+        arch_query=arch_query,
+        name_filter=name_filter,
+        session=session,
+        timeout_s=timeout_s,
+        user_agent=user_agent,
+        headers=headers,
+        retries=retries,
+        retry_backoff=retry_backoff,
+        stream=stream,
+        cache=cache,
+        retry_budget=retry_budget,
+        deadline=deadline,
+        hedge_after_s=hedge_after_s,
+        hedge_stats=hedge_stats,
+    )
+    return [PackageInfo(*row) for row in fields]
+
+
+def iter_branch_binary_packages(
+    branch: str,
+    *,
+    session: requests.Session | None = None,
+    timeout_s: float = 30.0,
+    arches: set[str] | None = None,
+    max_packages: int | None = None,
+    user_agent: str | None = None,
+    headers: Mapping[str, str] | None = None,
+    retries: int = 3,
+    retry_backoff: float = 0.3,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    cache: SnapshotCache | None = None,
+    retry_budget: RetryBudget | None = None,
+    deadline: Deadline | None = None,
+    hedge_after_s: HedgeAfter | None = None,
+    hedge_stats: HedgeStats | None = None,
+    arch_query: bool = True,
+    name_filter: Callable[[str], bool] | None = None,
+) -> Iterator[PackageInfo]:
+    """Stream binary packages for a branch, yielding each package as soon as it is parsed.
+
+    The response is read in ``chunk_size`` pieces, so memory scales with a single package
+    rather than the whole branch. The arch filter and ``max_packages`` are applied while
+    streaming; reaching ``max_packages`` stops the download. Session, header and retry
+    semantics match :func:`fetch_branch_binary_packages`. Closing the generator early
+    releases the connection (and the internal session, if one was created). With ``cache``,
+    the body is written to disk while streaming and committed once fully read. With several
+    ``arches`` (and ``arch_query``), each arch is downloaded concurrently and buffered before
+    its packages are yielded.
     """
+    fields = _iter_branch_fields(
+        branch,
+        arches=arches,
+        max_packages=max_packages,
+        arch_query=arch_query,
+        name_filter=name_filter,
+        session=session,
+        timeout_s=timeout_s,
+        user_agent=user_agent,
+        headers=headers,
+        retries=retries,
+        retry_backoff=retry_backoff,
+        stream=True,
+        chunk_size=chunk_size,
+        cache=cache,
+        retry_budget=retry_budget,
+        deadline=deadline,
+        hedge_after_s=hedge_after_s,
+        hedge_stats=hedge_stats,
+    )
+    for row in fields:
+        yield PackageInfo(*row)
+
+
+def fetch_branch_snapshot(
+    branch: str,
+    *,
+    session: requests.Session | None = None,
+    timeout_s: float = 30.0,
+    arches: set[str] | None = None,
+    max_packages: int | None = None,
+    user_agent: str | None = None,
+    headers: Mapping[str, str] | None = None,
+    retries: int = 3,
+    retry_backoff: float = 0.3,
+    stream: bool = True,
+    cache: SnapshotCache | None = None,
+    retry_budget: RetryBudget | None = None,
+    deadline: Deadline | None = None,
+    hedge_after_s: HedgeAfter | None = None,
+    hedge_stats: HedgeStats | None = None,
+    arch_query: bool = True,
+    name_filter: Callable[[str], bool] | None = None,
+    singleflight: SingleFlight[BranchSnapshot] | None = None,
+    profiler: StageProfiler | None = None,
+) -> BranchSnapshot:
+    """Fetch a branch straight into a columnar :class:`BranchSnapshot`.
+
+    Accepts the same options as :func:`fetch_branch_binary_packages`, but never creates
+    per-package objects. The body is streamed by default.
+
+    ``singleflight`` coalesces concurrent identical fetches: the first caller downloads the
+    branch and callers arriving meanwhile (from any thread) wait for it and receive the same
+    snapshot, which must therefore be treated as read-only. Retries, hedging and the cache
+    follow the options of the caller that runs the download; waiters only bound their wait
+    by their own ``deadline``.
+
+    ``profiler`` (default: the active one, see :func:`~package_comparison_tool.profiling.use_profiler`)
+    records the request, download and parse stages and the bytes and packages of the branch.
+    """
+
+    def _fetch() -> BranchSnapshot:
+        with use_profiler(profiler) if profiler is not None else nullcontext():
+            return _fetch_profiled()
+
+    def _fetch_profiled() -> BranchSnapshot:
+        fields = _iter_branch_fields(
+            branch,
+            arches=arches,
+            max_packages=max_packages,
+            arch_query=arch_query,
+            name_filter=name_filter,
+            session=session,
+            timeout_s=timeout_s,
+            user_agent=user_agent,
+            headers=headers,
+            retries=retries,
+            retry_backoff=retry_backoff,
+            stream=stream,
+            cache=cache,
+            retry_budget=retry_budget,
+            deadline=deadline,
+            hedge_after_s=hedge_after_s,
+            hedge_stats=hedge_stats,
+        )
+        with profiling.stage("parse", branch=branch):
+            snapshot = BranchSnapshot.from_fields(fields, branch=branch)
+        profiling.count(branch, "packages_parsed", len(snapshot))
+        return snapshot
+
+    if singleflight is None:
+        return _fetch()
+
+    key = fetch_key(
+        branch,
+        arches=arches,
+        max_packages=max_packages,
+        arch_query=arch_query,
+        name_filter=name_filter,
+        headers=_merge_headers(session, user_agent=user_agent, headers=headers),
+    )
+    try:
+        return singleflight.do(key, _fetch, timeout=None if deadline is None else deadline.remaining())
+    except TimeoutError:
+        if deadline is None:
+            raise
+        raise deadline.error(f"waiting for the in-flight fetch of {branch}") from None
+
+
+def _iter_branch_fields(
+    branch: str,
+    *,
+    arches: set[str] | None,
+    max_packages: int | None,
+    arch_query: bool,
+    session: requests.Session | None,
+    name_filter: Callable[[str], bool] | None = None,
+    **request_kwargs: Any,
+) -> Iterator[PackageFields]:
+    """Yield validated package fields, letting the server filter by arch when asked to."""
+
+    if not arches or not arch_query:
+        raw = _iter_raw_packages(branch, session=session, **request_kwargs)
+        yield from _iter_package_fields(raw, arches=arches, max_packages=max_packages, name_filter=name_filter)
+        return
+
+    ordered = sorted(arches)
+    if len(ordered) == 1:
+        raw = _iter_raw_packages(branch, session=session, arch=ordered[0], **request_kwargs)
+        yield from _iter_package_fields(raw, arches=arches, max_packages=max_packages, name_filter=name_filter)
+        return
+
+    def _fetch(arch: str) -> list[PackageFields]:
+        # Each worker gets its own session; caller-owned sessions are cloned, never shared.
+        with closing(_clone_session(session)) if session is not None else nullcontext() as sess:
+            raw = _iter_raw_packages(branch, session=sess, arch=arch, **request_kwargs)
+            with profiling.stage("parse", branch=branch):
+                return list(_iter_package_fields(raw, arches={arch}, max_packages=max_packages, name_filter=name_filter))
+
+    context = contextvars.copy_context()  # carries the active profiler into the workers
+    with ThreadPoolExecutor(max_workers=len(ordered)) as pool, profiling.stage("fetch_wait", branch=branch):
+        per_arch = list(pool.map(lambda arch: context.copy().run(_fetch, arch), ordered))
+    yield from islice(chain.from_iterable(per_arch), max_packages)
+
+
+def _iter_raw_packages(
+    branch: str,
+    *,
+    session: requests.Session | None,
+    timeout_s: float,
+    user_agent: str | None,
+    headers: Mapping[str, str] | None,
+    retries: int,
+    retry_backoff: float,
+    stream: bool,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    cache: SnapshotCache | None = None,
+    retry_budget: RetryBudget | None = None,
+    deadline: Deadline | None = None,
+    hedge_after_s: HedgeAfter | None = None,
+    hedge_stats: HedgeStats | None = None,
+    arch: str | None = None,
+) -> Iterator[object]:
+    """Yield raw entries of the branch's ``packages`` list (from the network or the cache)."""
+
     if not branch:
         raise ValueError("branch must be a non-empty string")
 
     url = f"{ALT_RDB_API_BASE}/branch_binary_packages/{branch}"
+    if arch is not None:
+        url += f"?{urlencode({'arch': arch})}"
     resolved_user_agent = user_agent or DEFAULT_USER_AGENT
+    hedge = hedge_stats
+    if hedge is None and hedge_after_s is not None:
+        hedge = HedgeStats(parse_hedge_after(hedge_after_s))  # type: ignore[arg-type]
 
-    def _fetch_with_session(sess: requests.Session) -> list[PackageInfo]:
+    def _iter_with_session(sess: requests.Session) -> Iterator[object]:
         merged_headers = _merge_headers(sess, user_agent=resolved_user_agent, headers=headers)
-        response = _request_with_retries(
-            sess,
-            url,
+        request_kwargs = dict(
             timeout_s=timeout_s,
-            headers=merged_headers,
-            retries=retries,
-            backoff_factor=retry_backoff,
+            policy=RetryPolicy(attempts=retries, backoff_factor=retry_backoff),
+            budget=retry_budget if retry_budget is not None else RetryBudget(),
+            stream=stream,
+            deadline=deadline,
+            hedge=hedge,
         )
 
-        if response.status_code == 404:
-            raise BranchNotFoundError(branch)
-
-        if response.status_code in RETRYABLE_STATUSES and retries > 1:
-            # All retryable statuses should have been retried above; reaching here means we ran out of attempts.
-            snippet = response.text[:200].replace("\n", " ")
-            raise AltApiError(f"ALT RDB API error {response.status_code} for {url}: {snippet}")
-
-        if not response.ok:
-            snippet = response.text[:200].replace("\n", " ")
-            raise AltApiError(f"ALT RDB API error {response.status_code} for {url}: {snippet}")
+        if cache is not None:
+            with profiling.stage("request", branch=branch):
+                entry, response = _request_cached(sess, url, cache=cache, headers=merged_headers, **request_kwargs)  # type: ignore[arg-type]
+            if response is None:
+                assert entry is not None
+                if stream:
+                    chunks = profiling.timed_chunks(
+                        cache.iter_chunks(entry, chunk_size), name="cache_read", branch=branch, counter="bytes_cached"
+                    )
+                    yield from iter_payload_packages(chunks)
+                else:
+                    yield from _payload_packages(_loads_payload(cache.read_bytes(entry)))
+                return
+        else:
+            with profiling.stage("request", branch=branch):
+                response = _request_with_retries(sess, url, headers=merged_headers, **request_kwargs)  # type: ignore[arg-type]
 
         try:
-            payload = response.json()
-        except ValueError as exc:
-            raise AltApiError("ALT RDB API returned invalid JSON response") from exc
+            _check_response(response, branch=branch, url=url)
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
 
-        return _parse_packages_payload(payload, branch=branch, arches=arches, max_packages=max_packages)
+            if stream:
+                chunks = profiling.timed_chunks(
+                    response.iter_content(chunk_size=chunk_size), name="download", branch=branch, counter="bytes_downloaded"
+                )
+                if deadline is not None:
+                    chunks = deadline.iter_checked(chunks, f"downloading {url}")
+                if cache is not None:
+                    chunks = cache.tee(url, chunks, etag=etag, last_modified=last_modified)
+                yield from iter_payload_packages(chunks)
+                return
+
+            profiling.count(branch, "bytes_downloaded", len(response.content))  # already read by the request
+            if cache is not None:
+                body = response.content
+                cache.store(url, body, etag=etag, last_modified=last_modified)
+                payload = _loads_payload(body)
+            else:
+                try:
+                    payload = response.json()
+                except ValueError as exc:
+                    raise AltApiError("ALT RDB API returned invalid JSON response") from exc
+
+            yield from _payload_packages(payload)
+        except requests.RequestException as exc:
+            if deadline is not None and deadline.expired():
+                raise deadline.error(f"downloading {url}") from exc
+            raise AltApiError(f"Failed to fetch data from ALT RDB API: {exc}") from exc
+        finally:
+            response.close()
 
     if session is None:
         with create_session(user_agent=resolved_user_agent, retries=retries) as sess:
-            return _fetch_with_session(sess)
+            yield from _iter_with_session(sess)
+        return
 
-    return _fetch_with_session(session)
+    yield from _iter_with_session(session)
 
 
-def _parse_packages_payload(
-    payload: dict[str, object] | list[object],
-    *,
-    branch: str,
-    arches: set[str] | None,
-    max_packages: int | None,
-) -> list[PackageInfo]:
+def _loads_payload(body: bytes) -> object:
+    try:
+        return json.loads(body)
+    except ValueError as exc:
+        raise AltApiError("ALT RDB API returned invalid JSON response") from exc
+
+
+def _payload_packages(payload: object) -> list[object]:
     packages_raw = payload.get("packages", []) if isinstance(payload, dict) else []
     if not isinstance(packages_raw, list):
         raise AltApiError("Unexpected ALT RDB API response shape: 'packages' is not a list")
+    return packages_raw
 
-    def to_int(value: object, *, field: str) -> int:
-        try:
-            return int(value)  # type: ignore[arg-type]
-        except Exception as exc:  # noqa: BLE001
-            raise AltApiError(f"Invalid {field} value in API payload: {value!r}") from exc
 
-    result: list[PackageInfo] = []
+def _to_int(value: object, *, field: str) -> int:
+    try:
+        return int(value)  # type: ignore[arg-type]
+    except Exception as exc:  # noqa: BLE001
+        raise AltApiError(f"Invalid {field} value in API payload: {value!r}") from exc
+
 
+def _iter_package_fields(
+    packages_raw: Iterable[object],
+    *,
+    arches: set[str] | None,
+    max_packages: int | None,
+    name_filter: Callable[[str], bool] | None = None,
+) -> Iterator[PackageFields]:
+    """Validate raw package entries and yield their fields in :class:`PackageInfo` order."""
+
+    count = 0
     for pkg in packages_raw:
         if not isinstance(pkg, dict):
             continue
@@ -204,22 +682,36 @@ def _parse_packages_payload(
         if arches and arch not in arches:
             continue
 
-        result.append(
-            PackageInfo(
-                name=str(pkg.get("name", "")),
-                epoch=to_int(pkg.get("epoch", 0), field="epoch"),
-                version=str(pkg.get("version", "")),
-                release=str(pkg.get("release", "")),
-                arch=arch,
-                buildtime=to_int(pkg.get("buildtime", 0), field="buildtime"),
-                disttag=str(pkg.get("disttag", "")),
-            )
+        name = str(pkg.get("name", ""))
+        if name_filter is not None and not name_filter(name):
+            continue
+
+        yield (
+            name,
+            _to_int(pkg.get("epoch", 0), field="epoch"),
+            str(pkg.get("version", "")),
+            str(pkg.get("release", "")),
+            arch,
+            _to_int(pkg.get("buildtime", 0), field="buildtime"),
+            str(pkg.get("disttag", "")),
         )
 
-        if max_packages is not None and len(result) >= max_packages:
-            break
+        count += 1
+        if max_packages is not None and count >= max_packages:
+            return
+
 
-    return result
+def _parse_packages_payload(
+    payload: dict[str, object] | list[object],
+    *,
+    branch: str,
+    arches: set[str] | None,
+    max_packages: int | None,
+    name_filter: Callable[[str], bool] | None = None,
+) -> list[PackageInfo]:
+    packages_raw = _payload_packages(payload)
+    fields = _iter_package_fields(packages_raw, arches=arches, max_packages=max_packages, name_filter=name_filter)
+    return [PackageInfo(*row) for row in fields]
 
 
 def get_branch_binary_packages(branch: str) -> dict[str, list[dict[str, object]]]:
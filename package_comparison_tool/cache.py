@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+DEFAULT_CACHE_TTL_S = 300.0
+DEFAULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+_READ_CHUNK_SIZE = 64 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+def default_cache_dir() -> Path:
+    """Return the per-user cache directory (``$XDG_CACHE_HOME/package-comparison-tool``)."""
+
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "package-comparison-tool"
+
+
+@dataclass(frozen=True, slots=True)
+class CacheEntry:
+    url: str
+    body_path: Path
+    size: int
+    fetched_at: float
+    etag: str | None = None
+    last_modified: str | None = None
+
+
+class SnapshotCache:
+    """On-disk cache of raw branch payloads keyed by request URL.
+
+    Entries younger than ``ttl_s`` are served without touching the network. Older entries
+    are revalidated with ``If-None-Match``/``If-Modified-Since``; a 304 answer refreshes the
+    entry and serves the stored body. Total body size is kept under ``max_bytes`` by evicting
+    least recently used entries. Writes are atomic, so several processes may share a directory.
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike[str] | None = None,
+        *,
+        ttl_s: float = DEFAULT_CACHE_TTL_S,
+        max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+    ):
+        self.directory = Path(directory) if directory is not None else default_cache_dir()
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+
+    def _paths(self, url: str) -> tuple[Path, Path]:
+        digest = hashlib.sha256(url.encode("utf8")).hexdigest()[:32]
+        return self.directory / f"{digest}.body", self.directory / f"{digest}.json"
+
+    def lookup(self, url: str) -> CacheEntry | None:
+        body_path, meta_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf8"))
+            size = body_path.stat().st_size
+        except (OSError, ValueError):
+            return None
+
+        if not isinstance(meta, dict) or meta.get("url") != url or meta.get("size") != size:
+            return None
+
+        return CacheEntry(
+            url=url,
+            body_path=body_path,
+            size=size,
+            fetched_at=float(meta.get("fetched_at", 0.0)),
+            etag=meta.get("etag"),
+            last_modified=meta.get("last_modified"),
+        )
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return time.time() - entry.fetched_at < self.ttl_s
+
+    @staticmethod
+    def validators(entry: CacheEntry | None) -> dict[str, str]:
+        """Conditional request headers for revalidating ``entry``."""
+
+        headers: dict[str, str] = {}
+        if entry is None:
+            return headers
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def revalidated(self, entry: CacheEntry) -> CacheEntry:
+        """Record a successful 304 revalidation, restarting the entry's TTL."""
+
+        updated = replace(entry, fetched_at=time.time())
+        self._write_meta(updated)
+        return updated
+
+    def read_bytes(self, entry: CacheEntry) -> bytes:
+        self._touch(entry)
+        return entry.body_path.read_bytes()
+
+    def iter_chunks(self, entry: CacheEntry, chunk_size: int = _READ_CHUNK_SIZE) -> Iterator[bytes]:
+        self._touch(entry)
+        with open(entry.body_path, "rb") as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+    def store(self, url: str, body: bytes, *, etag: str | None, last_modified: str | None) -> CacheEntry:
+        gen = self._commit_iter(url, [body], etag=etag, last_modified=last_modified)
+        try:
+            while True:
+                next(gen)
+        except StopIteration as stop:
+            return stop.value
+
+    def tee(
+        self,
+        url: str,
+        chunks: Iterable[bytes],
+        *,
+        etag: str | None,
+        last_modified: str | None,
+    ) -> Iterator[bytes]:
+        """Yield ``chunks`` while writing them to the cache.
+
+        The entry is committed only if the iterator is fully consumed; abandoned or failed
+        downloads never replace a good entry.
+        """
+
+        yield from self._commit_iter(url, chunks, etag=etag, last_modified=last_modified)
+
+    def _commit_iter(
+        self, url: str, chunks: Iterable[bytes], *, etag: str | None, last_modified: str | None
+    ) -> Iterator[bytes]:
+        body_path, _meta_path = self._paths(url)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        committed = False
+        try:
+            size = 0
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+                    yield chunk
+
+            os.replace(tmp_name, body_path)
+            committed = True
+            entry = CacheEntry(
+                url=url,
+                body_path=body_path,
+                size=size,
+                fetched_at=time.time(),
+                etag=etag,
+                last_modified=last_modified,
+            )
+            self._write_meta(entry)
+            self._evict()
+            return entry
+        finally:
+            if not committed:
+                with contextlib.suppress(OSError):
+                    os.unlink(tmp_name)
+
+    def _write_meta(self, entry: CacheEntry) -> None:
+        _body_path, meta_path = self._paths(entry.url)
+        meta = {
+            "url": entry.url,
+            "size": entry.size,
+            "fetched_at": entry.fetched_at,
+            "etag": entry.etag,
+            "last_modified": entry.last_modified,
+        }
+        fd, tmp_name = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf8") as f:
+                json.dump(meta, f)
+            os.replace(tmp_name, meta_path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp_name)
+            raise
+
+    @staticmethod
+    def _touch(entry: CacheEntry) -> None:
+        # Body mtime doubles as the LRU access time.
+        with contextlib.suppress(OSError):
+            os.utime(entry.body_path)
+
+    def _evict(self) -> None:
+        bodies: list[tuple[float, int, Path]] = []
+        for path in self.directory.glob("*.body"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            bodies.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _mtime, size, _path in bodies)
+        if total <= self.max_bytes:
+            return
+
+        bodies.sort()
+        for _mtime, size, path in bodies:
+            if total <= self.max_bytes:
+                break
+            logger.debug("Evicting cached payload %s (%s bytes)", path.name, size)
+            with contextlib.suppress(OSError):
+                path.unlink()
+                path.with_suffix(".json").unlink()
+            total -= size
+
+    def clear(self) -> None:
+        for pattern in ("*.body", "*.json", "*.tmp"):
+            for path in self.directory.glob(pattern):
+                with contextlib.suppress(OSError):
+                    path.unlink()
@@ -1,19 +1,81 @@
 from __future__ import annotations
 
+import importlib
+import json
+import os
 import re
 import sys
 import traceback
+from collections.abc import Iterator, Mapping
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any
 
 import click
 
-from .compare import compare_packages
+from . import __version__
+from .constants import (
+    DEFAULT_MAX_CONCURRENT,
+    DEFAULT_MAX_SNAPSHOTS,
+    DEFAULT_REFRESH_S,
+    DEFAULT_RESULT_CACHE_SIZE,
+    DIFF_ENGINES,
+    JSON_STYLES,
+)
 from .exceptions import AltApiError, BranchNotFoundError
-from .formatting import render_result
+from .hedging import parse_hedge_after
+from .profiling import StageProfiler, use_profiler
 
+if TYPE_CHECKING:
+    from .snapshot import BranchSnapshot
 
-@click.command(context_settings={"help_option_names": ["-h", "--help"]})
-@click.argument("branch1", required=False, default="sisyphus")
-@click.argument("branch2", required=False, default="p10")
+# The HTTP client, diff engine, formatters and server are imported on first use, so --help,
+# --version and usage errors never load them. Commands look these names up on the module
+# (``_cli.compare_packages``), which keeps them patchable as ``cli.compare_packages``.
+_LAZY_ATTRS = {
+    "compare_packages": ".compare",
+    "compare_matrix": ".compare",
+    "comparison_options": ".compare",
+    "write_result": ".formatting",
+    "SnapshotCache": ".cache",
+    "VersionCache": ".version",
+    "load_snapshot": ".snapshot",
+    "save_snapshot": ".snapshot",
+    "BranchStore": ".server",
+    "ComparisonService": ".server",
+    "make_server": ".server",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module = _LAZY_ATTRS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __package__), name)
+    globals()[name] = value
+    return value
+
+
+_cli = sys.modules[__name__]
+
+
+class _MainCommand(click.Command):
+    """The comparison command, plus ``serve`` as a first argument starting the HTTP server.
+
+    Branch names are free-form positional arguments, so ``serve`` is dispatched here rather
+    than through a ``click.Group`` (which would turn every branch name into a subcommand).
+    """
+
+    def main(self, args: Any = None, prog_name: str | None = None, **extra: Any) -> Any:
+        argv = list(sys.argv[1:] if args is None else args)
+        if argv[:1] == ["serve"]:
+            prog = prog_name or os.path.basename(sys.argv[0])
+            return serve.main(argv[1:], prog_name=f"{prog} serve", **extra)
+        return super().main(argv, prog_name, **extra)
+
+
+@click.command(cls=_MainCommand, context_settings={"help_option_names": ["-h", "--help"]})
+@click.version_option(__version__, "-V", "--version", prog_name="package-comparison")
+@click.argument("branches", nargs=-1)
 @click.option(
     "--output",
     "-o",
@@ -24,12 +86,19 @@ from .formatting import render_result
 @click.option(
     "--format",
     "output_format",
-    type=click.Choice(["json", "summary", "markdown", "text"], case_sensitive=False),
+    type=click.Choice(["json", "ndjson", "summary", "markdown", "text"], case_sensitive=False),
     default="json",
     show_default=True,
-    help="Output format.",
+    help="Output format (ndjson: one JSON object per line, for streaming consumers).",
 )
 @click.option("--pretty/--no-pretty", default=True, help="Pretty-print JSON output.")
+@click.option(
+    "--json-style",
+    type=click.Choice(JSON_STYLES),
+    default=None,
+    help="Byte-stable JSON layout with sorted keys: 'pretty' (2-space indent) or 'compact' "
+    "(no whitespace). Overrides --pretty/--no-pretty.",
+)
 @click.option(
     "--arch",
     "arches",
@@ -43,6 +112,13 @@ from .formatting import render_result
     help="Compare packages by name only (ignores architecture).",
 )
 @click.option("--timeout", "timeout_s", default=30.0, show_default=True, type=float)
+@click.option(
+    "--deadline",
+    "deadline_s",
+    default=None,
+    type=click.FloatRange(min=0, min_open=True),
+    help="Give up after this many seconds in total, including retries (default: no limit).",
+)
 @click.option(
     "--max-packages",
     default=None,
@@ -74,6 +150,79 @@ from .formatting import render_result
     default=None,
     help="Custom User-Agent header for API requests.",
 )
+@click.option(
+    "--cache-dir",
+    default=None,
+    type=click.Path(file_okay=False, path_type=str),
+    help="Directory for cached branch payloads (default: $XDG_CACHE_HOME/package-comparison-tool).",
+)
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    default=False,
+    help="Always download branches; do not read or write the on-disk cache.",
+)
+@click.option(
+    "--from-snapshot",
+    "snapshot_paths",
+    multiple=True,
+    type=click.Path(exists=True, dir_okay=False, path_type=str),
+    help="Use a saved binary snapshot instead of downloading the branch it contains (repeatable).",
+)
+@click.option(
+    "--since",
+    "since_path",
+    default=None,
+    type=click.Path(dir_okay=False, path_type=str),
+    help="Incrementally update this earlier JSON result (needs its saved branch snapshots; see README).",
+)
+@click.option(
+    "--hedge-after",
+    "hedge_after_s",
+    default=None,
+    metavar="SECONDS|auto",
+    help="Send a second request when the first has no response after this delay ('auto': p95 of past fetches).",
+)
+@click.option(
+    "--max-total-retries",
+    default=None,
+    type=click.IntRange(min=0),
+    help="Cap on retries shared by all requests of this run (default: only per-request limits).",
+)
+@click.option(
+    "--version-cache-size",
+    default=0,
+    show_default=True,
+    type=click.IntRange(min=0),
+    help="Memoize up to N version comparisons/tokenizations (0 disables the cache).",
+)
+@click.option(
+    "--engine",
+    type=click.Choice(DIFF_ENGINES, case_sensitive=False),
+    default="hash",
+    show_default=True,
+    help="Diff engine: dict indexes ('hash') or one merge pass over key-sorted branches ('merge').",
+)
+@click.option(
+    "--jobs",
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Diff in N worker processes, sharding packages by name (useful for very large branches).",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    default=False,
+    help="Print wall/CPU time per stage and bytes/packages per branch to stderr, and add them "
+    "to the result under 'timings'.",
+)
+@click.option(
+    "--profile-output",
+    default=None,
+    type=click.Path(dir_okay=False, writable=True, path_type=str),
+    help="Also write a cProfile dump (.prof) of the run to this path; implies --profile.",
+)
 @click.option(
     "--debug",
     is_flag=True,
@@ -81,22 +230,44 @@ from .formatting import render_result
     help="Show tracebacks for debugging failed API calls.",
 )
 def main(
-    branch1: str,
-    branch2: str,
+    branches: tuple[str, ...],
     output: str,
     output_format: str,
     pretty: bool,
+    json_style: str | None,
     arches: tuple[str, ...],
     ignore_arch: bool,
     timeout_s: float,
+    deadline_s: float | None,
     max_packages: int | None,
     limit: int,
     name_filters: tuple[str, ...],
     fail_on_diff: bool,
     user_agent: str | None,
+    cache_dir: str | None,
+    no_cache: bool,
+    snapshot_paths: tuple[str, ...],
+    since_path: str | None,
+    max_total_retries: int | None,
+    hedge_after_s: str | None,
+    version_cache_size: int,
+    engine: str,
+    jobs: int,
+    profile: bool,
+    profile_output: str | None,
     debug: bool,
 ) -> None:
-    """Compare binary packages between two ALT Linux branches."""
+    """Compare binary packages between ALT Linux branches.
+
+    With two branches (default: sisyphus p10) prints one comparison. With three or more,
+    every pair is compared, each branch is downloaded once, and one combined report is printed.
+    Run `package-comparison serve --help` for the long-running HTTP server.
+    """
+
+    if not branches:
+        branches = ("sisyphus", "p10")
+    elif len(branches) == 1:
+        branches = (branches[0], "p10")
 
     name_patterns = []
     for pattern in name_filters:
@@ -105,51 +276,245 @@ def main(
         except re.error as exc:
             raise click.BadParameter(f"Invalid regex '{pattern}': {exc}") from exc
 
+    try:
+        hedge_after = parse_hedge_after(hedge_after_s)
+    except ValueError as exc:
+        raise click.BadParameter(str(exc), param_hint="--hedge-after") from exc
+
+    if since_path is not None and len(branches) > 2:
+        raise click.BadParameter("incremental updates support two branches only", param_hint="--since")
+
     arches_set = {a.strip() for a in arches if a.strip()} or None
+    snapshots = _load_snapshots(snapshot_paths, branches=branches)
 
-    click.echo(f"Fetching and comparing: {branch1} vs {branch2}", err=True)
+    click.echo(f"Fetching and comparing: {' vs '.join(branches)}", err=True)
     if arches_set:
         click.echo(f"Arch filter: {', '.join(sorted(arches_set))}", err=True)
     if name_patterns:
         click.echo(f"Name filter patterns: {', '.join(p.pattern for p in name_patterns)}", err=True)
 
-    try:
-        result = compare_packages(
-            branch1,
-            branch2,
-            ignore_arch=ignore_arch,
-            arches=arches_set,
-            timeout_s=timeout_s,
-            max_packages=max_packages,
-            name_patterns=tuple(name_patterns) if name_patterns else None,
-            user_agent=user_agent,
+    compare_kwargs = dict(
+        ignore_arch=ignore_arch,
+        arches=arches_set,
+        timeout_s=timeout_s,
+        max_packages=max_packages,
+        name_patterns=tuple(name_patterns) if name_patterns else None,
+        user_agent=user_agent,
+        cache=None if no_cache else _cli.SnapshotCache(cache_dir),
+        snapshots=snapshots or None,
+        max_total_retries=max_total_retries,
+        deadline_s=deadline_s,
+        hedge_after_s=hedge_after,
+        version_cache=_cli.VersionCache(version_cache_size) if version_cache_size else None,
+        engine=engine.lower(),
+        workers=jobs if jobs > 1 else None,
+    )
+    profiler = StageProfiler() if profile or profile_output else None
+    if profiler is not None:
+        compare_kwargs["profiler"] = profiler
+
+    fetched: dict[str, BranchSnapshot] = {}
+    if since_path is not None:
+        options = _cli.comparison_options(
+            ignore_arch=ignore_arch, arches=arches_set, max_packages=max_packages, name_patterns=name_patterns
         )
-    except BranchNotFoundError as exc:
-        _emit_error(str(exc), debug=debug)
-        raise SystemExit(2) from exc
-    except AltApiError as exc:
-        _emit_error(str(exc), debug=debug)
-        raise SystemExit(1) from exc
-    except Exception as exc:  # noqa: BLE001
-        _emit_error(str(exc), debug=debug)
-        raise SystemExit(1) from exc
-
-    payload = render_result(result, fmt=output_format, pretty=pretty, limit=limit)
-
-    if output == "-":
-        sys.stdout.write(payload)
-    else:
-        with open(output, "w", encoding="utf8") as f:
-            f.write(payload)
-        click.echo(f"Wrote {output}", err=True)
-
-    stats = result.get("stats", {}) if isinstance(result, dict) else {}
-    differences = int(stats.get("differences", 0)) if isinstance(stats, dict) else 0
+        compare_kwargs.update(_load_baseline(since_path, branches=branches, options=options), fetched_snapshots=fetched)
+
+    with _profiled(profiler, profile_output):
+        try:
+            if len(branches) > 2:
+                result = _cli.compare_matrix(branches, **compare_kwargs)  # type: ignore[arg-type]
+            else:
+                result = _cli.compare_packages(branches[0], branches[1], **compare_kwargs)  # type: ignore[arg-type]
+        except BranchNotFoundError as exc:
+            _emit_error(str(exc), debug=debug)
+            raise SystemExit(2) from exc
+        except AltApiError as exc:
+            _emit_error(str(exc), debug=debug)
+            raise SystemExit(1) from exc
+        except Exception as exc:  # noqa: BLE001
+            _emit_error(str(exc), debug=debug)
+            raise SystemExit(1) from exc
+
+        # Reports are written row by row, so even unlimited ones never exist as one string.
+        if output == "-":
+            _cli.write_result(result, sys.stdout, fmt=output_format, pretty=pretty, json_style=json_style, limit=limit)
+        else:
+            with open(output, "w", encoding="utf8") as f:
+                _cli.write_result(result, f, fmt=output_format, pretty=pretty, json_style=json_style, limit=limit)
+            click.echo(f"Wrote {output}", err=True)
+
+    if fetched:
+        _save_baseline(output, output_format, fetched)
+
+    stats = result.get("stats", {}) if isinstance(result, Mapping) else {}
+    differences = int(stats.get("differences", 0)) if isinstance(stats, Mapping) else 0
     if fail_on_diff and differences > 0:
         raise SystemExit(1)
 
 
+def _load_snapshots(paths: tuple[str, ...], *, branches: tuple[str, ...]) -> dict[str, BranchSnapshot]:
+    snapshots: dict[str, BranchSnapshot] = {}
+    for path in paths:
+        try:
+            snapshot = _cli.load_snapshot(path)
+        except (OSError, ValueError) as exc:
+            raise click.BadParameter(str(exc), param_hint="--from-snapshot") from exc
+        if snapshot.branch not in branches:
+            raise click.BadParameter(
+                f"snapshot {path} contains branch '{snapshot.branch}', which is not being compared",
+                param_hint="--from-snapshot",
+            )
+        snapshots[snapshot.branch] = snapshot
+        click.echo(f"Using snapshot {path} for {snapshot.branch}", err=True)
+    return snapshots
+
+
+def _baseline_path(result_path: str, branch: str) -> str:
+    return f"{result_path}.{branch}.snapshot"
+
+
+def _load_baseline(path: str, *, branches: tuple[str, ...], options: Mapping[str, Any]) -> dict[str, Any]:
+    """Read an earlier JSON result and the branch snapshots saved next to it.
+
+    A result computed with other comparison options (``options``) is not reused.
+    """
+
+    snapshot_paths = {branch: _baseline_path(path, branch) for branch in branches}
+    if not os.path.exists(path) or not all(os.path.exists(p) for p in snapshot_paths.values()):
+        click.echo(f"No baseline at {path}; running a full comparison", err=True)
+        return {}
+
+    try:
+        with open(path, encoding="utf8") as f:
+            previous = json.load(f)
+        previous_snapshots = {branch: _cli.load_snapshot(p) for branch, p in snapshot_paths.items()}
+    except (OSError, ValueError) as exc:
+        raise click.BadParameter(str(exc), param_hint="--since") from exc
+
+    previous_meta = previous.get("meta") if isinstance(previous, dict) else None
+    if (previous_meta or {}).get("options") != options:
+        click.echo(f"Baseline {path} was computed with other options; running a full comparison", err=True)
+        return {}
+
+    click.echo(f"Updating {path} incrementally", err=True)
+    return {"previous_result": previous, "previous_snapshots": previous_snapshots}
+
+
+def _save_baseline(output: str, output_format: str, fetched: dict[str, BranchSnapshot]) -> None:
+    """Keep the fetched snapshots next to a JSON result so it can serve as the next ``--since``."""
+
+    if output == "-" or output_format.lower() != "json":
+        click.echo("Not saving a baseline: --since needs a JSON result written with --output", err=True)
+        return
+    for branch, snapshot in fetched.items():
+        _cli.save_snapshot(snapshot, _baseline_path(output, branch))
+
+
+@contextmanager
+def _profiled(profiler: StageProfiler | None, output: str | None) -> Iterator[None]:
+    """Record stages into ``profiler`` (and a cProfile dump into ``output``), then print them."""
+
+    if profiler is None:
+        yield
+        return
+    cprofile = None
+    if output is not None:
+        import cProfile
+
+        cprofile = cProfile.Profile()
+    with use_profiler(profiler):
+        if cprofile is not None:
+            cprofile.enable()
+        try:
+            yield
+        finally:
+            if cprofile is not None:
+                cprofile.disable()
+                cprofile.dump_stats(output)
+            click.echo(profiler.report(), err=True)
+            if output is not None:
+                click.echo(f"Wrote {output} (view with: python -m pstats {output})", err=True)
+
+
 def _emit_error(message: str, *, debug: bool) -> None:
     click.echo(f"Error: {message}", err=True)
     if debug:
         traceback.print_exc()
+
+
+@click.command(context_settings={"help_option_names": ["-h", "--help"]})
+@click.option("--host", default="127.0.0.1", show_default=True, help="Address to listen on.")
+@click.option("--port", default=8080, show_default=True, type=click.IntRange(min=0, max=65535))
+@click.option(
+    "--refresh",
+    "refresh_s",
+    default=DEFAULT_REFRESH_S,
+    show_default=True,
+    type=click.FloatRange(min=0),
+    help="Revalidate a warm branch snapshot (conditional GET) once it is this many seconds old.",
+)
+@click.option(
+    "--max-concurrent",
+    default=DEFAULT_MAX_CONCURRENT,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Comparisons allowed to run at once; further requests wait, then get a 503.",
+)
+@click.option(
+    "--result-cache-size",
+    default=DEFAULT_RESULT_CACHE_SIZE,
+    show_default=True,
+    type=click.IntRange(min=0),
+    help="Rendered results kept in memory (reused until a branch changes).",
+)
+@click.option(
+    "--max-snapshots",
+    default=DEFAULT_MAX_SNAPSHOTS,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Parsed branch snapshots (one per branch and arch) kept in memory.",
+)
+@click.option("--timeout", "timeout_s", default=30.0, show_default=True, type=float)
+@click.option("--user-agent", default=None, help="Custom User-Agent header for API requests.")
+@click.option(
+    "--engine",
+    type=click.Choice(DIFF_ENGINES, case_sensitive=False),
+    default="hash",
+    show_default=True,
+    help="Diff engine used for comparisons.",
+)
+def serve(
+    host: str,
+    port: int,
+    refresh_s: float,
+    max_concurrent: int,
+    result_cache_size: int,
+    max_snapshots: int,
+    timeout_s: float,
+    user_agent: str | None,
+    engine: str,
+) -> None:
+    """Serve comparisons over HTTP, keeping parsed branches warm in memory.
+
+    \b
+    GET /compare?branch1=sisyphus&branch2=p10[&arch=..][&filter=..][&format=..]
+        the same report as the CLI (json, ndjson, markdown, summary)
+    GET /metrics
+        Prometheus counters
+    """
+
+    store = _cli.BranchStore(
+        refresh_s=refresh_s, timeout_s=timeout_s, user_agent=user_agent, max_snapshots=max_snapshots
+    )
+    service = _cli.ComparisonService(
+        store, max_concurrent=max_concurrent, result_cache_size=result_cache_size, engine=engine.lower()
+    )
+    server = _cli.make_server(host, port, service=service)
+    click.echo(f"Serving on http://{host}:{server.server_address[1]}/compare", err=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
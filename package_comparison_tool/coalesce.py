@@ -0,0 +1,169 @@
+"""In-process coalescing of identical concurrent fetches ("singleflight").
+
+When several threads (or tasks) ask for the same branch at the same time, only the first
+caller fetches it; the others wait for that fetch and share its result. Results are
+:class:`~package_comparison_tool.snapshot.BranchSnapshot` objects, which are never mutated,
+so sharing them is safe. With ``ttl_s`` a finished result also keeps serving new callers for
+a short while. Failures are never shared beyond the callers already waiting for them.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections.abc import Awaitable, Callable, Hashable, Iterable, Mapping
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Generic, TypeVar
+
+from .filters import NameFilter
+
+T = TypeVar("T")
+
+
+def fetch_key(
+    branch: str,
+    *,
+    arches: Iterable[str] | None,
+    max_packages: int | None,
+    arch_query: bool,
+    name_filter: Callable[[str], bool] | None,
+    headers: Mapping[str, str],
+) -> Hashable:
+    """Key identifying the response of a branch fetch: everything that changes what comes back."""
+
+    if isinstance(name_filter, NameFilter):
+        filter_key: Hashable = tuple((p.pattern, p.flags) for p in name_filter.patterns)
+    else:
+        filter_key = name_filter  # arbitrary callables only coalesce with themselves
+    return (
+        branch,
+        frozenset(arches) if arches else None,
+        max_packages,
+        arch_query and bool(arches),
+        filter_key,
+        frozenset((name.lower(), value) for name, value in headers.items()),
+    )
+
+
+class SingleFlight(Generic[T]):
+    """Run at most one call per key at a time and hand its result to every concurrent caller.
+
+    One instance may serve both threads (:meth:`do`) and asyncio tasks (:meth:`do_async`);
+    the TTL cache is shared between them, in-flight calls are not (an asyncio caller never
+    blocks its loop on a thread). Counters are exposed by :meth:`as_dict`.
+    """
+
+    def __init__(self, *, ttl_s: float = 0.0, clock: Callable[[], float] = time.monotonic):
+        if ttl_s < 0:
+            raise ValueError("ttl_s must not be negative")
+        self.ttl_s = ttl_s
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, Future[T]] = {}
+        self._tasks: dict[tuple[asyncio.AbstractEventLoop, Hashable], asyncio.Task[T]] = {}
+        self._results: dict[Hashable, tuple[float, T]] = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.ttl_hits = 0
+
+    def _cached(self, key: Hashable) -> tuple[bool, T | None]:
+        # Caller holds the lock.
+        entry = self._results.get(key)
+        if entry is None:
+            return False, None
+        if entry[0] <= self._clock():
+            del self._results[key]
+            return False, None
+        self.ttl_hits += 1
+        return True, entry[1]
+
+    def _store(self, key: Hashable, value: T) -> None:
+        if self.ttl_s <= 0:
+            return
+        with self._lock:
+            now = self._clock()
+            for stale in [k for k, (expires_at, _) in self._results.items() if expires_at <= now]:
+                del self._results[stale]
+            self._results[key] = (now + self.ttl_s, value)
+
+    def do(self, key: Hashable, fn: Callable[[], T], *, timeout: float | None = None) -> T:
+        """Return ``fn()``, or the result of the identical call already running in another thread.
+
+        ``timeout`` bounds how long a waiting caller blocks (``TimeoutError`` afterwards);
+        the call that actually runs ``fn`` is not interrupted.
+        """
+
+        with self._lock:
+            hit, value = self._cached(key)
+            if hit:
+                return value  # type: ignore[return-value]
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self.calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            try:
+                return future.result(timeout=timeout)  # type: ignore[union-attr]
+            except FutureTimeoutError:
+                raise TimeoutError(f"timed out waiting for the in-flight call for {key!r}") from None
+
+        try:
+            value = fn()
+        except BaseException as exc:
+            with self._lock:
+                del self._calls[key]
+            future.set_exception(exc)  # type: ignore[union-attr]
+            raise
+        self._store(key, value)
+        with self._lock:
+            del self._calls[key]
+        future.set_result(value)  # type: ignore[union-attr]
+        return value
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[T]], *, timeout: float | None = None) -> T:
+        """Async counterpart of :meth:`do` for tasks on the running loop.
+
+        The shared call runs as its own task, so a waiter that is cancelled (or times out)
+        does not cancel the fetch the other waiters depend on.
+        """
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            hit, value = self._cached(key)
+            if hit:
+                return value  # type: ignore[return-value]
+            task = self._tasks.get((loop, key))
+            if task is None:
+                task = self._tasks[loop, key] = loop.create_task(self._run_async(loop, key, fn))
+                self.calls += 1
+            else:
+                self.coalesced += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"timed out waiting for the in-flight call for {key!r}") from None
+
+    async def _run_async(self, loop: asyncio.AbstractEventLoop, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        try:
+            value = await fn()
+            self._store(key, value)
+            return value
+        finally:
+            with self._lock:
+                del self._tasks[loop, key]
+
+    def clear(self) -> None:
+        """Drop cached results (in-flight calls are unaffected)."""
+
+        with self._lock:
+            self._results.clear()
+
+    def as_dict(self) -> dict[str, int]:
+        with self._lock:
+            return {"calls": self.calls, "coalesced": self.coalesced, "ttl_hits": self.ttl_hits}
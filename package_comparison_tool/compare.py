@@ -1,46 +1,690 @@
 from __future__ import annotations
 
+import heapq
 import logging
-from collections.abc import Callable, Iterable
-from concurrent.futures import ThreadPoolExecutor
+import multiprocessing
+import os
+import tempfile
+import zlib
+from array import array
+from collections.abc import Callable, Iterable, Mapping, Sequence
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from contextlib import ExitStack, closing
+from dataclasses import dataclass
 from datetime import datetime, timezone
+from functools import lru_cache
+from itertools import combinations, pairwise
 from re import Pattern
+from typing import Any
 
 import requests
 
-from .api import fetch_branch_binary_packages
+from . import profiling
+from .api import _clone_session, fetch_branch_snapshot
+from .cache import SnapshotCache
+from .coalesce import SingleFlight
+from .constants import DIFF_ENGINES, DiffEngine
+from .filters import NameFilter
+from .hedging import HedgeAfter, HedgeStats, parse_hedge_after
 from .models import PackageInfo
-from .version import EVR, compare_evr
+from .profiling import StageProfiler, active_profiler, use_profiler
+from .result import BUCKETS, CompareResult, PackageList
+from .retry import Deadline, RetryBudget
+from .snapshot import BranchSnapshot, load_snapshot, save_snapshot
+from .version import (
+    EvrKey,
+    EvrTuple,
+    VersionCache,
+    VersionKey,
+    compare_evr_many,
+    use_version_cache,
+    version_key,
+)
 
 logger = logging.getLogger(__name__)
 
 
-def _pkg_key(pkg: PackageInfo, *, ignore_arch: bool) -> tuple[str, str] | str:
-    return pkg.name if ignore_arch else (pkg.name, pkg.arch)
+PackageKey = tuple[str, str] | str
+
+
+def _as_snapshot(packages: BranchSnapshot | list[PackageInfo], *, branch: str) -> BranchSnapshot:
+    if isinstance(packages, BranchSnapshot):
+        return packages
+    return BranchSnapshot.from_packages(packages, branch=branch)
+
+
+class _RowKeys:
+    """EVR sort keys of snapshot rows, computed on demand; each distinct string is tokenized once."""
+
+    def __init__(self, snapshot: BranchSnapshot):
+        self._snapshot = snapshot
+        self._versions: dict[int, VersionKey] = {}
+        self._releases: dict[int, VersionKey] = {}
+
+    def _string_key(self, field: str, keys: dict[int, VersionKey], row: int) -> VersionKey:
+        code = self._snapshot.codes[field][row]
+        key = keys.get(code)
+        if key is None:
+            key = keys[code] = version_key(self._snapshot.tables[field][code])
+        return key
+
+    def __getitem__(self, row: int) -> EvrKey:
+        return (
+            self._snapshot.epoch[row],
+            self._string_key("version", self._versions, row),
+            self._string_key("release", self._releases, row),
+        )
+
+
+def _evr_tuples(snapshot: BranchSnapshot, rows: Iterable[int]) -> list[EvrTuple]:
+    epoch = snapshot.epoch
+    versions, version_codes = snapshot.strings("version"), snapshot.codes["version"]
+    releases, release_codes = snapshot.strings("release"), snapshot.codes["release"]
+    return [(epoch[i], versions[version_codes[i]], releases[release_codes[i]]) for i in rows]
+
+
+@dataclass(frozen=True, slots=True)
+class _IndexedBranch:
+    branch: str
+    snapshot: BranchSnapshot
+    index: dict[PackageKey, int]
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+
+@dataclass(frozen=True, slots=True)
+class _SortedBranch:
+    branch: str
+    snapshot: BranchSnapshot
+    keys: list[PackageKey]  # distinct, ascending
+    rows: list[int]  # row holding the highest EVR of each key
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+
+def _package_keys(
+    snapshot: BranchSnapshot, *, ignore_arch: bool, rows: Sequence[int] | None = None
+) -> list[PackageKey]:
+    """Package key of every row, or of ``rows`` only (in that order)."""
+
+    if rows is None:
+        names = snapshot.column("name")
+        if ignore_arch:
+            return names  # type: ignore[return-value]
+        return list(zip(names, snapshot.column("arch"), strict=True))
+    name_strings, name_codes = snapshot.strings("name"), snapshot.codes["name"]
+    if ignore_arch:
+        return [name_strings[name_codes[row]] for row in rows]
+    arch_strings, arch_codes = snapshot.strings("arch"), snapshot.codes["arch"]
+    return [(name_strings[name_codes[row]], arch_strings[arch_codes[row]]) for row in rows]
 
 
 def _index_packages(
-    packages: list[PackageInfo], *, ignore_arch: bool
-) -> dict[tuple[str, str] | str, PackageInfo]:
-    index: dict[tuple[str, str] | str, PackageInfo] = {}
-    for pkg in packages:
-        key = _pkg_key(pkg, ignore_arch=ignore_arch)
+    snapshot: BranchSnapshot, *, ignore_arch: bool, rows: Sequence[int] | None = None
+) -> dict[PackageKey, int]:
+    """Map each package key to the row holding its highest EVR (considering only ``rows``, if given)."""
+
+    index: dict[PackageKey, int] = {}
+    row_keys = _RowKeys(snapshot)
+    row_numbers = range(len(snapshot)) if rows is None else rows
+    keys = _package_keys(snapshot, ignore_arch=ignore_arch, rows=rows)
+    for row, key in zip(row_numbers, keys, strict=True):
         existing = index.get(key)
-        if existing is None:
-            index[key] = pkg
+        # Keys are only tokenized for the (rare) rows that share a package key.
+        if existing is None or row_keys[row] > row_keys[existing]:
+            index[key] = row
+
+    return index
+
+
+def _index_branch(
+    branch: str, snapshot: BranchSnapshot, *, ignore_arch: bool, rows: Sequence[int] | None = None
+) -> _IndexedBranch:
+    index = _index_packages(snapshot, ignore_arch=ignore_arch, rows=rows)
+    return _IndexedBranch(branch=branch, snapshot=snapshot, index=index)
+
+
+def _sort_branch(
+    branch: str, snapshot: BranchSnapshot, *, ignore_arch: bool, rows: Sequence[int] | None = None
+) -> _SortedBranch:
+    """Order rows (all, or ``rows``) by package key, resolving duplicate keys like :func:`_index_packages`."""
+
+    row_numbers = range(len(snapshot)) if rows is None else rows
+    keys = _package_keys(snapshot, ignore_arch=ignore_arch, rows=rows)
+    # Streams that already arrive ordered by key (e.g. sorted exports) skip the sort.
+    if all(a <= b for a, b in pairwise(keys)):  # type: ignore[operator]
+        order: Iterable[int] = range(len(keys))
+    else:
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+
+    row_keys = _RowKeys(snapshot)
+    sorted_keys: list[PackageKey] = []
+    best_rows: list[int] = []
+    for position in order:
+        key, row = keys[position], row_numbers[position]
+        if sorted_keys and sorted_keys[-1] == key:
+            # The sort is stable, so as in the hash index the earliest row wins EVR ties.
+            if row_keys[row] > row_keys[best_rows[-1]]:
+                best_rows[-1] = row
+        else:
+            sorted_keys.append(key)
+            best_rows.append(row)
+
+    return _SortedBranch(branch=branch, snapshot=snapshot, keys=sorted_keys, rows=best_rows)
+
+
+def _check_engine(engine: str) -> None:
+    if engine not in DIFF_ENGINES:
+        raise ValueError(f"unknown diff engine {engine!r}; expected one of: {', '.join(DIFF_ENGINES)}")
+
+
+def _prepare_branch(
+    branch: str,
+    snapshot: BranchSnapshot,
+    *,
+    ignore_arch: bool,
+    engine: DiffEngine,
+    rows: Sequence[int] | None = None,
+) -> _IndexedBranch | _SortedBranch:
+    with profiling.stage("index", branch=branch):
+        if engine == "merge":
+            return _sort_branch(branch, snapshot, ignore_arch=ignore_arch, rows=rows)
+        return _index_branch(branch, snapshot, ignore_arch=ignore_arch, rows=rows)
+
+
+def _name_filter(name_patterns: Iterable[Pattern[str]] | None) -> NameFilter | None:
+    patterns = list(name_patterns) if name_patterns else None
+    return NameFilter(patterns) if patterns else None
+
+
+def _filter_snapshot(snapshot: BranchSnapshot, name_filter: Callable[[str], bool]) -> BranchSnapshot:
+    rows = [i for i, name in enumerate(snapshot.column("name")) if name_filter(name)]
+    if len(rows) == len(snapshot):  # e.g. already filtered while fetching
+        return snapshot
+    return BranchSnapshot.from_fields((snapshot.fields(i) for i in rows), branch=snapshot.branch)
+
+
+def _hedge_stats(hedge_after_s: HedgeAfter | None) -> HedgeStats | None:
+    after_s = parse_hedge_after(hedge_after_s)
+    return None if after_s is None else HedgeStats(after_s)
+
+
+def _meta(
+    budget: RetryBudget,
+    hedge: HedgeStats | None,
+    version_cache: VersionCache | None = None,
+) -> dict[str, object]:
+    meta: dict[str, object] = {"retry": budget.as_dict()}
+    if hedge is not None:
+        meta["hedge"] = hedge.as_dict()
+    if version_cache is not None:
+        meta["version_cache"] = version_cache.stats()
+    return meta
+
+
+def _fetch_snapshots(
+    branches: list[str],
+    *,
+    fetch_kwargs: dict[str, object],
+    session: requests.Session | None,
+    session_factory: Callable[[], requests.Session] | None,
+    allow_concurrency_with_session: bool,
+    snapshots: Mapping[str, BranchSnapshot] | None,
+) -> dict[str, BranchSnapshot]:
+    """Fetch every distinct branch exactly once, concurrently unless a shared session forbids it."""
+
+    result: dict[str, BranchSnapshot] = {}
+    pending: list[str] = []
+    for branch in branches:
+        if branch in result or branch in pending:
             continue
+        if snapshots and branch in snapshots:
+            result[branch] = snapshots[branch]
+        else:
+            pending.append(branch)
 
-        if (
-            compare_evr(
-                EVR(epoch=pkg.epoch, version=pkg.version, release=pkg.release),
-                EVR(epoch=existing.epoch, version=existing.version, release=existing.release),
-            )
-            > 0
-        ):
-            index[key] = pkg
+    def _fetch(branch: str, *, sess: requests.Session | None) -> BranchSnapshot:
+        return fetch_branch_snapshot(branch, session=sess, **fetch_kwargs)  # type: ignore[arg-type]
 
-    return index
+    def _parallel(sessions: list[requests.Session | None]) -> None:
+        with ThreadPoolExecutor(max_workers=max(1, len(pending))) as pool:
+            futures = [pool.submit(_fetch, branch, sess=sess) for branch, sess in zip(pending, sessions, strict=True)]
+            for branch, future in zip(pending, futures, strict=True):
+                result[branch] = future.result()
+
+    if not pending:
+        return result
+
+    if session_factory is not None:
+        with ExitStack() as stack:
+            _parallel([stack.enter_context(closing(session_factory())) for _ in pending])
+    elif session is None:
+        _parallel([None] * len(pending))
+    elif allow_concurrency_with_session:
+        with ExitStack() as stack:
+            # Clone caller-provided session to avoid cross-thread use of a single Session
+            _parallel([stack.enter_context(closing(_clone_session(session))) for _ in pending])
+    else:
+        logger.debug("Using sequential fetch because a session was provided and allow_concurrency_with_session=False")
+        for branch in pending:
+            result[branch] = _fetch(branch, sess=session)
+
+    return result
+
+
+def _prepare_snapshot(
+    packages: BranchSnapshot | list[PackageInfo],
+    *,
+    branch: str,
+    name_filter: Callable[[str], bool] | None,
+) -> BranchSnapshot:
+    with profiling.stage("prepare", branch=branch):
+        snapshot = _as_snapshot(packages, branch=branch)
+        if name_filter is not None:
+            snapshot = _filter_snapshot(snapshot, name_filter)
+    return snapshot
+
+
+def _split_higher(
+    snap1: BranchSnapshot,
+    rows1: list[int],
+    snap2: BranchSnapshot,
+    rows2: list[int],
+) -> tuple[list[int], list[int]]:
+    """Of the paired rows ``rows1[i]``/``rows2[i]``, return those with the higher EVR on each side."""
+
+    higher1: list[int] = []
+    higher2: list[int] = []
+    with profiling.stage("evr_compare"):
+        order = compare_evr_many(_evr_tuples(snap1, rows1), _evr_tuples(snap2, rows2))
+    for a, b, rc in zip(rows1, rows2, order, strict=True):
+        if rc > 0:
+            higher1.append(a)
+        elif rc < 0:
+            higher2.append(b)
+    return higher1, higher2
+
+
+@dataclass(frozen=True, slots=True)
+class _DiffRows:
+    """Row numbers of every bucket (each ordered by package key) and the indexed totals."""
+
+    only1: list[int]
+    only2: list[int]
+    higher1: list[int]
+    higher2: list[int]
+    total1: int
+    total2: int
+
+
+def _diff_result(
+    branch1: str,
+    snap1: BranchSnapshot,
+    branch2: str,
+    snap2: BranchSnapshot,
+    rows: _DiffRows,
+    *,
+    generated_at: str | None,
+) -> CompareResult:
+    only1, only2, higher1, higher2 = rows.only1, rows.only2, rows.higher1, rows.higher2
+    diff_total = len(only1) + len(only2) + len(higher1) + len(higher2)
+
+    return CompareResult(
+        branch1=branch1,
+        branch2=branch2,
+        generated_at=generated_at or datetime.now(timezone.utc).isoformat(),
+        buckets={
+            "packages_only_in_branch1": PackageList(snap1, only1, branch=branch1),
+            "packages_only_in_branch2": PackageList(snap2, only2, branch=branch2),
+            "packages_with_higher_version_in_branch1": PackageList(snap1, higher1, branch=branch1),
+            "packages_with_higher_version_in_branch2": PackageList(snap2, higher2, branch=branch2),
+        },
+        stats={
+            "only_in_branch1": len(only1),
+            "only_in_branch2": len(only2),
+            "higher_in_branch1": len(higher1),
+            "higher_in_branch2": len(higher2),
+            "total_branch1_indexed": rows.total1,
+            "total_branch2_indexed": rows.total2,
+            "differences": diff_total,
+        },
+    )
+
+
+def _diff_indexes(left: _IndexedBranch, right: _IndexedBranch) -> _DiffRows:
+    idx1, idx2 = left.index, right.index
+    keys1 = set(idx1.keys())
+    keys2 = set(idx2.keys())
+
+    only1 = [idx1[key] for key in sorted(keys1 - keys2)]
+    only2 = [idx2[key] for key in sorted(keys2 - keys1)]
+
+    common = sorted(keys1 & keys2)
+    higher1, higher2 = _split_higher(
+        left.snapshot, [idx1[key] for key in common], right.snapshot, [idx2[key] for key in common]
+    )
+    return _DiffRows(only1, only2, higher1, higher2, len(idx1), len(idx2))
+
+
+def _diff_sorted(left: _SortedBranch, right: _SortedBranch) -> _DiffRows:
+    """Single linear merge pass over two key-ordered branches; every list comes out sorted."""
+
+    keys1, rows1, n1 = left.keys, left.rows, len(left.keys)
+    keys2, rows2, n2 = right.keys, right.rows, len(right.keys)
+
+    only1: list[int] = []
+    only2: list[int] = []
+    common1: list[int] = []
+    common2: list[int] = []
+    i = j = 0
+    while i < n1 and j < n2:
+        key1, key2 = keys1[i], keys2[j]
+        if key1 == key2:
+            common1.append(rows1[i])
+            common2.append(rows2[j])
+            i += 1
+            j += 1
+        elif key1 < key2:  # type: ignore[operator]
+            only1.append(rows1[i])
+            i += 1
+        else:
+            only2.append(rows2[j])
+            j += 1
+    only1.extend(rows1[i:])
+    only2.extend(rows2[j:])
+
+    higher1, higher2 = _split_higher(left.snapshot, common1, right.snapshot, common2)
+    return _DiffRows(only1, only2, higher1, higher2, n1, n2)
+
+
+def _diff_rows(left: _IndexedBranch | _SortedBranch, right: _IndexedBranch | _SortedBranch) -> _DiffRows:
+    with profiling.stage("diff"):
+        if isinstance(left, _SortedBranch) and isinstance(right, _SortedBranch):
+            return _diff_sorted(left, right)
+        if isinstance(left, _IndexedBranch) and isinstance(right, _IndexedBranch):
+            return _diff_indexes(left, right)
+    raise TypeError("both branches must be prepared by the same diff engine")
+
+
+def _diff_branches(
+    left: _IndexedBranch | _SortedBranch,
+    right: _IndexedBranch | _SortedBranch,
+    *,
+    generated_at: str | None = None,
+) -> CompareResult:
+    rows = _diff_rows(left, right)
+    return _diff_result(left.branch, left.snapshot, right.branch, right.snapshot, rows, generated_at=generated_at)
+
+
+def _shard_rows(snapshot: BranchSnapshot, shards: int) -> list[array[int]]:
+    """Split row numbers into ``shards`` groups by a stable hash of the package name.
+
+    All rows of a name land in the same shard, so duplicate keys still meet (with or without
+    ``ignore_arch``) and every shard can be indexed and diffed on its own.
+    """
+
+    names = snapshot.strings("name")
+    shard_of_code = [zlib.crc32(names[code].encode("utf8")) % shards for code in range(len(names))]
+    groups = [array("I") for _ in range(shards)]
+    for row, code in enumerate(snapshot.codes["name"]):
+        groups[shard_of_code[code]].append(row)
+    return groups
+
+
+@dataclass(frozen=True, slots=True)
+class _ShardTask:
+    paths: tuple[str, str]
+    rows: tuple[bytes, bytes]  # array('I') row numbers of each branch that fall in this shard
+    ignore_arch: bool
+    engine: DiffEngine
+
+
+@lru_cache(maxsize=8)
+def _worker_snapshot(path: str) -> BranchSnapshot:
+    return load_snapshot(path)
+
+
+def _diff_shard(task: _ShardTask) -> _DiffRows:
+    """Process-pool worker: diff one shard of a branch pair straight on the mapped columns."""
+
+    prepared: list[_IndexedBranch | _SortedBranch] = []
+    for path, raw_rows in zip(task.paths, task.rows, strict=True):
+        snapshot = _worker_snapshot(path)
+        rows = array("I")
+        rows.frombytes(raw_rows)
+        prepared.append(
+            _prepare_branch(snapshot.branch, snapshot, ignore_arch=task.ignore_arch, engine=task.engine, rows=rows)
+        )
+    return _diff_rows(prepared[0], prepared[1])
+
+
+def _row_key(snapshot: BranchSnapshot, *, ignore_arch: bool) -> Callable[[int], PackageKey]:
+    names, name_codes = snapshot.strings("name"), snapshot.codes["name"]
+    if ignore_arch:
+        return lambda row: names[name_codes[row]]
+    arches, arch_codes = snapshot.strings("arch"), snapshot.codes["arch"]
+    return lambda row: (names[name_codes[row]], arches[arch_codes[row]])
+
+
+def _merge_shards(
+    snap1: BranchSnapshot,
+    snap2: BranchSnapshot,
+    shards: list[_DiffRows],
+    *,
+    ignore_arch: bool,
+) -> _DiffRows:
+    key1 = _row_key(snap1, ignore_arch=ignore_arch)
+    key2 = _row_key(snap2, ignore_arch=ignore_arch)
+    return _DiffRows(
+        list(heapq.merge(*(shard.only1 for shard in shards), key=key1)),
+        list(heapq.merge(*(shard.only2 for shard in shards), key=key2)),
+        list(heapq.merge(*(shard.higher1 for shard in shards), key=key1)),
+        list(heapq.merge(*(shard.higher2 for shard in shards), key=key2)),
+        sum(shard.total1 for shard in shards),
+        sum(shard.total2 for shard in shards),
+    )
+
+
+def _diff_in_workers(
+    pairs: list[tuple[str, str]],
+    snapshots: Mapping[str, BranchSnapshot],
+    *,
+    workers: int,
+    ignore_arch: bool,
+    engine: DiffEngine,
+    deadline: Deadline | None,
+) -> list[_DiffRows]:
+    """Diff every pair in a process pool, one task per (pair, name-hash shard).
+
+    Each branch is written once as a snapshot file that workers memory-map, so only row
+    numbers are pickled; the per-shard results are merged back in key order. Workers are
+    started with ``forkserver`` (``spawn`` where unavailable) rather than forked from this
+    process, whose fetch threads may hold locks. When the deadline expires, queued shards are
+    cancelled but shards already running finish in the background before their workers exit.
+    """
+
+    branches = list(dict.fromkeys(branch for pair in pairs for branch in pair))
+    with tempfile.TemporaryDirectory(prefix="package-comparison-") as tmp:
+        paths: dict[str, str] = {}
+        shard_rows: dict[str, list[bytes]] = {}
+        for index, branch in enumerate(branches):
+            paths[branch] = os.path.join(tmp, f"{index}.snapshot")
+            save_snapshot(snapshots[branch], paths[branch])
+            shard_rows[branch] = [rows.tobytes() for rows in _shard_rows(snapshots[branch], workers)]
+
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=_worker_context())
+        try:
+            futures = [
+                [
+                    pool.submit(
+                        _diff_shard,
+                        _ShardTask((paths[b1], paths[b2]), (shard_rows[b1][i], shard_rows[b2][i]), ignore_arch, engine),
+                    )
+                    for i in range(workers)
+                ]
+                for b1, b2 in pairs
+            ]
+            results = []
+            for (b1, b2), pair_futures in zip(pairs, futures, strict=True):
+                try:
+                    shards = [f.result(timeout=None if deadline is None else deadline.remaining()) for f in pair_futures]
+                except FutureTimeoutError:
+                    raise deadline.error("comparing packages") from None  # type: ignore[union-attr]
+                results.append(_merge_shards(snapshots[b1], snapshots[b2], shards, ignore_arch=ignore_arch))
+        except BaseException:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        pool.shutdown()
+    return results
+
+
+def _worker_context() -> multiprocessing.context.BaseContext:
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def _check_workers(workers: int | None) -> None:
+    if workers is not None and workers < 1:
+        raise ValueError("workers must be at least 1")
+
+
+def _row_columns(snapshot: BranchSnapshot) -> list[list[Any]]:
+    """All columns of ``snapshot`` as lists, in :data:`PackageFields` order."""
+
+    return [
+        snapshot.column("name"),
+        list(snapshot.epoch),
+        snapshot.column("version"),
+        snapshot.column("release"),
+        snapshot.column("arch"),
+        list(snapshot.buildtime),
+        snapshot.column("disttag"),
+    ]
+
+
+def _changed_keys(old: BranchSnapshot, new: BranchSnapshot, *, ignore_arch: bool) -> set[PackageKey]:
+    """Keys of rows added, removed or changed between two snapshots of a branch."""
+
+    old_columns, new_columns = _row_columns(old), _row_columns(new)
+    if old_columns == new_columns:  # unchanged branch: plain list comparisons, no hashing
+        return set()
+    delta = set(zip(*old_columns, strict=True)) ^ set(zip(*new_columns, strict=True))
+    return {fields[0] if ignore_arch else (fields[0], fields[4]) for fields in delta}
+
+
+def _rows_with_keys(snapshot: BranchSnapshot, keys: set[PackageKey], *, ignore_arch: bool) -> list[int]:
+    names = snapshot.column("name")
+    if ignore_arch:
+        return [row for row, name in enumerate(names) if name in keys]
+    wanted = {name for name, _arch in keys}  # type: ignore[misc]
+    return [
+        row
+        for row, name in enumerate(names)
+        if name in wanted and (name, snapshot.value("arch", row)) in keys
+    ]
+
+
+def _entry_key(entry: Mapping[str, Any], *, ignore_arch: bool) -> PackageKey:
+    return entry["name"] if ignore_arch else (entry["name"], entry["arch"])
+
+
+def _update_result(
+    previous: Mapping[str, Any],
+    old: tuple[BranchSnapshot, BranchSnapshot],
+    new: tuple[BranchSnapshot, BranchSnapshot],
+    *,
+    ignore_arch: bool,
+) -> CompareResult:
+    """Patch ``previous`` (the result for the ``old`` snapshots) into the result for ``new``.
+
+    Finding the changed rows takes one linear pass per snapshot (hashing rows only for branches
+    that changed). Everything else (indexing, version comparison, building entries) only
+    touches the keys of added, removed or changed rows; their entries are dropped from the
+    previous buckets and the fresh ones merged back in order.
+    """
+
+    branch1, branch2 = previous["branch1"], previous["branch2"]
+    changed = _changed_keys(old[0], new[0], ignore_arch=ignore_arch)
+    changed |= _changed_keys(old[1], new[1], ignore_arch=ignore_arch)
+
+    def _affected(snapshot: BranchSnapshot, branch: str) -> _IndexedBranch:
+        # Rows are kept in their original order, so duplicate keys resolve exactly as they
+        # would in a full comparison.
+        rows = _rows_with_keys(snapshot, changed, ignore_arch=ignore_arch)
+        subset = BranchSnapshot.from_fields((snapshot.fields(row) for row in rows), branch=branch)
+        return _index_branch(branch, subset, ignore_arch=ignore_arch)
+
+    partial = _diff_branches(_affected(new[0], branch1), _affected(new[1], branch2))
+    old_stats = previous["stats"]
+    partial_stats: dict[str, int] = partial["stats"]  # type: ignore[assignment]
+
+    buckets: dict[str, list[dict[str, Any]]] = {}
+    for bucket in BUCKETS:
+        kept = [e for e in previous[bucket] if _entry_key(e, ignore_arch=ignore_arch) not in changed]
+        buckets[bucket] = list(
+            heapq.merge(kept, partial[bucket], key=lambda e: _entry_key(e, ignore_arch=ignore_arch))  # type: ignore[arg-type]
+        )
+
+    totals = {}
+    for side, snapshot in ((1, old[0]), (2, old[1])):
+        keys = _package_keys(snapshot, ignore_arch=ignore_arch)
+        stale = {keys[row] for row in _rows_with_keys(snapshot, changed, ignore_arch=ignore_arch)}
+        name = f"total_branch{side}_indexed"
+        totals[name] = old_stats[name] - len(stale) + partial_stats[name]
+
+    counts = [len(buckets[bucket]) for bucket in BUCKETS]
+    result = CompareResult(
+        branch1=branch1,
+        branch2=branch2,
+        generated_at=partial["generated_at"],  # type: ignore[arg-type]
+        buckets=buckets,
+        stats={
+            "only_in_branch1": counts[0],
+            "only_in_branch2": counts[1],
+            "higher_in_branch1": counts[2],
+            "higher_in_branch2": counts[3],
+            **totals,
+            "differences": sum(counts),
+        },
+    )
+    result["meta"] = {"incremental": {"since": previous.get("generated_at"), "changed_keys": len(changed)}}
+    return result
+
+
+def comparison_options(
+    *,
+    ignore_arch: bool,
+    arches: Iterable[str] | None,
+    max_packages: int | None,
+    name_patterns: Iterable[Pattern[str]] | None,
+) -> dict[str, Any]:
+    """The options that shape a comparison, as recorded under ``result["meta"]["options"]``.
+
+    JSON-ready, so a saved result can be checked against the options of a later run.
+    """
+
+    name_filter = _name_filter(name_patterns)
+    return {
+        "ignore_arch": ignore_arch,
+        "arches": sorted(arches) if arches else None,
+        "max_packages": max_packages,
+        "name_patterns": sorted([p.pattern, p.flags] for p in name_filter.patterns) if name_filter else None,
+    }
+
+
+def _check_previous(previous: Mapping[str, Any], branch1: str, branch2: str, options: Mapping[str, Any]) -> None:
+    if any(key not in previous for key in ("branch1", "branch2", "stats", *BUCKETS)):
+        raise ValueError("previous_result is not a compare_packages result")
+    if (previous["branch1"], previous["branch2"]) != (branch1, branch2):
+        raise ValueError(
+            f"previous_result compares {previous['branch1']} vs {previous['branch2']}, not {branch1} vs {branch2}"
+        )
+    previous_options = (previous.get("meta") or {}).get("options")
+    if previous_options != options:
+        raise ValueError(f"previous_result was computed with options {previous_options}, not {options}")
 
 
 def compare_packages(
@@ -59,140 +703,294 @@ def compare_packages(
     retry_backoff: float = 0.3,
     session_factory: Callable[[], requests.Session] | None = None,
     allow_concurrency_with_session: bool = False,
-) -> dict[str, object]:
+    cache: SnapshotCache | None = None,
+    snapshots: Mapping[str, BranchSnapshot] | None = None,
+    max_total_retries: int | None = None,
+    deadline_s: float | None = None,
+    hedge_after_s: HedgeAfter | None = None,
+    arch_query: bool = True,
+    version_cache: VersionCache | None = None,
+    engine: DiffEngine = "hash",
+    previous_result: Mapping[str, Any] | None = None,
+    previous_snapshots: Mapping[str, BranchSnapshot] | None = None,
+    fetched_snapshots: dict[str, BranchSnapshot] | None = None,
+    workers: int | None = None,
+    singleflight: SingleFlight[BranchSnapshot] | None = None,
+    profiler: StageProfiler | None = None,
+) -> CompareResult:
     """Compare binary packages between two ALT branches.
 
-    Returns a JSON-serializable dict.
+    Returns a :class:`~package_comparison_tool.result.CompareResult`: a mapping shaped like
+    the JSON report whose package entries are only materialized when accessed (call
+    ``.to_dict()`` for a plain JSON-serializable dict).
 
     When ``session`` is provided, calls are sequential by default to avoid sharing a
     potentially non-thread-safe session across threads. To regain parallel fetches, pass
     ``allow_concurrency_with_session=True`` (the session will be cloned) or provide a
     ``session_factory`` that returns independent sessions for each branch. Sessions created
     via ``session_factory`` are closed automatically; caller-provided sessions are not.
+
+    ``cache`` enables the on-disk branch payload cache (see :class:`SnapshotCache`).
+    Branches present in ``snapshots`` (e.g. opened with ``load_snapshot``) are not fetched;
+    the arch filter and ``max_packages`` do not apply to them.
+
+    ``retries`` bounds the attempts of each request; ``max_total_retries`` additionally caps
+    the retries of all requests made by this call. Attempt counts and time spent sleeping
+    between retries are reported under ``result["meta"]["retry"]``.
+
+    ``deadline_s`` bounds the wall-clock time of the whole call, unlike ``timeout_s`` which
+    applies to each HTTP attempt: attempt timeouts and backoff sleeps are clamped to the time
+    left, and :class:`~package_comparison_tool.exceptions.DeadlineExceededError` is raised
+    once it is spent.
+
+    With ``arches``, only the requested arches are downloaded (one concurrent request per
+    arch) unless ``arch_query=False``.
+
+    ``hedge_after_s`` enables hedged requests (seconds, or ``"auto"`` for the adaptive p95 of
+    past fetches); hedge counts are reported under ``result["meta"]["hedge"]``.
+
+    ``version_cache`` memoizes version comparison and tokenization during the call; reuse one
+    :class:`~package_comparison_tool.version.VersionCache` across calls to keep it warm (size
+    it with ``VersionCache(maxsize)``, empty it with ``.clear()``). Its hit/miss counters are
+    reported under ``result["meta"]["version_cache"]``.
+
+    ``engine`` selects how packages are matched: ``"hash"`` (default) indexes each branch in a
+    dict, ``"merge"`` orders each branch by package key (skipping the sort when it already
+    is) and diffs them in a single linear merge pass. Both produce identical results.
+
+    Incremental mode: given ``previous_result`` (an earlier result for the same branches and
+    options) and ``previous_snapshots`` (the branch snapshots it was computed from), only
+    packages whose rows were added, removed or changed since then are re-compared, so the
+    work after fetching scales with churn rather than branch size; ``engine`` and ``workers``
+    are not used. The previous result must have been computed with the same ``ignore_arch``,
+    ``arches``, ``max_packages`` and ``name_patterns`` (recorded under
+    ``result["meta"]["options"]``), otherwise ``ValueError`` is raised.
+    The number of re-compared keys is reported under ``result["meta"]["incremental"]``.
+    ``fetched_snapshots``, if given, receives the snapshot of each branch as fetched (already
+    name-filtered), e.g. to save as the baseline of the next incremental run.
+
+    ``name_patterns`` are combined into one :class:`~package_comparison_tool.filters.NameFilter`
+    that runs while the payload is parsed, so packages that match no pattern are never stored.
+
+    ``workers=N`` (N > 1) runs indexing and diffing in a pool of N processes: packages are
+    sharded by a hash of their name, branches reach the workers as memory-mapped snapshot
+    files, and the shard results are merged into the usual result. It pays off for large
+    branches; ``version_cache`` only applies to in-process work.
+
+    Services that compare from many threads can pass one shared
+    :class:`~package_comparison_tool.coalesce.SingleFlight` as ``singleflight``: concurrent
+    calls needing the same branch (same arch filter, name filter and headers) then share a
+    single download instead of fetching it once per call.
+
+    ``profiler`` (default: the active one, see :func:`~package_comparison_tool.profiling.use_profiler`)
+    times the stages of the call (request, download, parse, index, diff, EVR comparison) and
+    counts bytes and packages per branch; the timings so far are reported under
+    ``result["timings"]``.
     """
 
-    compiled_patterns = list(name_patterns) if name_patterns else None
-
-    def _filter_by_name(packages: list[PackageInfo]) -> list[PackageInfo]:
-        if not compiled_patterns:
-            return packages
-        return [pkg for pkg in packages if any(p.search(pkg.name) for p in compiled_patterns)]
-
-    fetch_kwargs = dict(
-        timeout_s=timeout_s,
-        arches=arches,
-        max_packages=max_packages,
-        user_agent=user_agent,
-        headers=headers,
-        retries=retries,
-        retry_backoff=retry_backoff,
+    _check_engine(engine)
+    _check_workers(workers)
+    options = comparison_options(
+        ignore_arch=ignore_arch, arches=arches, max_packages=max_packages, name_patterns=name_patterns
+    )
+    if previous_result is not None:
+        _check_previous(previous_result, branch1, branch2, options)
+        missing = [b for b in (branch1, branch2) if b not in (previous_snapshots or {})]
+        if missing:
+            raise ValueError(f"previous_snapshots has no snapshot for: {', '.join(missing)}")
+
+    name_filter = _name_filter(name_patterns)
+    budget = RetryBudget(max_total_retries)
+    deadline = Deadline.after(deadline_s)
+    hedge = _hedge_stats(hedge_after_s)
+    profiler = profiler if profiler is not None else active_profiler()
+
+    fetched = _fetch_snapshots(
+        [branch1, branch2],
+        fetch_kwargs=dict(
+            timeout_s=timeout_s,
+            arches=arches,
+            max_packages=max_packages,
+            user_agent=user_agent,
+            headers=headers,
+            retries=retries,
+            retry_backoff=retry_backoff,
+            cache=cache,
+            retry_budget=budget,
+            deadline=deadline,
+            hedge_stats=hedge,
+            arch_query=arch_query,
+            name_filter=name_filter,
+            singleflight=singleflight,
+            profiler=profiler,
+        ),
+        session=session,
+        session_factory=session_factory,
+        allow_concurrency_with_session=allow_concurrency_with_session,
+        snapshots=snapshots,
     )
 
-    def _fetch(branch: str, *, sess: requests.Session | None) -> list[PackageInfo]:
-        return fetch_branch_binary_packages(branch, session=sess, **fetch_kwargs)  # type: ignore[arg-type]
-
-    def _parallel(
-        sess1: requests.Session | None,
-        sess2: requests.Session | None,
-    ) -> tuple[list[PackageInfo], list[PackageInfo]]:
-        with ThreadPoolExecutor(max_workers=2) as pool:
-            future1 = pool.submit(_fetch, branch1, sess=sess1)
-            future2 = pool.submit(_fetch, branch2, sess=sess2)
-            return future1.result(), future2.result()
-
-    packages1: list[PackageInfo]
-    packages2: list[PackageInfo]
-
-    if session_factory is not None:
-        with ExitStack() as stack:
-            sess1 = stack.enter_context(closing(session_factory()))
-            sess2 = stack.enter_context(closing(session_factory()))
-            packages1, packages2 = _parallel(sess1, sess2)
-    elif session is None:
-        packages1, packages2 = _parallel(None, None)
-    elif allow_concurrency_with_session:
-        with ExitStack() as stack:
-            # Clone caller-provided session to avoid cross-thread use of a single Session
-            sess1 = stack.enter_context(closing(_clone_session(session)))
-            sess2 = stack.enter_context(closing(_clone_session(session)))
-            packages1, packages2 = _parallel(sess1, sess2)
-    else:
-        logger.debug("Using sequential fetch because a session was provided and allow_concurrency_with_session=False")
-        packages1 = _fetch(branch1, sess=session)
-        packages2 = _fetch(branch2, sess=session)
-
-    packages1 = _filter_by_name(packages1)
-    packages2 = _filter_by_name(packages2)
-
-    idx1 = _index_packages(packages1, ignore_arch=ignore_arch)
-    idx2 = _index_packages(packages2, ignore_arch=ignore_arch)
+    if deadline is not None:
+        deadline.check("comparing packages")
+
+    if fetched_snapshots is not None:
+        fetched_snapshots.update({b: _as_snapshot(packages, branch=b) for b, packages in fetched.items()})
+
+    with use_profiler(profiler), use_version_cache(version_cache):
+        snap1 = _prepare_snapshot(fetched[branch1], branch=branch1, name_filter=name_filter)
+        snap2 = _prepare_snapshot(fetched[branch2], branch=branch2, name_filter=name_filter)
+        if previous_result is not None and previous_snapshots is not None:
+            old1 = _prepare_snapshot(previous_snapshots[branch1], branch=branch1, name_filter=name_filter)
+            old2 = _prepare_snapshot(previous_snapshots[branch2], branch=branch2, name_filter=name_filter)
+            with profiling.stage("incremental"):
+                result = _update_result(previous_result, (old1, old2), (snap1, snap2), ignore_arch=ignore_arch)
+        elif workers is not None and workers > 1:
+            with profiling.stage("diff_workers"):
+                (rows,) = _diff_in_workers(
+                    [(branch1, branch2)],
+                    {branch1: snap1, branch2: snap2},
+                    workers=workers,
+                    ignore_arch=ignore_arch,
+                    engine=engine,
+                    deadline=deadline,
+                )
+            result = _diff_result(branch1, snap1, branch2, snap2, rows, generated_at=None)
+        else:
+            result = _diff_branches(
+                _prepare_branch(branch1, snap1, ignore_arch=ignore_arch, engine=engine),
+                _prepare_branch(branch2, snap2, ignore_arch=ignore_arch, engine=engine),
+            )
+    result["meta"] = {**_meta(budget, hedge, version_cache), "options": options, **result.get("meta", {})}  # type: ignore[dict-item]
+    if profiler is not None:
+        result["timings"] = profiler.as_dict()
+    return result
 
-    only1: list[PackageInfo] = []
-    only2: list[PackageInfo] = []
-    higher1: list[PackageInfo] = []
-    higher2: list[PackageInfo] = []
 
-    keys1 = set(idx1.keys())
-    keys2 = set(idx2.keys())
+def compare_matrix(
+    branches: Iterable[str],
+    *,
+    pairs: Iterable[tuple[str, str]] | None = None,
+    ignore_arch: bool = False,
+    arches: set[str] | None = None,
+    timeout_s: float = 30.0,
+    session: requests.Session | None = None,
+    max_packages: int | None = None,
+    name_patterns: Iterable[Pattern[str]] | None = None,
+    user_agent: str | None = None,
+    headers: dict[str, str] | None = None,
+    retries: int = 3,
+    retry_backoff: float = 0.3,
+    session_factory: Callable[[], requests.Session] | None = None,
+    allow_concurrency_with_session: bool = False,
+    cache: SnapshotCache | None = None,
+    snapshots: Mapping[str, BranchSnapshot] | None = None,
+    max_total_retries: int | None = None,
+    deadline_s: float | None = None,
+    hedge_after_s: HedgeAfter | None = None,
+    arch_query: bool = True,
+    version_cache: VersionCache | None = None,
+    engine: DiffEngine = "hash",
+    workers: int | None = None,
+    singleflight: SingleFlight[BranchSnapshot] | None = None,
+    profiler: StageProfiler | None = None,
+) -> dict[str, object]:
+    """Compare several branches pairwise, fetching and indexing each branch only once.
+
+    ``pairs`` defaults to every unordered pair of ``branches`` in the given order. Each entry
+    of ``comparisons`` in the returned dict has the same shape as :func:`compare_packages`;
+    ``stats`` sums the differences over all pairs. Other options match ``compare_packages``;
+    the retry budget is shared by every branch fetch. With ``engine="merge"`` each branch is
+    sorted once and reused by every pair it takes part in. ``workers=N`` shards every pair
+    over N processes as in :func:`compare_packages`. ``singleflight`` coalesces branch
+    fetches with concurrent calls, as in :func:`compare_packages`. ``profiler`` adds
+    ``timings`` as in :func:`compare_packages`.
+    """
 
-    for key in keys1 - keys2:
-        only1.append(idx1[key])
-    for key in keys2 - keys1:
-        only2.append(idx2[key])
-
-    for key in keys1 & keys2:
-        a = idx1[key]
-        b = idx2[key]
-        rc = compare_evr(
-            EVR(epoch=a.epoch, version=a.version, release=a.release),
-            EVR(epoch=b.epoch, version=b.version, release=b.release),
-        )
-        if rc > 0:
-            higher1.append(a)
-        elif rc < 0:
-            higher2.append(b)
+    _check_engine(engine)
+    _check_workers(workers)
+    branch_list = list(dict.fromkeys(branches))
+    pair_list = list(pairs) if pairs is not None else list(combinations(branch_list, 2))
+    for pair in pair_list:
+        for branch in pair:
+            if branch not in branch_list:
+                branch_list.append(branch)
+    if not pair_list:
+        raise ValueError("compare_matrix needs at least two distinct branches")
+
+    name_filter = _name_filter(name_patterns)
+    budget = RetryBudget(max_total_retries)
+    deadline = Deadline.after(deadline_s)
+    hedge = _hedge_stats(hedge_after_s)
+    profiler = profiler if profiler is not None else active_profiler()
+
+    fetched = _fetch_snapshots(
+        branch_list,
+        fetch_kwargs=dict(
+            timeout_s=timeout_s,
+            arches=arches,
+            max_packages=max_packages,
+            user_agent=user_agent,
+            headers=headers,
+            retries=retries,
+            retry_backoff=retry_backoff,
+            cache=cache,
+            retry_budget=budget,
+            deadline=deadline,
+            hedge_stats=hedge,
+            arch_query=arch_query,
+            name_filter=name_filter,
+            singleflight=singleflight,
+            profiler=profiler,
+        ),
+        session=session,
+        session_factory=session_factory,
+        allow_concurrency_with_session=allow_concurrency_with_session,
+        snapshots=snapshots,
+    )
 
-    sort_key = (lambda p: (p.name, p.arch)) if not ignore_arch else (lambda p: p.name)
-    only1.sort(key=sort_key)
-    only2.sort(key=sort_key)
-    higher1.sort(key=sort_key)
-    higher2.sort(key=sort_key)
+    if deadline is not None:
+        deadline.check("comparing packages")
 
     generated_at = datetime.now(timezone.utc).isoformat()
-    diff_total = len(only1) + len(only2) + len(higher1) + len(higher2)
+    with use_profiler(profiler):
+        prepared = {
+            branch: _prepare_snapshot(fetched[branch], branch=branch, name_filter=name_filter) for branch in branch_list
+        }
+        total_indexed: dict[str, int] = {}
+        if workers is not None and workers > 1:
+            with profiling.stage("diff_workers"):
+                diffs = _diff_in_workers(
+                    pair_list, prepared, workers=workers, ignore_arch=ignore_arch, engine=engine, deadline=deadline
+                )
+            comparisons = []
+            for (b1, b2), rows in zip(pair_list, diffs, strict=True):
+                comparisons.append(_diff_result(b1, prepared[b1], b2, prepared[b2], rows, generated_at=generated_at))
+                total_indexed[b1], total_indexed[b2] = rows.total1, rows.total2
+            for branch in branch_list:
+                if branch not in total_indexed:  # listed in ``branches`` but in no pair
+                    total_indexed[branch] = len(_prepare_branch(branch, prepared[branch], ignore_arch=ignore_arch, engine=engine))
+        else:
+            indexed: dict[str, _IndexedBranch | _SortedBranch] = {}
+            with use_version_cache(version_cache):
+                for branch in branch_list:
+                    indexed[branch] = _prepare_branch(branch, prepared[branch], ignore_arch=ignore_arch, engine=engine)
+                    total_indexed[branch] = len(indexed[branch])
+
+                comparisons = [
+                    _diff_branches(indexed[b1], indexed[b2], generated_at=generated_at) for b1, b2 in pair_list
+                ]
 
     result: dict[str, object] = {
-        "branch1": branch1,
-        "branch2": branch2,
+        "branches": branch_list,
         "generated_at": generated_at,
-        "packages_only_in_branch1": [p.to_dict(branch=branch1) for p in only1],
-        "packages_only_in_branch2": [p.to_dict(branch=branch2) for p in only2],
-        "packages_with_higher_version_in_branch1": [p.to_dict(branch=branch1) for p in higher1],
-        "packages_with_higher_version_in_branch2": [p.to_dict(branch=branch2) for p in higher2],
+        "comparisons": comparisons,
         "stats": {
-            "only_in_branch1": len(only1),
-            "only_in_branch2": len(only2),
-            "higher_in_branch1": len(higher1),
-            "higher_in_branch2": len(higher2),
-            "total_branch1_indexed": len(idx1),
-            "total_branch2_indexed": len(idx2),
-            "differences": diff_total,
+            "pairs": len(comparisons),
+            "total_indexed": {branch: total_indexed[branch] for branch in branch_list},
+            "differences": sum(c["stats"]["differences"] for c in comparisons),  # type: ignore[index]
         },
+        "meta": _meta(budget, hedge, version_cache),
     }
-
+    if profiler is not None:
+        result["timings"] = profiler.as_dict()
     return result
-
-
-def _clone_session(base: requests.Session) -> requests.Session:
-    """Create a lightweight copy of a requests.Session for safe parallel use."""
-
-    clone = requests.Session()
-    clone.headers.update(base.headers)
-    clone.cookies.update(base.cookies)
-    clone.auth = base.auth
-    clone.verify = base.verify
-    clone.cert = base.cert
-    clone.proxies = dict(base.proxies)
-    clone.trust_env = base.trust_env
-
-    return clone
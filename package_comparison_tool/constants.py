@@ -0,0 +1,22 @@
+"""Option choices and defaults shared by the CLI and the modules implementing them.
+
+This module imports nothing else from the package, so the CLI can build its options (and
+answer ``--help`` or ``--version``) without loading the HTTP client or the diff engine.
+"""
+
+from __future__ import annotations
+
+from typing import Literal
+
+DiffEngine = Literal["hash", "merge"]
+DIFF_ENGINES: tuple[DiffEngine, ...] = ("hash", "merge")
+
+JsonStyle = Literal["compact", "pretty"]
+JSON_STYLES: tuple[JsonStyle, ...] = ("compact", "pretty")
+
+# ``package-comparison serve``
+DEFAULT_REFRESH_S = 300.0
+DEFAULT_MAX_CONCURRENT = 8
+DEFAULT_RESULT_CACHE_SIZE = 128
+DEFAULT_QUEUE_TIMEOUT_S = 10.0
+DEFAULT_MAX_SNAPSHOTS = 64
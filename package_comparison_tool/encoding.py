@@ -0,0 +1,185 @@
+"""JSON encoding backends for reports.
+
+:class:`JsonEncoder` encodes the pieces :func:`~package_comparison_tool.formatting.write_json`
+streams: flat mappings (package rows, stats) and scalars. It uses `orjson
+<https://github.com/ijl/orjson>`_ for flat rows when it is installed (``pip install
+package-comparison-tool[fast]``) and the stdlib otherwise; rows holding floats always go
+through the stdlib, so the output is byte-for-byte the same with either backend.
+
+Rows of lazy :class:`~package_comparison_tool.result.PackageList` buckets skip both: they are
+pre-encoded straight from the snapshot columns with one string template, and each distinct
+name, version, arch, ... string is escaped only once.
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Callable, Iterator, Mapping, Sequence
+from json.encoder import encode_basestring  # type: ignore[attr-defined]
+from typing import Any
+
+from .constants import JSON_STYLES, JsonStyle
+from .models import package_url
+from .result import PackageList
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None  # type: ignore[assignment]
+
+_SCALARS = frozenset({str, int, bool, type(None)})
+# Key order of package dicts (see ``models.package_to_dict``) and the snapshot column behind each.
+_PACKAGE_KEYS = ("branch", "name", "epoch", "version", "release", "arch", "buildtime", "disttag", "url")
+
+
+def json_backend() -> str:
+    """Name of the backend used for flat rows: ``"orjson"`` or ``"json"``."""
+
+    return "json" if orjson is None else "orjson"
+
+
+class JsonEncoder:
+    """Encoder for one output layout.
+
+    ``indent`` selects two-space indentation (the layout of ``json.dumps(indent=2)``), in
+    which case ``separators`` only sets the key separator. Instances are stateless and may be
+    shared between threads.
+    """
+
+    def __init__(
+        self,
+        *,
+        indent: bool,
+        sort_keys: bool,
+        separators: tuple[str, str],
+        default: Callable[[Any], Any] | None = None,
+        use_orjson: bool = True,
+    ):
+        self.indent = indent
+        self.sort_keys = sort_keys
+        self.item_separator = "," if indent else separators[0]
+        self.key_separator = separators[1]
+        self.default = default
+        self._dumps_kwargs: dict[str, Any] = {"ensure_ascii": False, "default": default, "sort_keys": sort_keys}
+        if indent:
+            self._dumps_kwargs.update(indent=2, separators=(",", self.key_separator))
+        else:
+            self._dumps_kwargs.update(separators=separators)
+        # Control characters are always escaped inside JSON strings, so a raw NUL in this
+        # encoder's output can only be an item separator; indented rows swap it for ",\n<pad>".
+        # This keeps the C encoder (which ignores ``indent``) for flat mappings.
+        self._flat = json.JSONEncoder(
+            ensure_ascii=False,
+            sort_keys=sort_keys,
+            separators=("\x00", self.key_separator) if indent else separators,
+            default=default,
+        )
+        self._orjson_option: int | None = None
+        orjson_layout = (indent and self.key_separator == ": ") or (not indent and separators == (",", ":"))
+        if use_orjson and orjson is not None and orjson_layout:
+            self._orjson_option = (orjson.OPT_SORT_KEYS if sort_keys else 0) | (orjson.OPT_INDENT_2 if indent else 0)
+
+    @classmethod
+    def for_style(cls, style: JsonStyle, *, default: Callable[[Any], Any] | None = None) -> JsonEncoder:
+        """Encoder for ``--json-style``: both styles sort keys; ``compact`` has no whitespace."""
+
+        if style == "pretty":
+            return cls(indent=True, sort_keys=True, separators=(",", ": "), default=default)
+        if style == "compact":
+            return cls(indent=False, sort_keys=True, separators=(",", ":"), default=default)
+        raise ValueError(f"unknown JSON style {style!r} (expected one of: {', '.join(JSON_STYLES)})")
+
+    @property
+    def backend(self) -> str:
+        return "json" if self._orjson_option is None else "orjson"
+
+    def newline(self, level: int) -> str:
+        return "\n" + "  " * level if self.indent else ""
+
+    def key(self, key: object) -> str:
+        return encode_basestring(key if isinstance(key, str) else str(key)) + self.key_separator
+
+    def flat(self, mapping: Mapping[Any, object], level: int) -> str | None:
+        """Encode a mapping holding only scalars, or return ``None`` if it holds containers."""
+
+        floats = False
+        for item in mapping.values():
+            kind = type(item)
+            if kind is float:
+                floats = True
+            elif kind not in _SCALARS:  # exact checks: this runs once per row
+                return None
+        if not mapping:
+            return "{}"
+
+        if self._orjson_option is not None and not floats and type(mapping) is dict:
+            try:
+                encoded = orjson.dumps(mapping, option=self._orjson_option).decode()
+            except TypeError:  # e.g. integers beyond 64 bits
+                pass
+            else:
+                return encoded.replace("\n", self.newline(level)) if self.indent and level else encoded
+
+        encoded = self._flat.encode(mapping if isinstance(mapping, dict) else dict(mapping))
+        if not self.indent:
+            return encoded
+        return "{" + self.newline(level + 1) + encoded[1:-1].replace("\x00", "," + self.newline(level + 1)) + self.newline(level) + "}"
+
+    def value(self, value: object, level: int) -> str:
+        """Encode anything else (scalars, or objects handled by ``default``)."""
+
+        encoded = json.dumps(value, **self._dumps_kwargs)
+        return encoded.replace("\n", self.newline(level)) if self.indent and level else encoded
+
+    def package_rows(self, packages: PackageList, level: int) -> Iterator[str]:
+        """Encode the rows of a lazy bucket as ``encode(package_dict)`` would, without the dicts."""
+
+        snapshot = packages.snapshot
+        keys = sorted(_PACKAGE_KEYS) if self.sort_keys else list(_PACKAGE_KEYS)
+        inner, outer = self.newline(level + 1), self.newline(level)
+        # One str.format template per bucket, taking the escaped string contents (without
+        # quotes) in _PACKAGE_KEYS order. JSON escaping works character by character, so the
+        # URL is assembled from the already escaped branch, name and arch.
+        values = {key: f'"{{{index}}}"' for index, key in enumerate(_PACKAGE_KEYS)}
+        values.update(epoch="{2}", buildtime="{6}", url=f'"{package_url("{0}", "{1}", "{5}")}"')
+        fields = (self.item_separator + inner).join(
+            self.key(key).replace("{", "{{").replace("}", "}}") + values[key] for key in keys
+        )
+        template = "{{" + inner + fields + outer + "}}"
+
+        # Each distinct string is escaped once, on first use.
+        name, version, release, arch, disttag = (
+            _EscapedStrings(snapshot.strings(field)) for field in ("name", "version", "release", "arch", "disttag")
+        )
+        codes = snapshot.codes
+        name_codes, version_codes, release_codes = codes["name"], codes["version"], codes["release"]
+        arch_codes, disttag_codes = codes["arch"], codes["disttag"]
+        epochs, buildtimes = snapshot.epoch, snapshot.buildtime
+        branch = encode_basestring(packages.branch)[1:-1]
+        render = template.format
+
+        for row in packages.row_numbers:
+            yield render(
+                branch,
+                name[name_codes[row]],
+                epochs[row],
+                version[version_codes[row]],
+                release[release_codes[row]],
+                arch[arch_codes[row]],
+                buildtimes[row],
+                disttag[disttag_codes[row]],
+            )
+
+
+class _EscapedStrings(dict):  # type: ignore[type-arg]
+    """Lazily filled ``code -> JSON-escaped string (without quotes)`` map over a string table."""
+
+    __slots__ = ("_table",)
+
+    def __init__(self, table: Sequence[str]):
+        super().__init__()
+        self._table = table
+
+    def __missing__(self, code: int) -> str:
+        escaped = self[code] = encode_basestring(self._table[code])[1:-1]
+        return escaped
@@ -10,3 +10,10 @@ class BranchNotFoundError(AltApiError):
         super().__init__(f'Branch "{branch}" not found in ALT RDB API.')
         self.branch = branch
 
+
+
+class DeadlineExceededError(AltApiError):
+    def __init__(self, deadline_s: float, activity: str):
+        super().__init__(f"Deadline of {deadline_s:g}s exceeded while {activity}.")
+        self.deadline_s = deadline_s
+        self.activity = activity
@@ -0,0 +1,127 @@
+"""Package-name filtering with many patterns.
+
+:class:`NameFilter` keeps ``re.search`` semantics ("the name matches any pattern") but
+avoids one regex search per pattern per package:
+
+* literal patterns (``nginx``, ``^python3-``, ``gcc-c\\+\\+``) become a single
+  ``str.startswith`` call with a tuple of prefixes and one alternation of escaped
+  substrings (the regex engine scans the name once for all of them);
+* the remaining patterns are merged into one alternation per set of flags where that is
+  safe (no groups, so no back-references can shift);
+* results are memoized per name, so names present in several branches are matched once.
+"""
+
+from __future__ import annotations
+
+import re
+from collections.abc import Callable, Iterable
+from re import Pattern
+
+_META = frozenset(".^$*+?{}[]|()\\")
+# Flags that do not change how an ASCII literal matches.
+_LITERAL_FLAGS = re.IGNORECASE | re.UNICODE
+
+
+def _literal(source: str) -> str | None:
+    """Return the text a pattern matches literally, or ``None`` if it uses regex syntax."""
+
+    chars: list[str] = []
+    escaped = False
+    for char in source:
+        if escaped:
+            if char.isalnum():  # \d, \w, \b, ... are classes or anchors, not literals
+                return None
+            chars.append(char)
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char in _META:
+            return None
+        else:
+            chars.append(char)
+    return None if escaped else "".join(chars)
+
+
+class NameFilter:
+    """Callable that tells whether a package name matches any of ``patterns``.
+
+    Patterns may be strings or compiled patterns; their flags are respected. Instances are
+    safe to share between threads (the memo only ever gains entries).
+    """
+
+    def __init__(self, patterns: Iterable[Pattern[str] | str]):
+        self.patterns = tuple(re.compile(p) if isinstance(p, str) else p for p in patterns)
+        if not self.patterns:
+            raise ValueError("NameFilter needs at least one pattern")
+
+        prefixes: dict[bool, list[str]] = {False: [], True: []}
+        substrings: dict[bool, list[str]] = {False: [], True: []}
+        literal_patterns: list[Pattern[str]] = []
+        by_flags: dict[int, list[Pattern[str]]] = {}
+
+        for pattern in self.patterns:
+            source, flags = pattern.pattern, pattern.flags
+            anchored = source.startswith("^")
+            text = _literal(source[1:] if anchored else source)
+            if text is not None and text.isascii() and not flags & ~_LITERAL_FLAGS:
+                ignore_case = bool(flags & re.IGNORECASE)
+                (prefixes if anchored else substrings)[ignore_case].append(text.lower() if ignore_case else text)
+                literal_patterns.append(pattern)
+            else:
+                by_flags.setdefault(flags, []).append(pattern)
+
+        self._prefixes = tuple(prefixes[False])
+        self._prefixes_ci = tuple(prefixes[True])
+        self._substrings = _substring_search(substrings[False])
+        self._substrings_ci = _substring_search(substrings[True])
+        self._literal_patterns = tuple(literal_patterns)
+        self._regexes = tuple(r for group in by_flags.values() for r in _merge(group))
+        self._memo: dict[str, bool] = {}
+
+    def __call__(self, name: str) -> bool:
+        try:
+            return self._memo[name]
+        except KeyError:
+            matched = self._memo[name] = self._match(name)
+            return matched
+
+    def _match(self, name: str) -> bool:
+        if name.isascii():
+            if self._match_literals(name):
+                return True
+        elif any(p.search(name) for p in self._literal_patterns):
+            # Case folding of non-ASCII names is left to the regex engine.
+            return True
+        return any(r.search(name) for r in self._regexes)
+
+    def _match_literals(self, name: str) -> bool:
+        if self._prefixes and name.startswith(self._prefixes):
+            return True
+        if self._substrings is not None and self._substrings(name) is not None:
+            return True
+        if self._prefixes_ci or self._substrings_ci is not None:
+            lowered = name.lower()
+            if self._prefixes_ci and lowered.startswith(self._prefixes_ci):
+                return True
+            return self._substrings_ci is not None and self._substrings_ci(lowered) is not None
+        return False
+
+
+def _substring_search(substrings: list[str]) -> Callable[[str], object] | None:
+    if not substrings:
+        return None
+    alternation = "|".join(re.escape(s) for s in dict.fromkeys(substrings))
+    return re.compile(alternation).search
+
+
+def _merge(patterns: list[Pattern[str]]) -> list[Pattern[str]]:
+    """Combine patterns sharing the same flags into one alternation where that is safe."""
+
+    mergeable = [p for p in patterns if not p.groups]
+    if len(mergeable) < 2:
+        return patterns
+    try:
+        merged = re.compile("|".join(f"(?:{p.pattern})" for p in mergeable), mergeable[0].flags)
+    except re.error:  # e.g. inline global flags, which must start the whole expression
+        return patterns
+    return [merged, *(p for p in patterns if p.groups)]
@@ -1,13 +1,40 @@
+"""Report rendering.
+
+Every format has a ``write_*`` function that emits the report to a text file object section
+by section and row by row, so a full (``--limit 0``) report never exists as one string, and
+a ``format_*`` wrapper returning the same text as a string.
+"""
+
 from __future__ import annotations
 
+import io
+import itertools
 import json
-from collections.abc import Iterable
-from typing import TypeVar
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from typing import Any, TextIO, TypeVar
+
+from . import profiling
+from .constants import JSON_STYLES, JsonStyle
+from .encoding import JsonEncoder
+from .result import CompareResult, PackageList
 
 T = TypeVar("T")
 
+_END = object()
+
+
+def _pkg_mapping(pkg: object, *, branch: str) -> Mapping[str, object] | None:
+    """Accept result dicts as well as package rows (``PackageInfo``/``PackageRow``)."""
+
+    if isinstance(pkg, Mapping):
+        return pkg
+    to_dict = getattr(pkg, "to_dict", None)
+    if callable(to_dict):
+        return to_dict(branch=branch)
+    return None
+
 
-def _evr(pkg: dict[str, object]) -> str:
+def _evr(pkg: Mapping[str, object]) -> str:
     epoch = pkg.get("epoch") or 0
     version = pkg.get("version") or ""
     release = pkg.get("release") or ""
@@ -17,153 +44,364 @@ def _evr(pkg: dict[str, object]) -> str:
     return evr
 
 
-def _limit_items(items: Iterable[T], limit: int | None) -> tuple[list[T], bool]:
+def _iter_limited(items: Iterable[T], limit: int | None) -> tuple[Iterator[T], Callable[[], bool]]:
+    """Return the first ``limit`` items and a callable telling (once they are consumed) if more existed."""
+
     normalized_limit = None if limit is None or limit <= 0 else limit
     if normalized_limit is None:
-        return list(items), False
+        return iter(items), lambda: False
+    if isinstance(items, Sequence):
+        # Slicing lazy package lists materializes only the rows that are shown.
+        return iter(items[:normalized_limit]), lambda: len(items) > normalized_limit
 
-    collected: list[T] = []
-    for idx, item in enumerate(items):
-        if idx >= normalized_limit:
-            return collected, True
-        collected.append(item)
-    return collected, False
+    iterator = iter(items)
+    return itertools.islice(iterator, normalized_limit), lambda: next(iterator, _END) is not _END
 
 
-def _format_pkg_line(pkg: dict[str, object]) -> str:
+def _format_pkg_line(pkg: Mapping[str, object]) -> str:
     arch = pkg.get("arch", "")
     evr = _evr(pkg)
     name = str(pkg.get("name", ""))
     return f"{name} {evr} [{arch}]"
 
 
-def format_summary(result: dict[str, object], *, limit: int | None = None) -> str:
-    stats = result.get("stats", {}) if isinstance(result, dict) else {}
-    branch1 = result.get("branch1", "") if isinstance(result, dict) else ""
-    branch2 = result.get("branch2", "") if isinstance(result, dict) else ""
-    generated_at = result.get("generated_at", "") if isinstance(result, dict) else ""
-
-    lines = [
-        f"Comparison: {branch1} vs {branch2}",
-        f"Generated at: {generated_at}",
-        f"Only in {branch1}: {stats.get('only_in_branch1', 0)}",
-        f"Only in {branch2}: {stats.get('only_in_branch2', 0)}",
-        f"Higher versions in {branch1}: {stats.get('higher_in_branch1', 0)}",
-        f"Higher versions in {branch2}: {stats.get('higher_in_branch2', 0)}",
-        f"Total differences: {stats.get('differences', 0)}",
+def _sections(result: Mapping[str, object], branch1: str, branch2: str) -> list[tuple[str, str, object]]:
+    return [
+        ("Only in " + branch1, branch1, result.get("packages_only_in_branch1", [])),
+        ("Only in " + branch2, branch2, result.get("packages_only_in_branch2", [])),
+        ("Higher in " + branch1, branch1, result.get("packages_with_higher_version_in_branch1", [])),
+        ("Higher in " + branch2, branch2, result.get("packages_with_higher_version_in_branch2", [])),
     ]
 
-    sections = [
-        ("Only in " + str(branch1), result.get("packages_only_in_branch1", [])),
-        ("Only in " + str(branch2), result.get("packages_only_in_branch2", [])),
-        (
-            "Higher in " + str(branch1),
-            result.get("packages_with_higher_version_in_branch1", []),
-        ),
-        (
-            "Higher in " + str(branch2),
-            result.get("packages_with_higher_version_in_branch2", []),
-        ),
-    ]
 
-    for title, items_obj in sections:
+def _write_lines(fp: TextIO, lines: Iterable[str]) -> None:
+    for line in lines:
+        fp.write(line)
+        fp.write("\n")
+
+
+def write_summary(result: Mapping[str, object], fp: TextIO, *, limit: int | None = None) -> None:
+    """Write the plain-text summary to ``fp`` section by section (see :func:`format_summary`)."""
+
+    stats = result.get("stats", {}) if isinstance(result, Mapping) else {}
+    branch1 = result.get("branch1", "") if isinstance(result, Mapping) else ""
+    branch2 = result.get("branch2", "") if isinstance(result, Mapping) else ""
+    generated_at = result.get("generated_at", "") if isinstance(result, Mapping) else ""
+
+    fp.write(
+        f"Comparison: {branch1} vs {branch2}\n"
+        f"Generated at: {generated_at}\n"
+        f"Only in {branch1}: {stats.get('only_in_branch1', 0)}\n"
+        f"Only in {branch2}: {stats.get('only_in_branch2', 0)}\n"
+        f"Higher versions in {branch1}: {stats.get('higher_in_branch1', 0)}\n"
+        f"Higher versions in {branch2}: {stats.get('higher_in_branch2', 0)}\n"
+        f"Total differences: {stats.get('differences', 0)}\n"
+    )
+
+    for title, branch, items_obj in _sections(result, str(branch1), str(branch2)):
         if not isinstance(items_obj, Iterable):
             continue
 
-        items, truncated = _limit_items(items_obj, limit)
-        if not items and not truncated:
+        items, truncated = _iter_limited(items_obj, limit)
+        first = next(items, _END)
+        if first is _END:  # a positive limit cannot truncate an empty section
             continue
 
-        lines.append("")
-        lines.append(f"{title}:")
-        for pkg in items:
-            if not isinstance(pkg, dict):
-                continue
-            lines.append(f"- {_format_pkg_line(pkg)}")
-        if truncated:
-            lines.append(f"... and more (limited to first {limit})")
+        fp.write(f"\n{title}:\n")
+        for item in itertools.chain((first,), items):
+            pkg = _pkg_mapping(item, branch=branch)
+            if pkg is not None:
+                fp.write(f"- {_format_pkg_line(pkg)}\n")
+        if truncated():
+            fp.write(f"... and more (limited to first {limit})\n")
 
-    return "\n".join(lines).rstrip() + "\n"
 
+def format_summary(result: Mapping[str, object], *, limit: int | None = None) -> str:
+    buffer = io.StringIO()
+    write_summary(result, buffer, limit=limit)
+    return buffer.getvalue()
 
-def _markdown_table(items: Iterable[dict[str, object]], limit: int | None = None) -> list[str]:
-    rows, truncated = _limit_items(items, limit)
-    lines = ["| Name | EVR | Arch | Branch | Disttag |", "| --- | --- | --- | --- | --- |"]
 
-    for pkg in rows:
-        if not isinstance(pkg, dict):
+def _write_markdown_table(fp: TextIO, items: Iterable[object], limit: int | None = None, *, branch: str = "") -> None:
+    rows, truncated = _iter_limited(items, limit)
+    fp.write("| Name | EVR | Arch | Branch | Disttag |\n| --- | --- | --- | --- | --- |\n")
+
+    for item in rows:
+        pkg = _pkg_mapping(item, branch=branch)
+        if pkg is None:
             continue
         name = str(pkg.get("name", ""))
         url = str(pkg.get("url", "")) if pkg.get("url") else ""
         name_cell = f"[{name}]({url})" if url else name
         evr = _evr(pkg)
         arch = pkg.get("arch", "")
-        branch = pkg.get("branch", "")
+        row_branch = pkg.get("branch", branch)
         disttag = pkg.get("disttag", "")
-        lines.append(f"| {name_cell} | {evr} | {arch} | {branch} | {disttag} |")
-
-    if truncated:
-        lines.append(f"| … | … | … | … | showing first {limit} |")
-    return lines
-
-
-def format_markdown(result: dict[str, object], *, limit: int | None = None) -> str:
-    branch1 = result.get("branch1", "") if isinstance(result, dict) else ""
-    branch2 = result.get("branch2", "") if isinstance(result, dict) else ""
-    stats = result.get("stats", {}) if isinstance(result, dict) else {}
-    generated_at = result.get("generated_at", "") if isinstance(result, dict) else ""
-
-    lines = [
-        f"# Package comparison: {branch1} vs {branch2}",
-        "",
-        f"- Generated at: `{generated_at}`",
-        f"- Total differences: `{stats.get('differences', 0)}`",
-        f"- Only in {branch1}: `{stats.get('only_in_branch1', 0)}`",
-        f"- Only in {branch2}: `{stats.get('only_in_branch2', 0)}`",
-        f"- Higher in {branch1}: `{stats.get('higher_in_branch1', 0)}`",
-        f"- Higher in {branch2}: `{stats.get('higher_in_branch2', 0)}`",
-    ]
-
-    sections = [
-        ("Only in " + str(branch1), result.get("packages_only_in_branch1", [])),
-        ("Only in " + str(branch2), result.get("packages_only_in_branch2", [])),
-        (
-            "Higher in " + str(branch1),
-            result.get("packages_with_higher_version_in_branch1", []),
-        ),
-        (
-            "Higher in " + str(branch2),
-            result.get("packages_with_higher_version_in_branch2", []),
-        ),
-    ]
-
-    for title, items in sections:
+        fp.write(f"| {name_cell} | {evr} | {arch} | {row_branch} | {disttag} |\n")
+
+    if truncated():
+        fp.write(f"| … | … | … | … | showing first {limit} |\n")
+
+
+def write_markdown(result: Mapping[str, object], fp: TextIO, *, limit: int | None = None, _level: int = 1) -> None:
+    """Write the Markdown report to ``fp`` table row by table row (see :func:`format_markdown`)."""
+
+    branch1 = result.get("branch1", "") if isinstance(result, Mapping) else ""
+    branch2 = result.get("branch2", "") if isinstance(result, Mapping) else ""
+    stats = result.get("stats", {}) if isinstance(result, Mapping) else {}
+    generated_at = result.get("generated_at", "") if isinstance(result, Mapping) else ""
+    heading = "#" * _level
+
+    _write_lines(
+        fp,
+        [
+            f"{heading} Package comparison: {branch1} vs {branch2}",
+            "",
+            f"- Generated at: `{generated_at}`",
+            f"- Total differences: `{stats.get('differences', 0)}`",
+            f"- Only in {branch1}: `{stats.get('only_in_branch1', 0)}`",
+            f"- Only in {branch2}: `{stats.get('only_in_branch2', 0)}`",
+            f"- Higher in {branch1}: `{stats.get('higher_in_branch1', 0)}`",
+            f"- Higher in {branch2}: `{stats.get('higher_in_branch2', 0)}`",
+        ],
+    )
+
+    for title, branch, items in _sections(result, str(branch1), str(branch2)):
         if not isinstance(items, Iterable):
             continue
-        lines.append("")
-        lines.append(f"## {title}")
-        lines.extend(_markdown_table(items, limit=limit))
-
-    return "\n".join(lines).rstrip() + "\n"
-
+        fp.write(f"\n{heading}# {title}\n")
+        _write_markdown_table(fp, items, limit=limit, branch=branch)
+
+
+def format_markdown(result: Mapping[str, object], *, limit: int | None = None) -> str:
+    buffer = io.StringIO()
+    write_markdown(result, buffer, limit=limit)
+    return buffer.getvalue()
+
+
+def _json_default(obj: object) -> Any:
+    if isinstance(obj, CompareResult):
+        return obj.to_dict()
+    if isinstance(obj, PackageList):
+        return obj.to_list()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+_ROW_BATCH = 1024  # pre-encoded rows joined per write
+
+_ENCODERS = {
+    "pretty": JsonEncoder.for_style("pretty", default=_json_default),
+    "compact": JsonEncoder.for_style("compact", default=_json_default),
+    # ``pretty=False`` without a style: the ``json.dumps`` defaults (spaces, insertion order).
+    None: JsonEncoder(indent=False, sort_keys=False, separators=(", ", ": "), default=_json_default),
+}
+
+
+def _write_json_value(fp: TextIO, value: object, *, enc: JsonEncoder, level: int) -> None:
+    """Write ``value`` like ``json.dumps`` would, streaming nested mappings and lists.
+
+    Mappings holding only scalars (package rows, stats) are encoded in one call and lazy
+    package lists are pre-encoded row by row; only the containers above them are walked
+    here, one entry at a time.
+    """
+
+    if type(value) is dict or isinstance(value, Mapping):
+        flat = enc.flat(value, level)  # type: ignore[arg-type]
+        if flat is not None:
+            fp.write(flat)
+            return
+        keys = sorted(value) if enc.sort_keys else list(value)  # type: ignore[call-overload]
+        fp.write("{")
+        for index, key in enumerate(keys):
+            fp.write((enc.item_separator if index else "") + enc.newline(level + 1) + enc.key(key))
+            _write_json_value(fp, value[key], enc=enc, level=level + 1)  # type: ignore[index]
+        fp.write(enc.newline(level) + "}")
+        return
+
+    if isinstance(value, (list, tuple, PackageList)):
+        if not value:
+            fp.write("[]")
+            return
+        fp.write("[")
+        if isinstance(value, PackageList):
+            rows = enc.package_rows(value, level + 1)
+            separator = enc.item_separator + enc.newline(level + 1)
+            fp.write(enc.newline(level + 1))
+            for index, chunk in enumerate(iter(lambda: list(itertools.islice(rows, _ROW_BATCH)), [])):
+                fp.write((separator if index else "") + separator.join(chunk))
+        else:
+            for index, item in enumerate(value):
+                fp.write((enc.item_separator if index else "") + enc.newline(level + 1))
+                _write_json_value(fp, item, enc=enc, level=level + 1)
+        fp.write(enc.newline(level) + "]")
+        return
+
+    fp.write(enc.value(value, level))
+
+
+def write_json(
+    result: Mapping[str, object], fp: TextIO, *, pretty: bool = True, style: JsonStyle | None = None
+) -> None:
+    """Write ``result`` as JSON to ``fp``, one package row at a time.
+
+    Without ``style`` the output is that of :func:`format_json` with the same ``pretty``.
+    ``style="pretty"`` (the ``pretty=True`` layout) and ``style="compact"`` (no whitespace)
+    both sort keys, so the bytes only depend on the result. Lazy package lists are never
+    materialized as a whole.
+    """
+
+    if style is not None and style not in JSON_STYLES:
+        raise ValueError(f"unknown JSON style {style!r} (expected one of: {', '.join(JSON_STYLES)})")
+    enc = _ENCODERS[style if style is not None else "pretty" if pretty else None]
+    _write_json_value(fp, result, enc=enc, level=0)
+    fp.write("\n")
+
+
+def format_json(result: Mapping[str, object], *, pretty: bool = True, style: JsonStyle | None = None) -> str:
+    buffer = io.StringIO()
+    write_json(result, buffer, pretty=pretty, style=style)
+    return buffer.getvalue()
+
+
+_NDJSON_CATEGORIES = (
+    ("only_in_branch1", "packages_only_in_branch1", "branch1"),
+    ("only_in_branch2", "packages_only_in_branch2", "branch2"),
+    ("higher_in_branch1", "packages_with_higher_version_in_branch1", "branch1"),
+    ("higher_in_branch2", "packages_with_higher_version_in_branch2", "branch2"),
+)
+_LINE_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=_json_default)
+
+
+def _write_record(fp: TextIO, record: Mapping[str, object]) -> None:
+    fp.write(_LINE_ENCODER.encode(record))
+    fp.write("\n")
+
+
+def _write_ndjson_comparison(result: Mapping[str, object], fp: TextIO) -> None:
+    branches = {side: str(result.get(side, "")) for side in ("branch1", "branch2")}
+    _write_record(fp, {"record": "header", **branches, "generated_at": result.get("generated_at", "")})
+    for category, key, side in _NDJSON_CATEGORIES:
+        items = result.get(key, [])
+        if not isinstance(items, Iterable):
+            continue
+        for item in items:
+            pkg = _pkg_mapping(item, branch=branches[side])
+            if pkg is not None:
+                _write_record(fp, {"record": "package", "category": category, **pkg})
+    trailer: dict[str, object] = {"record": "stats", "stats": result.get("stats", {})}
+    if "meta" in result:
+        trailer["meta"] = result["meta"]
+    _write_record(fp, trailer)
+
+
+def write_ndjson(result: Mapping[str, object], fp: TextIO) -> None:
+    """Write ``result`` as newline-delimited JSON, one compact object per line.
+
+    Each comparison is a ``{"record": "header", ...}`` line (branches, ``generated_at``),
+    one ``{"record": "package", "category": ..., ...}`` line per differing package (category
+    is ``only_in_branch1``, ``only_in_branch2``, ``higher_in_branch1`` or ``higher_in_branch2``;
+    the remaining keys are the usual package fields) and a ``{"record": "stats", ...}`` trailer.
+    A matrix is framed by a ``"matrix"`` record and a ``"matrix_stats"`` trailer. Package lines
+    are produced from the lazy result rows one at a time.
+    """
+
+    if "comparisons" not in result:
+        _write_ndjson_comparison(result, fp)
+        return
+
+    _write_record(fp, {"record": "matrix", "branches": result.get("branches", []), "generated_at": result.get("generated_at", "")})
+    for comparison in result.get("comparisons", []):  # type: ignore[union-attr]
+        if isinstance(comparison, Mapping):
+            _write_ndjson_comparison(comparison, fp)
+    trailer: dict[str, object] = {"record": "matrix_stats", "stats": result.get("stats", {})}
+    if "meta" in result:
+        trailer["meta"] = result["meta"]
+    _write_record(fp, trailer)
+
+
+def _write_matrix(result: Mapping[str, object], fp: TextIO, *, fmt: str, limit: int | None) -> None:
+    branches = ", ".join(str(b) for b in result.get("branches", []))  # type: ignore[union-attr]
+    stats = result.get("stats", {})
+    stats = stats if isinstance(stats, Mapping) else {}
+    comparisons = [c for c in result.get("comparisons", []) if isinstance(c, Mapping)]  # type: ignore[union-attr]
 
-def format_json(result: dict[str, object], *, pretty: bool = True) -> str:
-    json_kwargs: dict[str, object] = {"ensure_ascii": False}
-    if pretty:
-        json_kwargs.update({"indent": 2, "sort_keys": True})
+    if fmt == "markdown":
+        _write_lines(
+            fp,
+            [
+                f"# Package comparison matrix: {branches}",
+                "",
+                f"- Generated at: `{result.get('generated_at', '')}`",
+                f"- Total differences: `{stats.get('differences', 0)}`",
+                "",
+                "| Branch 1 | Branch 2 | Only in 1 | Only in 2 | Higher in 1 | Higher in 2 | Total |",
+                "| --- | --- | --- | --- | --- | --- | --- |",
+            ],
+        )
+        for comparison in comparisons:
+            s = comparison.get("stats", {})
+            s = s if isinstance(s, Mapping) else {}
+            fp.write(
+                f"| {comparison.get('branch1', '')} | {comparison.get('branch2', '')} "
+                f"| {s.get('only_in_branch1', 0)} | {s.get('only_in_branch2', 0)} "
+                f"| {s.get('higher_in_branch1', 0)} | {s.get('higher_in_branch2', 0)} "
+                f"| {s.get('differences', 0)} |\n"
+            )
+        for comparison in comparisons:
+            fp.write("\n")
+            # Nest each pair report one heading level below the matrix title.
+            write_markdown(comparison, fp, limit=limit, _level=2)
+        return
+
+    fp.write(
+        f"Comparison matrix: {branches}\n"
+        f"Generated at: {result.get('generated_at', '')}\n"
+        f"Pairs: {stats.get('pairs', len(comparisons))}\n"
+        f"Total differences: {stats.get('differences', 0)}\n"
+    )
+    for comparison in comparisons:
+        fp.write("\n")
+        write_summary(comparison, fp, limit=limit)
+
+
+def write_result(
+    result: Mapping[str, object],
+    fp: TextIO,
+    *,
+    fmt: str,
+    pretty: bool = True,
+    limit: int | None = None,
+    json_style: JsonStyle | None = None,
+) -> None:
+    """Write ``result`` to ``fp`` in ``fmt`` incrementally (same text as :func:`render_result`).
+
+    The time spent is recorded as the ``render`` stage of the active profiler, if any.
+    """
 
-    return json.dumps(result, **json_kwargs) + "\n"
+    fmt = fmt.lower()
+    with profiling.stage("render"):
+        if fmt in {"markdown", "summary", "text"} and "comparisons" in result:
+            _write_matrix(result, fp, fmt=fmt, limit=limit)
+        elif fmt == "json":
+            write_json(result, fp, pretty=pretty, style=json_style)
+        elif fmt == "ndjson":
+            write_ndjson(result, fp)
+        elif fmt == "markdown":
+            write_markdown(result, fp, limit=limit)
+        elif fmt in {"summary", "text"}:
+            write_summary(result, fp, limit=limit)
+        else:
+            raise ValueError(f"Unknown format: {fmt}")
 
 
 def render_result(
-    result: dict[str, object], *, fmt: str, pretty: bool = True, limit: int | None = None
+    result: Mapping[str, object],
+    *,
+    fmt: str,
+    pretty: bool = True,
+    limit: int | None = None,
+    json_style: JsonStyle | None = None,
 ) -> str:
-    fmt = fmt.lower()
-    if fmt == "json":
-        return format_json(result, pretty=pretty)
-    if fmt == "markdown":
-        return format_markdown(result, limit=limit)
-    if fmt in {"summary", "text"}:
-        return format_summary(result, limit=limit)
-
-    raise ValueError(f"Unknown format: {fmt}")
+    buffer = io.StringIO()
+    write_result(result, buffer, fmt=fmt, pretty=pretty, limit=limit, json_style=json_style)
+    return buffer.getvalue()
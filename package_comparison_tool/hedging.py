@@ -0,0 +1,103 @@
+"""Bookkeeping for hedged requests.
+
+A hedged request starts a second, identical GET when the first has not produced response
+headers within a delay. The delay is either fixed or ``"auto"``: the 95th percentile of
+recent time-to-headers observed in this process.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+from collections import deque
+from typing import Literal
+
+HedgeAfter = float | Literal["auto"]
+
+DEFAULT_HEDGE_AFTER_S = 2.0
+MIN_LATENCY_SAMPLES = 8
+_LATENCY_WINDOW = 128
+
+
+class LatencyTracker:
+    """Sliding window of time-to-headers samples with a p95 estimate."""
+
+    def __init__(self, window: int = _LATENCY_WINDOW):
+        self._samples: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> float | None:
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < MIN_LATENCY_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, math.ceil(q * len(samples)) - 1)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._samples.clear()
+
+
+# Shared by every fetch in the process, so "auto" learns from past fetches.
+latency_tracker = LatencyTracker()
+
+
+def parse_hedge_after(value: str | float | None) -> HedgeAfter | None:
+    """Validate a ``hedge_after_s`` value (seconds or ``"auto"``)."""
+
+    if value is None:
+        return None
+    if isinstance(value, str):
+        if value.strip().lower() == "auto":
+            return "auto"
+        try:
+            value = float(value)
+        except ValueError:
+            raise ValueError(f"hedge delay must be a number of seconds or 'auto', got {value!r}") from None
+    if not value > 0:
+        raise ValueError("hedge delay must be positive")
+    return float(value)
+
+
+class HedgeStats:
+    """Hedging configuration and counters for one call (thread-safe)."""
+
+    def __init__(self, after_s: HedgeAfter, *, tracker: LatencyTracker = latency_tracker):
+        self.after_s = after_s
+        self.tracker = tracker
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+
+    def delay(self) -> float:
+        if self.after_s != "auto":
+            return float(self.after_s)
+        p95 = self.tracker.percentile(0.95)
+        return DEFAULT_HEDGE_AFTER_S if p95 is None else p95
+
+    def record_request(self, latency_s: float) -> None:
+        self.tracker.record(latency_s)
+        with self._lock:
+            self.requests += 1
+
+    def record_hedge(self) -> None:
+        with self._lock:
+            self.hedged += 1
+
+    def record_hedge_win(self) -> None:
+        with self._lock:
+            self.hedge_wins += 1
+
+    def as_dict(self) -> dict[str, object]:
+        with self._lock:
+            return {
+                "after_s": self.after_s,
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+            }
@@ -1,7 +1,35 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Any
+from typing import Any, Protocol
+
+
+class PackageLike(Protocol):
+    name: str
+    epoch: int
+    version: str
+    release: str
+    arch: str
+    buildtime: int
+    disttag: str
+
+
+def package_url(branch: str, name: str, arch: str) -> str:
+    return f"https://packages.altlinux.org/ru/{branch}/binary/{name}/{arch}/"
+
+
+def package_to_dict(pkg: PackageLike, *, branch: str) -> dict[str, Any]:
+    return {
+        "branch": branch,
+        "name": pkg.name,
+        "epoch": pkg.epoch,
+        "version": pkg.version,
+        "release": pkg.release,
+        "arch": pkg.arch,
+        "buildtime": pkg.buildtime,
+        "disttag": pkg.disttag,
+        "url": package_url(branch, pkg.name, pkg.arch),
+    }
 
 
 @dataclass(frozen=True, slots=True)
@@ -15,14 +43,4 @@ class PackageInfo:
     disttag: str
 
     def to_dict(self, *, branch: str) -> dict[str, Any]:
-        return {
-            "branch": branch,
-            "name": self.name,
-            "epoch": self.epoch,
-            "version": self.version,
-            "release": self.release,
-            "arch": self.arch,
-            "buildtime": self.buildtime,
-            "disttag": self.disttag,
-            "url": f"https://packages.altlinux.org/ru/{branch}/binary/{self.name}/{self.arch}/",
-        }
+        return package_to_dict(self, branch=branch)
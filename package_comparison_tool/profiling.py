@@ -0,0 +1,169 @@
+"""Lightweight per-stage timing of a comparison run.
+
+A :class:`StageProfiler` made active with :func:`use_profiler` (or passed as ``profiler=`` to
+:func:`~package_comparison_tool.compare.compare_packages`) records wall-clock and CPU time for
+each stage of a run (HTTP request, body download, payload parsing, indexing, diffing, EVR
+comparison, rendering) plus bytes downloaded and packages parsed per branch. Stage times are
+exclusive: time spent in a nested stage (e.g. waiting for the next downloaded chunk while
+parsing) is only counted for that stage, so the stages add up to the profiled work.
+
+CPU time is per thread (:func:`time.thread_time`); work done in ``workers=`` processes only
+shows up as the wall time of the ``diff_workers`` stage. Without an active profiler the
+instrumentation points cost one context variable lookup.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from contextvars import ContextVar
+
+_NO_STAGE: AbstractContextManager[None] = nullcontext()
+
+
+class StageProfiler:
+    """Accumulates stage timings and per-branch counters; thread-safe.
+
+    Results are available as a JSON-ready dict (:meth:`as_dict`, the ``timings`` key of a
+    profiled result) or as a text table (:meth:`report`).
+    """
+
+    def __init__(
+        self,
+        *,
+        clock: Callable[[], float] = time.perf_counter,
+        cpu_clock: Callable[[], float] = time.thread_time,
+    ):
+        self._clock = clock
+        self._cpu_clock = cpu_clock
+        self._started = clock()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # stage -> [wall_s, cpu_s, calls]; branch -> counter or "<stage>_s" -> value
+        self._stages: dict[str, list[float]] = {}
+        self._branches: dict[str, dict[str, float]] = {}
+
+    @contextmanager
+    def stage(self, name: str, *, branch: str | None = None) -> Iterator[None]:
+        """Time the block as stage ``name`` (also attributed to ``branch`` when given).
+
+        The block must not yield control to unrelated code (e.g. contain a ``yield``), since
+        nesting is tracked per thread.
+        """
+
+        stack: list[list[float]] = self._local.__dict__.setdefault("stack", [])
+        stack.append([0.0, 0.0])  # wall and CPU time of nested stages
+        wall_start, cpu_start = self._clock(), self._cpu_clock()
+        try:
+            yield
+        finally:
+            wall, cpu = self._clock() - wall_start, self._cpu_clock() - cpu_start
+            nested_wall, nested_cpu = stack.pop()
+            if stack:
+                stack[-1][0] += wall
+                stack[-1][1] += cpu
+            self._record(name, branch, wall - nested_wall, cpu - nested_cpu)
+
+    def _record(self, name: str, branch: str | None, wall: float, cpu: float) -> None:
+        with self._lock:
+            totals = self._stages.setdefault(name, [0.0, 0.0, 0])
+            totals[0] += wall
+            totals[1] += cpu
+            totals[2] += 1
+            if branch is not None:
+                counters = self._branches.setdefault(branch, {})
+                counters[f"{name}_s"] = counters.get(f"{name}_s", 0.0) + wall
+
+    def count(self, branch: str, counter: str, amount: int) -> None:
+        """Add ``amount`` to a per-branch counter (e.g. ``bytes_downloaded``)."""
+
+        with self._lock:
+            counters = self._branches.setdefault(branch, {})
+            counters[counter] = counters.get(counter, 0) + amount
+
+    def as_dict(self) -> dict[str, object]:
+        """Stages in first-seen order, per-branch counters, and the time since creation."""
+
+        with self._lock:
+            stages = {
+                name: {"wall_s": round(wall, 6), "cpu_s": round(cpu, 6), "calls": int(calls)}
+                for name, (wall, cpu, calls) in self._stages.items()
+            }
+            branches = {
+                branch: {key: round(value, 6) if isinstance(value, float) else value for key, value in counters.items()}
+                for branch, counters in self._branches.items()
+            }
+        return {"elapsed_s": round(self._clock() - self._started, 6), "stages": stages, "branches": branches}
+
+    def report(self) -> str:
+        """The timings as a plain-text table."""
+
+        timings = self.as_dict()
+        lines = [f"{'Stage':<16} {'Wall (s)':>10} {'CPU (s)':>10} {'Calls':>7}"]
+        for name, stage in timings["stages"].items():  # type: ignore[attr-defined]
+            lines.append(f"{name:<16} {stage['wall_s']:>10.3f} {stage['cpu_s']:>10.3f} {stage['calls']:>7}")
+        lines.append(f"{'elapsed':<16} {timings['elapsed_s']:>10.3f}")
+        branches: dict[str, dict[str, float]] = timings["branches"]  # type: ignore[assignment]
+        if branches:
+            lines.append("")
+            lines.append(f"{'Branch':<16} {'Downloaded':>12} {'Packages':>10}")
+            for branch, counters in branches.items():
+                downloaded = counters.get("bytes_downloaded", 0) / 1e6
+                lines.append(f"{branch:<16} {downloaded:>9.1f} MB {int(counters.get('packages_parsed', 0)):>10}")
+        return "\n".join(lines)
+
+
+_active_profiler: ContextVar[StageProfiler | None] = ContextVar("stage_profiler", default=None)
+
+
+def active_profiler() -> StageProfiler | None:
+    return _active_profiler.get()
+
+
+@contextmanager
+def use_profiler(profiler: StageProfiler | None) -> Iterator[StageProfiler | None]:
+    """Record stages into ``profiler`` in the current context (``None`` disables recording)."""
+
+    token = _active_profiler.set(profiler)
+    try:
+        yield profiler
+    finally:
+        _active_profiler.reset(token)
+
+
+def stage(name: str, *, branch: str | None = None) -> AbstractContextManager[None]:
+    """:meth:`StageProfiler.stage` on the active profiler, or a no-op without one."""
+
+    profiler = _active_profiler.get()
+    return _NO_STAGE if profiler is None else profiler.stage(name, branch=branch)
+
+
+def count(branch: str, counter: str, amount: int) -> None:
+    """:meth:`StageProfiler.count` on the active profiler, if any."""
+
+    profiler = _active_profiler.get()
+    if profiler is not None:
+        profiler.count(branch, counter, amount)
+
+
+def timed_chunks(chunks: Iterable[bytes], *, name: str, branch: str, counter: str) -> Iterable[bytes]:
+    """Time each ``next(chunks)`` as stage ``name`` and count the bytes under ``counter``."""
+
+    profiler = _active_profiler.get()
+    if profiler is None:
+        return chunks
+    return _timed_chunks(profiler, iter(chunks), name=name, branch=branch, counter=counter)
+
+
+def _timed_chunks(
+    profiler: StageProfiler, chunks: Iterator[bytes], *, name: str, branch: str, counter: str
+) -> Iterator[bytes]:
+    while True:
+        with profiler.stage(name, branch=branch):
+            chunk = next(chunks, None)
+        if chunk is None:
+            return
+        profiler.count(branch, counter, len(chunk))
+        yield chunk
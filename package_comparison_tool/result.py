@@ -0,0 +1,126 @@
+"""Lazy comparison results.
+
+A :class:`CompareResult` keeps the differing packages as row numbers into the branch
+snapshots; package dicts (and their URLs) are only built when an entry is accessed, so
+callers that read ``stats`` or the first few rows pay for nothing else.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator, Mapping, MutableMapping, Sequence
+from typing import Any, overload
+
+from .snapshot import BranchSnapshot, PackageRow
+
+BUCKETS = (
+    "packages_only_in_branch1",
+    "packages_only_in_branch2",
+    "packages_with_higher_version_in_branch1",
+    "packages_with_higher_version_in_branch2",
+)
+
+
+class PackageList(Sequence[dict[str, Any]]):
+    """Packages of one result bucket, materialized as dicts on access."""
+
+    __slots__ = ("_snapshot", "_rows", "branch")
+
+    def __init__(self, snapshot: BranchSnapshot, rows: Sequence[int], *, branch: str):
+        self._snapshot = snapshot
+        self._rows = rows
+        self.branch = branch
+
+    @property
+    def snapshot(self) -> BranchSnapshot:
+        return self._snapshot
+
+    @property
+    def row_numbers(self) -> Sequence[int]:
+        """Snapshot row numbers of the packages, in order."""
+
+        return self._rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @overload
+    def __getitem__(self, index: int) -> dict[str, Any]: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> PackageList: ...
+
+    def __getitem__(self, index: int | slice) -> dict[str, Any] | PackageList:
+        if isinstance(index, slice):
+            return PackageList(self._snapshot, self._rows[index], branch=self.branch)
+        return self._snapshot[self._rows[index]].to_dict(branch=self.branch)
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        for row in self._rows:
+            yield self._snapshot[row].to_dict(branch=self.branch)
+
+    def rows(self) -> Iterator[PackageRow]:
+        """The packages as snapshot rows (no dicts are built)."""
+
+        return (self._snapshot[row] for row in self._rows)
+
+    def to_list(self) -> list[dict[str, Any]]:
+        return list(self)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other, strict=True))
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"PackageList(branch={self.branch!r}, len={len(self)})"
+
+
+class CompareResult(MutableMapping[str, object]):
+    """Result of :func:`~package_comparison_tool.compare.compare_packages`.
+
+    Reads like the dict returned before (``result["stats"]``, ``result["packages_only_in_branch1"]``
+    and so on), but the four package buckets are :class:`PackageList` views. Use
+    :meth:`to_dict` for a plain, JSON-serializable dict.
+    """
+
+    def __init__(
+        self,
+        *,
+        branch1: str,
+        branch2: str,
+        generated_at: str,
+        buckets: Mapping[str, Sequence[Mapping[str, Any]]],
+        stats: dict[str, int],
+    ):
+        self._data: dict[str, object] = {"branch1": branch1, "branch2": branch2, "generated_at": generated_at}
+        self._data.update((bucket, buckets[bucket]) for bucket in BUCKETS)
+        self._data["stats"] = stats
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return self._data["stats"]  # type: ignore[return-value]
+
+    def __getitem__(self, key: str) -> object:
+        return self._data[key]
+
+    def __setitem__(self, key: str, value: object) -> None:
+        self._data[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        del self._data[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def to_dict(self) -> dict[str, object]:
+        """Materialize every package entry into a plain dict."""
+
+        return {key: list(value) if isinstance(value, PackageList) else value for key, value in self._data.items()}
+
+    def __repr__(self) -> str:
+        return f"CompareResult({self['branch1']!r} vs {self['branch2']!r}, stats={self.stats!r})"
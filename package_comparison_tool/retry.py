@@ -0,0 +1,187 @@
+"""Retry policy and deadlines shared by the synchronous and asyncio fetch engines.
+
+Every attempt is made by the fetch engines themselves (sessions are created without
+urllib3-level retries), so a request is tried at most ``RetryPolicy.attempts`` times and one
+:class:`RetryBudget` can cap and account for the retries of all requests made by a call.
+A :class:`Deadline` bounds the wall-clock time of the whole call, retries included.
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+
+from .exceptions import DeadlineExceededError
+
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+RETRY_AFTER_STATUSES = (429, 503)
+
+DEFAULT_MAX_BACKOFF_S = 30.0
+DEFAULT_MAX_RETRY_AFTER_S = 60.0
+
+
+def parse_retry_after(value: str | None, *, now: float | None = None) -> float | None:
+    """Parse a ``Retry-After`` header (delta-seconds or HTTP-date) into seconds to wait."""
+
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        return None
+    return max(0.0, when.timestamp() - (time.time() if now is None else now))
+
+
+@dataclass(frozen=True, slots=True)
+class RetryPolicy:
+    """How often and how long to wait between attempts of a single request.
+
+    Backoff uses "full jitter": the delay before retry ``n`` is drawn uniformly from
+    ``[0, min(max_backoff_s, backoff_factor * 2 ** (n - 1))]``. A ``Retry-After`` header on
+    429/503 responses replaces the computed delay (capped at ``max_retry_after_s``).
+    """
+
+    attempts: int = 3
+    backoff_factor: float = 0.3
+    max_backoff_s: float = DEFAULT_MAX_BACKOFF_S
+    jitter: bool = True
+    max_retry_after_s: float = DEFAULT_MAX_RETRY_AFTER_S
+
+    @property
+    def max_attempts(self) -> int:
+        return max(1, self.attempts)
+
+    def delay(self, attempt: int, *, status: int | None = None, retry_after: str | None = None) -> float:
+        if status in RETRY_AFTER_STATUSES:
+            wait = parse_retry_after(retry_after)
+            if wait is not None:
+                return min(wait, self.max_retry_after_s)
+
+        cap = min(self.max_backoff_s, self.backoff_factor * (2 ** (attempt - 1)))
+        return random.uniform(0.0, cap) if self.jitter else cap
+
+    def next_delay(
+        self,
+        attempt: int,
+        budget: RetryBudget,
+        *,
+        status: int | None = None,
+        retry_after: str | None = None,
+        deadline: Deadline | None = None,
+        activity: str = "retrying",
+    ) -> float | None:
+        """Return the delay before the next attempt, or ``None`` if the request should fail now.
+
+        Raises :class:`~package_comparison_tool.exceptions.DeadlineExceededError` if the delay
+        would outlast ``deadline``; the retry and its sleep are only charged to ``budget`` when
+        the delay is returned.
+        """
+
+        if attempt >= self.max_attempts:
+            return None
+        delay = self.delay(attempt, status=status, retry_after=retry_after)
+        if deadline is not None and not deadline.allows(delay):
+            raise deadline.error(activity)
+        if not budget.acquire():
+            return None
+        budget.record_sleep(delay)
+        return delay
+
+
+class RetryBudget:
+    """Retry allowance and counters shared by every request made for one call.
+
+    ``max_retries=None`` leaves retries limited only by each request's policy. The budget is
+    thread-safe, so concurrent branch fetches may share it.
+    """
+
+    def __init__(self, max_retries: int | None = None):
+        self.max_retries = max_retries
+        self.attempts = 0
+        self.retries = 0
+        self.denied = 0
+        self.sleep_s = 0.0
+        self._lock = threading.Lock()
+
+    def record_attempt(self) -> None:
+        with self._lock:
+            self.attempts += 1
+
+    def acquire(self) -> bool:
+        with self._lock:
+            if self.max_retries is not None and self.retries >= self.max_retries:
+                self.denied += 1
+                return False
+            self.retries += 1
+            return True
+
+    def record_sleep(self, delay: float) -> None:
+        with self._lock:
+            self.sleep_s += delay
+
+    def as_dict(self) -> dict[str, object]:
+        with self._lock:
+            return {
+                "attempts": self.attempts,
+                "retries": self.retries,
+                "budget": self.max_retries,
+                "budget_exhausted": self.denied,
+                "sleep_s": round(self.sleep_s, 3),
+            }
+
+
+class Deadline:
+    """End-to-end time limit for one call, measured on the monotonic clock.
+
+    Fetch engines clamp each attempt's timeout to :meth:`remaining` and refuse to start a
+    backoff sleep that would outlast it, so the call fails with
+    :class:`~package_comparison_tool.exceptions.DeadlineExceededError` instead of running over.
+    """
+
+    def __init__(self, seconds: float, *, clock: Callable[[], float] = time.monotonic):
+        self.seconds = seconds
+        self._clock = clock
+        self._expires_at = clock() + seconds
+
+    @classmethod
+    def after(cls, seconds: float | None) -> Deadline | None:
+        return None if seconds is None else cls(seconds)
+
+    def remaining(self) -> float:
+        return max(0.0, self._expires_at - self._clock())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def error(self, activity: str) -> DeadlineExceededError:
+        return DeadlineExceededError(self.seconds, activity)
+
+    def check(self, activity: str) -> None:
+        if self.expired():
+            raise self.error(activity)
+
+    def timeout(self, timeout_s: float, activity: str) -> float:
+        """Return ``timeout_s`` clamped to the remaining time (raises if none is left)."""
+
+        self.check(activity)
+        return min(timeout_s, self.remaining())
+
+    def allows(self, delay: float) -> bool:
+        """Whether sleeping ``delay`` seconds still leaves time for another attempt."""
+
+        return delay < self.remaining()
+
+    def iter_checked(self, chunks: Iterable[bytes], activity: str) -> Iterator[bytes]:
+        for chunk in chunks:
+            self.check(activity)
+            yield chunk
@@ -0,0 +1,489 @@
+"""Long-running HTTP comparison server (``package-comparison serve``).
+
+Keeps parsed branch snapshots in memory so repeated comparisons skip the download and
+parse entirely:
+
+* snapshots are refreshed at most every ``refresh_s`` seconds with a conditional GET
+  (``If-None-Match``/``If-Modified-Since``); a 304 keeps the parsed snapshot as is;
+* every loaded snapshot gets a new version number, and rendered results are cached by the
+  versions they were computed from, so a result is reused until one of its branches changes;
+* identical concurrent loads and comparisons are coalesced, and at most ``max_concurrent``
+  comparisons run at once (others wait up to ``queue_timeout_s``, then get a 503).
+
+Endpoints: ``GET /compare?branch1=&branch2=&arch=&filter=&format=&ignore_arch=&limit=``
+(``arch`` and ``filter`` are repeatable), ``GET /metrics`` (Prometheus text format) and
+``GET /healthz``. ``filter`` patterns are limited in number and length and may not use groups
+or ``{m,n}`` repetition, so a pattern cannot backtrack catastrophically while holding a slot.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from collections.abc import Callable, Hashable, Mapping
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import chain
+from typing import Any
+from urllib.parse import parse_qs, quote, urlencode, urlsplit
+
+import requests
+
+from . import __version__, api
+from .api import (
+    _check_response,
+    _iter_package_fields,
+    _merge_headers,
+    _request_with_retries,
+    create_session,
+)
+from .coalesce import SingleFlight
+from .compare import _check_engine, compare_packages
+from .constants import (
+    DEFAULT_MAX_CONCURRENT,
+    DEFAULT_MAX_SNAPSHOTS,
+    DEFAULT_QUEUE_TIMEOUT_S,
+    DEFAULT_REFRESH_S,
+    DEFAULT_RESULT_CACHE_SIZE,
+    DiffEngine,
+)
+from .exceptions import AltApiError, BranchNotFoundError
+from .formatting import render_result
+from .retry import RetryBudget, RetryPolicy
+from .snapshot import BranchSnapshot
+from .streaming import DEFAULT_CHUNK_SIZE, iter_payload_packages
+
+_FORMATS = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "markdown": "text/markdown; charset=utf-8",
+    "summary": "text/plain; charset=utf-8",
+    "text": "text/plain; charset=utf-8",
+}
+_TRUE = {"1", "true", "yes", "on"}
+# Branch names end up in the upstream URL path; anything else (``/``, ``..``, ``?``) is refused.
+_BRANCH_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.+-]*")
+# Filters without groups cannot nest quantifiers, so matching stays polynomial in the name length.
+_MAX_FILTERS = 16
+_MAX_FILTER_LENGTH = 100
+_FILTER_ESCAPES_AND_CLASSES = re.compile(r"\\.|\[\^?\]?[^\]]*\]")
+_FILTER_GROUPING = re.compile(r"[(){}]")
+_MERGED_SNAPSHOTS = 32  # multi-arch branch snapshots kept per service
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class _Loaded:
+    snapshot: BranchSnapshot
+    version: int
+    checked_at: float
+    etag: str | None
+    last_modified: str | None
+
+
+class BranchStore:
+    """Parsed branch snapshots kept warm in memory, one per (branch, arch) export URL.
+
+    A snapshot older than ``refresh_s`` is revalidated on its next use; concurrent users of
+    the same stale entry share one revalidation. At most ``max_snapshots`` entries are kept,
+    evicting the least recently used. Thread-safe.
+    """
+
+    def __init__(
+        self,
+        *,
+        refresh_s: float = DEFAULT_REFRESH_S,
+        timeout_s: float = 30.0,
+        retries: int = 3,
+        retry_backoff: float = 0.3,
+        user_agent: str | None = None,
+        max_snapshots: int = DEFAULT_MAX_SNAPSHOTS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if max_snapshots < 1:
+            raise ValueError("max_snapshots must be at least 1")
+        self.refresh_s = refresh_s
+        self.timeout_s = timeout_s
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.user_agent = user_agent
+        self.max_snapshots = max_snapshots
+        self._clock = clock
+        self._entries: OrderedDict[tuple[str, str | None], _Loaded] = OrderedDict()
+        self._lock = threading.Lock()
+        self._flight: SingleFlight[_Loaded] = SingleFlight()
+        self._versions = itertools.count(1)
+        self.fetches = 0
+        self.not_modified = 0
+
+    def get(self, branch: str, arch: str | None = None) -> tuple[int, BranchSnapshot]:
+        """Return ``(version, snapshot)`` for the branch (one arch, or all of them)."""
+
+        if not _BRANCH_NAME.fullmatch(branch):
+            raise ValueError(f"invalid branch name {branch!r}")
+        key = (branch, arch)
+        with self._lock:
+            loaded = self._entries.get(key)
+            if loaded is not None:
+                self._entries.move_to_end(key)
+        if loaded is None or self._clock() - loaded.checked_at >= self.refresh_s:
+            loaded = self._flight.do(key, lambda: self._load(branch, arch))
+        return loaded.version, loaded.snapshot
+
+    def _load(self, branch: str, arch: str | None) -> _Loaded:
+        with self._lock:
+            previous = self._entries.get((branch, arch))
+        if previous is not None and self._clock() - previous.checked_at < self.refresh_s:
+            return previous  # refreshed by the call that just finished
+
+        url = f"{api.ALT_RDB_API_BASE}/branch_binary_packages/{quote(branch, safe='')}"
+        if arch is not None:
+            url += f"?{urlencode({'arch': arch})}"
+        with create_session(user_agent=self.user_agent, retries=self.retries) as session:
+            headers = _merge_headers(session, user_agent=self.user_agent, headers=_validators(previous))
+            response = _request_with_retries(
+                session,
+                url,
+                timeout_s=self.timeout_s,
+                headers=headers,
+                policy=RetryPolicy(attempts=self.retries, backoff_factor=self.retry_backoff),
+                budget=RetryBudget(),
+                stream=True,
+            )
+            try:
+                if response.status_code == 304 and previous is not None:
+                    loaded = _Loaded(
+                        previous.snapshot, previous.version, self._clock(), previous.etag, previous.last_modified
+                    )
+                    with self._lock:
+                        self.not_modified += 1
+                else:
+                    _check_response(response, branch=branch, url=url)
+                    raw = iter_payload_packages(response.iter_content(chunk_size=DEFAULT_CHUNK_SIZE))
+                    fields = _iter_package_fields(raw, arches={arch} if arch is not None else None, max_packages=None)
+                    loaded = _Loaded(
+                        BranchSnapshot.from_fields(fields, branch=branch),
+                        next(self._versions),
+                        self._clock(),
+                        response.headers.get("ETag"),
+                        response.headers.get("Last-Modified"),
+                    )
+                    with self._lock:
+                        self.fetches += 1
+            except requests.RequestException as exc:
+                raise AltApiError(f"Failed to fetch data from ALT RDB API: {exc}") from exc
+            finally:
+                response.close()
+
+        with self._lock:
+            self._entries[branch, arch] = loaded
+            self._entries.move_to_end((branch, arch))
+            while len(self._entries) > self.max_snapshots:
+                self._entries.popitem(last=False)
+        return loaded
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+def _validators(loaded: _Loaded | None) -> dict[str, str]:
+    headers: dict[str, str] = {}
+    if loaded is not None:
+        if loaded.etag:
+            headers["If-None-Match"] = loaded.etag
+        if loaded.last_modified:
+            headers["If-Modified-Since"] = loaded.last_modified
+    return headers
+
+
+class _BadRequest(ValueError):
+    pass
+
+
+class _Busy(Exception):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class _Query:
+    branch1: str
+    branch2: str
+    arches: tuple[str, ...]
+    filters: tuple[str, ...]
+    fmt: str
+    ignore_arch: bool
+    limit: int | None
+
+    @classmethod
+    def parse(cls, query: str) -> _Query:
+        params = parse_qs(query)
+
+        def _one(name: str, default: str | None = None) -> str | None:
+            values = params.get(name)
+            return values[-1] if values else default
+
+        branch1, branch2 = _one("branch1"), _one("branch2")
+        if not branch1 or not branch2:
+            raise _BadRequest("branch1 and branch2 are required")
+        for branch in (branch1, branch2):
+            if not _BRANCH_NAME.fullmatch(branch):
+                raise _BadRequest(f"invalid branch name {branch!r}")
+        fmt = (_one("format", "json") or "json").lower()
+        if fmt not in _FORMATS:
+            raise _BadRequest(f"unknown format {fmt!r} (expected one of: {', '.join(_FORMATS)})")
+        arches = sorted({a.strip() for value in params.get("arch", []) for a in value.split(",") if a.strip()})
+        filters = tuple(params.get("filter", []))
+        if len(filters) > _MAX_FILTERS:
+            raise _BadRequest(f"at most {_MAX_FILTERS} filters are allowed")
+        for pattern in filters:
+            _check_filter(pattern)
+        limit = _one("limit")
+        try:
+            limit_value = int(limit) if limit is not None else 25
+        except ValueError:
+            raise _BadRequest(f"limit must be an integer, got {limit!r}") from None
+        return cls(
+            branch1,
+            branch2,
+            tuple(arches),
+            filters,
+            fmt,
+            (_one("ignore_arch", "") or "").lower() in _TRUE,
+            limit_value if limit_value > 0 else None,
+        )
+
+
+def _check_filter(pattern: str) -> None:
+    if len(pattern) > _MAX_FILTER_LENGTH:
+        raise _BadRequest(f"filter longer than {_MAX_FILTER_LENGTH} characters")
+    if _FILTER_GROUPING.search(_FILTER_ESCAPES_AND_CLASSES.sub("", pattern)):
+        raise _BadRequest(f"invalid filter {pattern!r}: groups and {{m,n}} repetition are not allowed")
+    try:
+        re.compile(pattern, re.IGNORECASE)
+    except re.error as exc:
+        raise _BadRequest(f"invalid filter {pattern!r}: {exc}") from None
+
+
+class ComparisonService:
+    """Runs comparisons against a :class:`BranchStore` and caches the rendered results."""
+
+    def __init__(
+        self,
+        store: BranchStore | None = None,
+        *,
+        max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+        queue_timeout_s: float = DEFAULT_QUEUE_TIMEOUT_S,
+        result_cache_size: int = DEFAULT_RESULT_CACHE_SIZE,
+        engine: DiffEngine = "hash",
+    ):
+        _check_engine(engine)
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1")
+        self.store = store if store is not None else BranchStore()
+        self.engine = engine
+        self.queue_timeout_s = queue_timeout_s
+        self.result_cache_size = result_cache_size
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._results: OrderedDict[Hashable, bytes] = OrderedDict()
+        self._merged: OrderedDict[Hashable, BranchSnapshot] = OrderedDict()
+        self._flight: SingleFlight[bytes] = SingleFlight()
+        self._lock = threading.Lock()
+        self.counters: Counter[str] = Counter()
+        self.requests: Counter[tuple[str, int]] = Counter()
+        self.request_seconds = 0.0
+        self.in_flight = 0
+
+    def compare(self, query: _Query) -> bytes:
+        """Render the comparison described by ``query`` (served from cache when unchanged)."""
+
+        if not self._slots.acquire(timeout=self.queue_timeout_s):
+            with self._lock:
+                self.counters["rejected"] += 1
+            raise _Busy()
+        with self._lock:
+            self.in_flight += 1
+        try:
+            loaded1 = self._branch(query.branch1, query.arches)
+            loaded2 = self._branch(query.branch2, query.arches)
+            key = (query, tuple(v for v, _ in loaded1), tuple(v for v, _ in loaded2))
+            with self._lock:
+                body = self._results.get(key)
+                if body is not None:
+                    self._results.move_to_end(key)
+                    self.counters["result_cache_hits"] += 1
+                    return body
+                self.counters["result_cache_misses"] += 1
+            body = self._flight.do(
+                key, lambda: self._render(query, self._merge(query.branch1, loaded1), self._merge(query.branch2, loaded2))
+            )
+            with self._lock:
+                self._results[key] = body
+                while len(self._results) > self.result_cache_size:
+                    self._results.popitem(last=False)
+            return body
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+    def _branch(self, branch: str, arches: tuple[str, ...]) -> list[tuple[int, BranchSnapshot]]:
+        """``(version, snapshot)`` of every arch of ``branch`` the query asks for (cheap when warm)."""
+
+        if not arches:
+            return [self.store.get(branch)]
+        return [self.store.get(branch, arch) for arch in arches]
+
+    def _merge(self, branch: str, loaded: list[tuple[int, BranchSnapshot]]) -> BranchSnapshot:
+        """One snapshot for several arches; built on a result-cache miss and memoized by versions."""
+
+        if len(loaded) == 1:
+            return loaded[0][1]
+        key = (branch, tuple(version for version, _ in loaded))
+        with self._lock:
+            merged = self._merged.get(key)
+            if merged is not None:
+                self._merged.move_to_end(key)
+                return merged
+        rows = chain.from_iterable((s.fields(i) for i in range(len(s))) for _, s in loaded)
+        merged = BranchSnapshot.from_fields(rows, branch=branch)
+        with self._lock:
+            self._merged[key] = merged
+            while len(self._merged) > _MERGED_SNAPSHOTS:
+                self._merged.popitem(last=False)
+        return merged
+
+    def _render(self, query: _Query, snap1: BranchSnapshot, snap2: BranchSnapshot) -> bytes:
+        result = compare_packages(
+            query.branch1,
+            query.branch2,
+            ignore_arch=query.ignore_arch,
+            name_patterns=tuple(re.compile(p, re.IGNORECASE) for p in query.filters) or None,
+            snapshots={query.branch1: snap1, query.branch2: snap2},
+            engine=self.engine,
+        )
+        return render_result(result, fmt=query.fmt, limit=query.limit).encode("utf8")
+
+    def metrics(self) -> str:
+        """Counters and gauges in the Prometheus text exposition format."""
+
+        with self._lock:
+            counters = dict(self.counters)
+            requests_by_status = sorted(self.requests.items())
+            request_seconds = self.request_seconds
+            in_flight = self.in_flight
+            cached = len(self._results)
+        lines = [
+            "# TYPE package_comparison_requests_total counter",
+            *(
+                f'package_comparison_requests_total{{path="{path}",status="{status}"}} {count}'
+                for (path, status), count in requests_by_status
+            ),
+            "# TYPE package_comparison_request_seconds_total counter",
+            f"package_comparison_request_seconds_total {request_seconds:.6f}",
+            "# TYPE package_comparison_result_cache_hits_total counter",
+            f"package_comparison_result_cache_hits_total {counters.get('result_cache_hits', 0)}",
+            "# TYPE package_comparison_result_cache_misses_total counter",
+            f"package_comparison_result_cache_misses_total {counters.get('result_cache_misses', 0)}",
+            "# TYPE package_comparison_rejected_total counter",
+            f"package_comparison_rejected_total {counters.get('rejected', 0)}",
+            "# TYPE package_comparison_snapshot_fetches_total counter",
+            f"package_comparison_snapshot_fetches_total {self.store.fetches}",
+            "# TYPE package_comparison_snapshot_not_modified_total counter",
+            f"package_comparison_snapshot_not_modified_total {self.store.not_modified}",
+            "# TYPE package_comparison_snapshots gauge",
+            f"package_comparison_snapshots {len(self.store)}",
+            "# TYPE package_comparison_cached_results gauge",
+            f"package_comparison_cached_results {cached}",
+            "# TYPE package_comparison_in_flight gauge",
+            f"package_comparison_in_flight {in_flight}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def record(self, path: str, status: int, seconds: float) -> None:
+        with self._lock:
+            self.requests[path, status] += 1
+            self.request_seconds += seconds
+
+
+# status, body, content type, extra headers
+_Response = tuple[int, bytes, str, Mapping[str, str] | None]
+
+
+def _error(status: int, message: str, headers: Mapping[str, str] | None = None) -> _Response:
+    return status, json.dumps({"error": message}).encode("utf8"), "application/json", headers
+
+
+def _make_handler(service: ComparisonService) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        server_version = f"package-comparison/{__version__}"
+
+        def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+            logger.debug("%s - %s", self.address_string(), format % args)
+
+        def _send(self, response: _Response) -> None:
+            status, body, content_type, headers = response
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:  # noqa: N802
+            started = time.perf_counter()
+            parts = urlsplit(self.path)
+            path = parts.path.rstrip("/") or "/"
+            if path == "/compare":
+                response = self._compare(parts.query)
+            elif path == "/metrics":
+                response = (200, service.metrics().encode("utf8"), "text/plain; version=0.0.4", None)
+            elif path == "/healthz":
+                response = (200, b"ok\n", "text/plain", None)
+            else:
+                path = "other"
+                response = _error(404, "not found")
+            # Record before replying, so a client reading /metrics next already sees this request.
+            service.record(path, response[0], time.perf_counter() - started)
+            self._send(response)
+
+        def _compare(self, query: str) -> _Response:
+            try:
+                parsed = _Query.parse(query)
+                body = service.compare(parsed)
+            except _BadRequest as exc:
+                return _error(400, str(exc))
+            except _Busy:
+                return _error(503, "too many concurrent comparisons", {"Retry-After": "1"})
+            except BranchNotFoundError as exc:
+                return _error(404, str(exc))
+            except AltApiError as exc:
+                return _error(502, str(exc))
+            except Exception as exc:  # noqa: BLE001
+                logger.exception("comparison failed")
+                return _error(500, str(exc))
+            return 200, body, _FORMATS[parsed.fmt], None
+
+    return Handler
+
+
+class ComparisonServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], service: ComparisonService):
+        self.service = service
+        super().__init__(address, _make_handler(service))
+
+
+def make_server(host: str = "127.0.0.1", port: int = 8080, *, service: ComparisonService | None = None) -> ComparisonServer:
+    """Create (but do not start) a server; ``port=0`` picks a free port."""
+
+    return ComparisonServer((host, port), service if service is not None else ComparisonService())
@@ -0,0 +1,379 @@
+from __future__ import annotations
+
+import contextlib
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from collections.abc import Iterable, Iterator, Sequence
+from typing import Any
+
+from .models import PackageInfo, package_to_dict
+
+STRING_FIELDS = ("name", "version", "release", "arch", "disttag")
+
+SNAPSHOT_MAGIC = b"ALTSNAP\x01"
+_HEADER = struct.Struct("<8sQI4x")  # magic, row count, branch name length
+_TABLE_HEADER = struct.Struct("<QQ")  # string count, blob length
+
+PackageFields = tuple[str, int, str, str, str, int, str]
+
+
+class StringTable:
+    """Append-only table of distinct strings addressed by integer code."""
+
+    __slots__ = ("values", "_codes")
+
+    def __init__(self, values: Iterable[str] = ()):
+        self.values: list[str] = []
+        self._codes: dict[str, int] = {}
+        for value in values:
+            self.code(value)
+
+    def code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.values)
+            value = sys.intern(value)
+            self.values.append(value)
+            self._codes[value] = code
+        return code
+
+    def __getitem__(self, code: int) -> str:
+        return self.values[code]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class MappedStringTable:
+    """Read-only string table backed by a mapped buffer; strings are decoded on first use."""
+
+    __slots__ = ("_offsets", "_blob", "_decoded")
+
+    def __init__(self, offsets: Sequence[int], blob: memoryview):
+        self._offsets = offsets
+        self._blob = blob
+        self._decoded: list[str | None] = [None] * (len(offsets) - 1)
+
+    def __getitem__(self, code: int) -> str:
+        value = self._decoded[code]
+        if value is None:
+            value = sys.intern(str(self._blob[self._offsets[code] : self._offsets[code + 1]], "utf8"))
+            self._decoded[code] = value
+        return value
+
+    def __len__(self) -> int:
+        return len(self._decoded)
+
+
+class PackageRow:
+    """Read-only view of one snapshot row, interchangeable with :class:`PackageInfo`."""
+
+    __slots__ = ("_snapshot", "index")
+
+    def __init__(self, snapshot: BranchSnapshot, index: int):
+        self._snapshot = snapshot
+        self.index = index
+
+    @property
+    def name(self) -> str:
+        return self._snapshot.value("name", self.index)
+
+    @property
+    def epoch(self) -> int:
+        return self._snapshot.epoch[self.index]
+
+    @property
+    def version(self) -> str:
+        return self._snapshot.value("version", self.index)
+
+    @property
+    def release(self) -> str:
+        return self._snapshot.value("release", self.index)
+
+    @property
+    def arch(self) -> str:
+        return self._snapshot.value("arch", self.index)
+
+    @property
+    def buildtime(self) -> int:
+        return self._snapshot.buildtime[self.index]
+
+    @property
+    def disttag(self) -> str:
+        return self._snapshot.value("disttag", self.index)
+
+    def astuple(self) -> PackageFields:
+        return self._snapshot.fields(self.index)
+
+    def to_package_info(self) -> PackageInfo:
+        return PackageInfo(*self.astuple())
+
+    def to_dict(self, *, branch: str) -> dict[str, Any]:
+        return package_to_dict(self, branch=branch)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, PackageRow):
+            return self.astuple() == other.astuple()
+        if isinstance(other, PackageInfo):
+            return self.to_package_info() == other
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self.to_package_info())
+
+    def __repr__(self) -> str:
+        return f"PackageRow({self.to_package_info()!r})"
+
+
+class BranchSnapshot(Sequence[PackageRow]):
+    """Column-oriented package list for one branch.
+
+    String columns are stored as ``array('I')`` codes into per-field :class:`StringTable`
+    instances (names, arches, disttags and versions repeat a lot), and ``epoch``/``buildtime``
+    as ``array('q')``. Indexing returns :class:`PackageRow` views; no per-package objects are
+    kept alive by the snapshot itself. Snapshots opened with :func:`load_snapshot` are
+    read-only views over a memory-mapped file, unmapped by :meth:`close` (or on leaving a
+    ``with`` block, or otherwise when the snapshot is garbage collected).
+    """
+
+    def __init__(self, branch: str = ""):
+        self.branch = branch
+        self.tables: dict[str, StringTable | MappedStringTable] = {
+            field: StringTable() for field in STRING_FIELDS
+        }
+        self.codes: dict[str, Sequence[int]] = {field: array("I") for field in STRING_FIELDS}
+        self.epoch: Sequence[int] = array("q")
+        self.buildtime: Sequence[int] = array("q")
+        self._buffer: mmap.mmap | None = None
+        self._views: list[memoryview] = []  # views into _buffer, released by close()
+
+    @classmethod
+    def from_fields(cls, rows: Iterable[PackageFields], *, branch: str = "") -> BranchSnapshot:
+        snapshot = cls(branch)
+        append = snapshot.append
+        for row in rows:
+            append(*row)
+        return snapshot
+
+    @classmethod
+    def from_packages(cls, packages: Iterable[PackageInfo], *, branch: str = "") -> BranchSnapshot:
+        return cls.from_fields(
+            (
+                (p.name, p.epoch, p.version, p.release, p.arch, p.buildtime, p.disttag)
+                for p in packages
+            ),
+            branch=branch,
+        )
+
+    def append(
+        self,
+        name: str,
+        epoch: int,
+        version: str,
+        release: str,
+        arch: str,
+        buildtime: int,
+        disttag: str,
+    ) -> None:
+        if self._buffer is not None:
+            raise TypeError("memory-mapped snapshots are read-only")
+
+        tables: dict[str, StringTable] = self.tables  # type: ignore[assignment]
+        codes: dict[str, array[int]] = self.codes  # type: ignore[assignment]
+        codes["name"].append(tables["name"].code(name))
+        codes["version"].append(tables["version"].code(version))
+        codes["release"].append(tables["release"].code(release))
+        codes["arch"].append(tables["arch"].code(arch))
+        codes["disttag"].append(tables["disttag"].code(disttag))
+        self.epoch.append(epoch)  # type: ignore[attr-defined]
+        self.buildtime.append(buildtime)  # type: ignore[attr-defined]
+
+    def value(self, field: str, index: int) -> str:
+        return self.tables[field][self.codes[field][index]]
+
+    def strings(self, field: str) -> Sequence[str]:
+        """Code-to-string lookup for ``field`` (a plain list for in-memory snapshots)."""
+
+        table = self.tables[field]
+        return table.values if isinstance(table, StringTable) else table
+
+    def column(self, field: str) -> list[str]:
+        """Materialize one string column (cheap: values are shared table entries)."""
+
+        table = self.strings(field)
+        return [table[code] for code in self.codes[field]]
+
+    def fields(self, index: int) -> PackageFields:
+        value = self.value
+        return (
+            value("name", index),
+            self.epoch[index],
+            value("version", index),
+            value("release", index),
+            value("arch", index),
+            self.buildtime[index],
+            value("disttag", index),
+        )
+
+    def __len__(self) -> int:
+        return len(self.epoch)
+
+    def __getitem__(self, index: int) -> PackageRow:  # type: ignore[override]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("snapshot row index out of range")
+        return PackageRow(self, index)
+
+    def __iter__(self) -> Iterator[PackageRow]:
+        for index in range(len(self)):
+            yield PackageRow(self, index)
+
+    def close(self) -> None:
+        """Unmap the file behind a loaded snapshot (no-op for in-memory snapshots).
+
+        The snapshot, and row views or string tables taken from it, must not be used afterwards.
+        """
+
+        if self._buffer is None:
+            return
+        for view in self._views:
+            view.release()
+        self._views = []
+        self._buffer.close()
+        self._buffer = None
+
+    def __enter__(self) -> BranchSnapshot:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def to_packages(self) -> list[PackageInfo]:
+        return [PackageInfo(*self.fields(i)) for i in range(len(self))]
+
+
+def _pad8(n: int) -> int:
+    return -n % 8
+
+
+def save_snapshot(snapshot: BranchSnapshot, path: str | os.PathLike[str]) -> None:
+    """Write ``snapshot`` to ``path`` in the binary snapshot format.
+
+    Layout (little-endian, every section 8-byte aligned): header and branch name, then for
+    each string field a string count/blob length pair, ``uint64`` offsets, the UTF-8 blob and
+    the ``uint32`` row codes, followed by the ``int64`` epoch and buildtime columns. The file
+    is replaced atomically, so readers that already mapped the old file are unaffected.
+    """
+
+    rows = len(snapshot)
+    branch = snapshot.branch.encode("utf8")
+    parts: list[bytes] = [_HEADER.pack(SNAPSHOT_MAGIC, rows, len(branch)), branch, b"\0" * _pad8(len(branch))]
+
+    for field in STRING_FIELDS:
+        table = snapshot.tables[field]
+        encoded = [table[code].encode("utf8") for code in range(len(table))]
+        offsets = array("Q", [0])
+        for value in encoded:
+            offsets.append(offsets[-1] + len(value))
+        blob = b"".join(encoded)
+        codes = array("I", snapshot.codes[field])
+
+        parts += [_TABLE_HEADER.pack(len(encoded), len(blob)), _le_bytes(offsets)]
+        parts += [blob, b"\0" * _pad8(len(blob))]
+        parts += [_le_bytes(codes), b"\0" * _pad8(len(codes) * codes.itemsize)]
+
+    parts += [_le_bytes(array("q", snapshot.epoch)), _le_bytes(array("q", snapshot.buildtime))]
+
+    directory = os.path.dirname(os.fspath(path)) or "."
+    fd, tmp_name = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.writelines(parts)
+        os.replace(tmp_name, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp_name)
+        raise
+
+
+def load_snapshot(path: str | os.PathLike[str]) -> BranchSnapshot:
+    """Open a snapshot written by :func:`save_snapshot` without parsing it.
+
+    The file is memory-mapped read-only: numeric columns are zero-copy views of the mapping,
+    and strings are decoded lazily on first access. Processes mapping the same file share the
+    page cache.
+    """
+
+    with open(path, "rb") as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as exc:  # empty file
+            raise ValueError(f"{os.fspath(path)!s} is not a package snapshot file") from exc
+
+    view = memoryview(buffer)
+    views = [view]
+    try:
+        magic, rows, branch_len = _HEADER.unpack_from(view, 0)
+    except struct.error as exc:
+        raise ValueError(f"{os.fspath(path)!s} is not a package snapshot file") from exc
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError(f"{os.fspath(path)!s} is not a package snapshot file")
+
+    pos = _HEADER.size
+
+    def region(size: int) -> memoryview:
+        nonlocal pos
+        if pos + size > len(view):
+            raise ValueError(f"{os.fspath(path)!s} is a truncated snapshot file")
+        part = view[pos : pos + size]
+        pos += size + _pad8(size)
+        return part
+
+    def take(typecode: str, count: int) -> Sequence[int]:
+        column = _le_view(region(struct.calcsize(typecode) * count), typecode)
+        if isinstance(column, memoryview):
+            views.append(column)
+        return column
+
+    try:
+        branch = str(region(branch_len), "utf8")
+        snapshot = BranchSnapshot(branch)
+        for field in STRING_FIELDS:
+            count, blob_len = _TABLE_HEADER.unpack(region(_TABLE_HEADER.size))
+            offsets = take("Q", count + 1)
+            blob = region(blob_len)
+            views.append(blob)
+            snapshot.tables[field] = MappedStringTable(offsets, blob)
+            snapshot.codes[field] = take("I", rows)
+
+        snapshot.epoch = take("q", rows)
+        snapshot.buildtime = take("q", rows)
+    except BaseException:
+        for part in views:
+            part.release()
+        with contextlib.suppress(BufferError):  # a view still held by the traceback; GC unmaps it
+            buffer.close()
+        raise
+    snapshot._buffer = buffer
+    snapshot._views = views
+    return snapshot
+
+
+def _le_bytes(values: array[int]) -> bytes:
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _le_view(view: memoryview, typecode: str) -> Sequence[int]:
+    if sys.byteorder == "little":
+        return view.cast(typecode)
+    values = array(typecode, view.tobytes())
+    values.byteswap()
+    return values
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import codecs
+import json
+from collections.abc import Generator, Iterable, Iterator
+
+from .exceptions import AltApiError
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+_COMPACT_THRESHOLD = 64 * 1024
+_WHITESPACE = " \t\n\r"
+
+# Yielded by the parser when it has consumed everything fed so far.
+_NEED_DATA = object()
+
+_ParseEvents = Generator[object, None, None]
+
+
+def _invalid_json() -> AltApiError:
+    return AltApiError("ALT RDB API returned invalid JSON response")
+
+
+class _TextBuffer:
+    """Unconsumed tail of the payload text.
+
+    Only text that has not been parsed yet is kept, so memory stays proportional to the
+    largest single JSON value being decoded rather than to the whole payload.
+    """
+
+    def __init__(self) -> None:
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def feed(self, data: bytes) -> None:
+        if self.pos > _COMPACT_THRESHOLD:
+            self.buf = self.buf[self.pos :]
+            self.pos = 0
+        try:
+            self.buf += self._decoder.decode(data)
+        except UnicodeDecodeError as exc:
+            raise _invalid_json() from exc
+
+    def finish(self) -> None:
+        try:
+            self.buf += self._decoder.decode(b"", final=True)
+        except UnicodeDecodeError as exc:
+            raise _invalid_json() from exc
+        self.eof = True
+
+    def peek(self) -> Generator[object, None, str]:
+        """Return the next non-whitespace character without consuming it ('' at EOF)."""
+
+        while True:
+            n = len(self.buf)
+            while self.pos < n and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < n:
+                return self.buf[self.pos]
+            if self.eof:
+                return ""
+            yield _NEED_DATA
+
+    def expect(self, char: str) -> Generator[object, None, None]:
+        if (yield from self.peek()) != char:
+            raise _invalid_json()
+        self.pos += 1
+
+    def value(self) -> Generator[object, None, object]:
+        """Decode the next complete JSON value, asking for more data as needed."""
+
+        yield from self.peek()
+        while True:
+            try:
+                obj, end = self._json.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as exc:
+                if self.eof:
+                    raise _invalid_json() from exc
+                yield _NEED_DATA
+                continue
+
+            # A number ending exactly at the buffer boundary may continue in the next chunk.
+            if end == len(self.buf) and not self.eof:
+                yield _NEED_DATA
+                continue
+
+            self.pos = end
+            return obj
+
+
+def _parse_payload(reader: _TextBuffer) -> _ParseEvents:
+    """Yield raw ``packages`` entries, interleaved with ``_NEED_DATA`` requests."""
+
+    if (yield from reader.peek()) != "{":
+        yield from reader.value()  # validate and ignore non-object payloads
+        yield from _expect_eof(reader)
+        return
+
+    yield from reader.expect("{")
+    if (yield from reader.peek()) == "}":
+        reader.pos += 1
+        yield from _expect_eof(reader)
+        return
+
+    while True:
+        key = yield from reader.value()
+        if not isinstance(key, str):
+            raise _invalid_json()
+        yield from reader.expect(":")
+
+        if key != "packages":
+            yield from reader.value()
+        elif (yield from reader.peek()) != "[":
+            yield from reader.value()
+            raise AltApiError("Unexpected ALT RDB API response shape: 'packages' is not a list")
+        else:
+            yield from reader.expect("[")
+            if (yield from reader.peek()) == "]":
+                reader.pos += 1
+            else:
+                while True:
+                    yield (yield from reader.value())
+                    sep = yield from reader.peek()
+                    reader.pos += 1
+                    if sep == "]":
+                        break
+                    if sep != ",":
+                        raise _invalid_json()
+
+        sep = yield from reader.peek()
+        reader.pos += 1
+        if sep == "}":
+            break
+        if sep != ",":
+            raise _invalid_json()
+
+    yield from _expect_eof(reader)
+
+
+def _expect_eof(reader: _TextBuffer) -> Generator[object, None, None]:
+    if (yield from reader.peek()) != "":
+        raise _invalid_json()
+
+
+def iter_payload_packages(chunks: Iterable[bytes]) -> Iterator[object]:
+    """Yield raw entries of the top-level ``packages`` list as they are decoded.
+
+    ``chunks`` is any iterable of bytes (e.g. ``response.iter_content()``). Other top-level
+    keys are decoded and discarded one value at a time. Non-object payloads yield nothing,
+    mirroring the non-streaming parser.
+    """
+
+    reader = _TextBuffer()
+    source = iter(chunks)
+    for event in _parse_payload(reader):
+        if event is not _NEED_DATA:
+            yield event
+            continue
+
+        for chunk in source:
+            if chunk:
+                reader.feed(chunk)
+                break
+        else:
+            reader.finish()
+
+
+class PayloadParser:
+    """Push-style counterpart of :func:`iter_payload_packages`.
+
+    For callers that receive the body asynchronously: :meth:`feed` each chunk and collect the
+    packages completed so far, then :meth:`close` at end of body to validate the remainder.
+    """
+
+    def __init__(self) -> None:
+        self._reader = _TextBuffer()
+        self._events = _parse_payload(self._reader)
+        self._done = False
+
+    def feed(self, data: bytes) -> list[object]:
+        if data:
+            self._reader.feed(data)
+        return self._drain()
+
+    def close(self) -> list[object]:
+        self._reader.finish()
+        packages = self._drain()
+        if not self._done:  # pragma: no cover - the parser never waits once EOF is set
+            raise _invalid_json()
+        return packages
+
+    def _drain(self) -> list[object]:
+        packages: list[object] = []
+        if self._done:
+            return packages
+        for event in self._events:
+            if event is _NEED_DATA:
+                return packages
+            packages.append(event)
+        self._done = True
+        return packages
@@ -1,6 +1,25 @@
 from __future__ import annotations
 
+import sys
+from array import array
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass
+from functools import lru_cache
+from typing import Protocol
+
+# Token kinds for version_key(), numbered in the order rpmvercmp ranks what can appear at the
+# same position: '~'/'^' directly after the previous segment, '~'/'^' after separators, an
+# alpha segment, a zero segment followed (eventually) by something lower than end-of-string,
+# end-of-string, a zero segment followed by a non-zero number, and a non-zero number.
+_TILDE, _CARET, _SEP_TILDE, _SEP_CARET, _ALPHA, _ZERO_LOW, _END, _ZERO_HIGH, _NUM = range(9)
+
+VersionKey = tuple[int | str, ...]
+EvrKey = tuple[int, VersionKey, VersionKey]
+EvrTuple = tuple[int, str, str]
+
+DEFAULT_VERSION_CACHE_SIZE = 65536
 
 
 def _is_separators_only_or_zeros(value: str, start: int) -> bool:
@@ -53,11 +72,17 @@ def rpmvercmp(a: str | None, b: str | None) -> int:
     - compares alpha segments lexicographically
     - '~' sorts before everything
     - treats trailing ".0" segments as equal
+
+    Results are memoized while a :class:`VersionCache` is active (see :func:`use_version_cache`).
     """
 
-    a = a or ""
-    b = b or ""
+    cache = _active_cache.get()
+    if cache is not None:
+        return cache.rpmvercmp(a, b)
+    return _rpmvercmp(a or "", b or "")
+
 
+def _rpmvercmp(a: str, b: str) -> int:
     i = 0
     j = 0
     na = len(a)
@@ -149,6 +174,150 @@ def rpmvercmp(a: str | None, b: str | None) -> int:
         j = ib
 
 
+def _zero_segment_kind(value: str, start: int) -> int | None:
+    """Classify a zero segment ending at ``start`` by what follows it (``None``: only zeros)."""
+
+    if _is_separators_only_or_zeros(value, start):
+        return None
+
+    i = start
+    n = len(value)
+    while True:
+        while i < n and not value[i].isalnum() and value[i] not in "~^":
+            i += 1
+        if value[i] != "0":
+            return _ZERO_HIGH if value[i].isdigit() else _ZERO_LOW
+        while i < n and value[i] == "0":
+            i += 1
+
+
+def version_key(value: str | None) -> VersionKey:
+    """Tokenize a version or release string once into a key ordered like :func:`rpmvercmp`.
+
+    ``version_key(a) < version_key(b)`` iff ``rpmvercmp(a, b) < 0`` (likewise for ``==``),
+    so keys can be compared, sorted and hashed directly. Each token is flattened into three
+    slots (kind, length, text); trailing zero segments are dropped, so ``"1"`` and ``"1.0"``
+    share a key. The one divergence is inherent to rpmvercmp, which is not transitive there:
+    a zero segment followed by ``~``, ``^`` or letters ranks below end-of-string (``"1.0~rc"
+    < "1.0"``), while rpmvercmp puts ``"1.0~rc"`` above ``"1"``. Characters that are neither
+    letters nor digits are treated as separators. Memoized like :func:`rpmvercmp`.
+    """
+
+    cache = _active_cache.get()
+    if cache is not None:
+        return cache.version_key(value)
+    return _version_key(value or "")
+
+
+def _version_key(value: str) -> VersionKey:
+    n = len(value)
+    key: list[int | str] = []
+    i = 0
+
+    while True:
+        start = i
+        while i < n and not value[i].isalnum() and value[i] not in "~^":
+            i += 1
+        if i >= n:
+            break
+
+        ch = value[i]
+        if ch == "~":
+            key += (_TILDE if i == start else _SEP_TILDE, 0, "")
+            i += 1
+        elif ch == "^":
+            key += (_CARET if i == start else _SEP_CARET, 0, "")
+            i += 1
+        elif ch.isdigit():
+            j = i
+            while j < n and value[j].isdigit():
+                j += 1
+            digits = value[i:j].lstrip("0")
+            if digits:
+                key += (_NUM, len(digits), digits)
+            else:
+                kind = _zero_segment_kind(value, j)
+                if kind is None:
+                    break  # trailing zero segments compare equal to end-of-string
+                key += (kind, 0, "")
+            i = j
+        elif ch.isalpha():
+            j = i
+            while j < n and value[j].isalpha():
+                j += 1
+            key += (_ALPHA, 0, value[i:j])
+            i = j
+        else:
+            i += 1  # alphanumeric but neither a letter nor a digit, e.g. vulgar fractions
+
+    key += (_END, 0, "")
+    return tuple(key)
+
+
+class VersionCache:
+    """Bounded LRU memo for :func:`rpmvercmp` results and :func:`version_key` tokenization.
+
+    Version strings repeat heavily across packages and branches (``1.0``, ``alt1``...), so a
+    comparison or a matrix run hits the same inputs over and over. Inputs are interned, which
+    keeps one copy of each string alive in the cache and makes key hashing and equality cheap.
+    Thread-safe; ``maxsize`` applies to each of the two memo tables.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_VERSION_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._cmp = lru_cache(maxsize=maxsize)(_rpmvercmp)
+        self._key = lru_cache(maxsize=maxsize)(_version_key)
+
+    def rpmvercmp(self, a: str | None, b: str | None) -> int:
+        return self._cmp(sys.intern(a or ""), sys.intern(b or ""))
+
+    def version_key(self, value: str | None) -> VersionKey:
+        return self._key(sys.intern(value or ""))
+
+    def clear(self) -> None:
+        self._cmp.cache_clear()
+        self._key.cache_clear()
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        result: dict[str, dict[str, int]] = {}
+        for name, memo in (("rpmvercmp", self._cmp), ("version_key", self._key)):
+            info = memo.cache_info()
+            result[name] = {"hits": info.hits, "misses": info.misses, "size": info.currsize, "maxsize": self.maxsize}
+        return result
+
+
+_active_cache: ContextVar[VersionCache | None] = ContextVar("version_cache", default=None)
+
+
+@contextmanager
+def use_version_cache(cache: VersionCache | None) -> Iterator[VersionCache | None]:
+    """Memoize :func:`rpmvercmp`/:func:`version_key` with ``cache`` in the current context.
+
+    ``None`` disables memoization inside the block.
+    """
+
+    token = _active_cache.set(cache)
+    try:
+        yield cache
+    finally:
+        _active_cache.reset(token)
+
+
+class _HasEVR(Protocol):
+    epoch: int
+    version: str
+    release: str
+
+
+def evr_key(evr: _HasEVR) -> EvrKey:
+    """Sort key for anything with ``epoch``/``version``/``release`` (EVR, packages, rows).
+
+    Comparing keys is equivalent to :func:`compare_evr`, e.g. ``max(packages, key=evr_key)``.
+    """
+
+    return (evr.epoch, version_key(evr.version), version_key(evr.release))
+
+
 @dataclass(frozen=True, slots=True)
 class EVR:
     epoch: int
@@ -167,6 +336,43 @@ def compare_evr(a: EVR, b: EVR) -> int:
     return rpmvercmp(a.release, b.release)
 
 
+def compare_evr_many(left: Sequence[EvrTuple], right: Sequence[EvrTuple]) -> array[int]:
+    """Compare ``left[i]`` with ``right[i]`` for every ``i``; returns ``array('b')`` of -1/0/1.
+
+    Items are ``(epoch, version, release)`` tuples. Identical items and epoch differences are
+    settled in a single pass; the remaining pairs are deduplicated, so each distinct pair of
+    version/release strings goes through :func:`rpmvercmp` only once.
+    """
+
+    if len(left) != len(right):
+        raise ValueError("compare_evr_many needs sequences of equal length")
+
+    result = array("b", bytes(len(left)))
+    pending: dict[tuple[str, str, str, str], list[int]] = {}
+
+    for i, (a, b) in enumerate(zip(left, right, strict=True)):
+        if a == b:
+            continue
+        epoch_a, version_a, release_a = a
+        epoch_b, version_b, release_b = b
+        if epoch_a != epoch_b:
+            result[i] = 1 if epoch_a > epoch_b else -1
+            continue
+        rows = pending.get((version_a, release_a, version_b, release_b))
+        if rows is None:
+            pending[(version_a, release_a, version_b, release_b)] = [i]
+        else:
+            rows.append(i)
+
+    for (version_a, release_a, version_b, release_b), rows in pending.items():
+        rc = rpmvercmp(version_a, version_b) or rpmvercmp(release_a, release_b)
+        if rc:
+            for i in rows:
+                result[i] = rc
+
+    return result
+
+
 def compare_version_release(version_release1: str, version_release2: str) -> int:
     """Backwards-compatible helper: compares 'version-release' strings."""
 
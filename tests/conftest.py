@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+import package_comparison_tool.api as api_mod
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    parser.addoption("--startup-timing", action="store_true", help="run wall-clock startup checks")
+
+
+def pytest_collection_modifyitems(config: pytest.Config, items: list[pytest.Item]) -> None:
+    if config.getoption("--startup-timing"):
+        return
+    skip = pytest.mark.skip(reason="needs --startup-timing")
+    for item in items:
+        if "startup_timing" in item.keywords:
+            item.add_marker(skip)
+
+
+def make_package(name: str, **fields: object) -> dict[str, object]:
+    package: dict[str, object] = {
+        "name": name,
+        "epoch": 0,
+        "version": "1.0",
+        "release": "alt1",
+        "arch": "x86_64",
+        "buildtime": 0,
+        "disttag": "",
+    }
+    package.update(fields)
+    return package
+
+
+class FakeRdb:
+    """Local stand-in for the ALT RDB export API (``/branch_binary_packages/<branch>``)."""
+
+    def __init__(self) -> None:
+        self.branches: dict[str, list[dict[str, object]]] = {}
+        self.etags: dict[str, str] = {}
+        self.failures: dict[str, list[int]] = {}
+        self.retry_after: str | None = None
+        self.requests: list[tuple[str, dict[str, str]]] = []
+        self.arch_filter = True  # honor ?arch= like the real export endpoint
+        self.chunked = False
+        self.gzip = False
+        self.delay_s = 0.0
+        self.delays: list[float] = []  # per-request delays, consumed in arrival order
+        self.lock = threading.Lock()
+        self.base_url = ""
+
+    def set_branch(self, branch: str, packages: list[dict[str, object]], *, etag: str | None = None) -> None:
+        self.branches[branch] = packages
+        if etag is not None:
+            self.etags[branch] = etag
+
+    def fail_next(self, branch: str, *statuses: int) -> None:
+        self.failures.setdefault(branch, []).extend(statuses)
+
+    def count(self, branch: str) -> int:
+        return sum(1 for path, _headers in self.requests if urlsplit(path).path.endswith(f"/{branch}"))
+
+
+def _make_handler(rdb: FakeRdb) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *_args: object) -> None:
+            pass
+
+        def _send(self, status: int, body: bytes = b"", headers: dict[str, str] | None = None) -> None:
+            self.send_response(status)
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            if rdb.gzip and body:
+                body = gzip.compress(body)
+                self.send_header("Content-Encoding", "gzip")
+            if rdb.chunked and body:
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i in range(0, len(body), 7):
+                    piece = body[i : i + 7]
+                    self.wfile.write(f"{len(piece):x}\r\n".encode() + piece + b"\r\n")
+                self.wfile.write(b"0\r\n\r\n")
+            else:
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        def do_GET(self) -> None:  # noqa: N802
+            import time
+
+            with rdb.lock:
+                rdb.requests.append((self.path, dict(self.headers.items())))
+                delay = rdb.delays.pop(0) if rdb.delays else rdb.delay_s
+            if delay:
+                time.sleep(delay)
+
+            parts = urlsplit(self.path)
+            branch = parts.path.rstrip("/").rsplit("/", 1)[-1]
+            with rdb.lock:
+                pending = rdb.failures.get(branch)
+                status = pending.pop(0) if pending else None
+            if status is not None:
+                headers = {"Retry-After": rdb.retry_after} if rdb.retry_after is not None else None
+                self._send(status, b"temporarily unavailable", headers)
+                return
+
+            packages = rdb.branches.get(branch)
+            if packages is None:
+                self._send(404, b'{"message": "not found"}')
+                return
+
+            etag = rdb.etags.get(branch)
+            if etag is not None and self.headers.get("If-None-Match") == etag:
+                self._send(304, headers={"ETag": etag})
+                return
+
+            arch = parse_qs(parts.query).get("arch", [None])[0]
+            if arch is not None and rdb.arch_filter:
+                packages = [p for p in packages if p.get("arch") == arch]
+            body = json.dumps({"request_args": {"arch": arch}, "length": len(packages), "packages": packages})
+            headers = {"Content-Type": "application/json"}
+            if etag is not None:
+                headers["ETag"] = etag
+            self._send(200, body.encode("utf8"), headers)
+
+    return Handler
+
+
+@pytest.fixture
+def fake_rdb(monkeypatch):
+    rdb = FakeRdb()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(rdb))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    rdb.base_url = f"http://127.0.0.1:{server.server_address[1]}/api/export"
+    monkeypatch.setattr(api_mod, "ALT_RDB_API_BASE", rdb.base_url)
+    try:
+        yield rdb
+    finally:
+        server.shutdown()
+        server.server_close()
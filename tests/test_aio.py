@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+import package_comparison_tool.api as api_mod
+from package_comparison_tool.aio import (
+    compare_packages_async,
+    fetch_branch_binary_packages_async,
+    fetch_branch_snapshot_async,
+)
+from package_comparison_tool.api import fetch_branch_binary_packages
+from package_comparison_tool.exceptions import AltApiError, BranchNotFoundError
+
+from .conftest import make_package
+
+
+@pytest.mark.parametrize("mode", ["content-length", "chunked", "gzip"])
+def test_fetch_async_matches_sync_engine(fake_rdb, mode: str) -> None:
+    fake_rdb.set_branch("sisyphus", [make_package(f"pkg{i}", arch="noarch" if i % 2 else "x86_64") for i in range(20)])
+    fake_rdb.chunked = mode == "chunked"
+    fake_rdb.gzip = mode == "gzip"
+
+    packages = asyncio.run(fetch_branch_binary_packages_async("sisyphus", arches={"noarch"}, user_agent="ua-test"))
+
+    assert packages == fetch_branch_binary_packages("sisyphus", arches={"noarch"}, retries=1)
+    assert fake_rdb.requests[0][1]["User-Agent"] == "ua-test"
+
+
+def test_fetch_async_retries_retryable_statuses(fake_rdb) -> None:
+    fake_rdb.set_branch("p10", [make_package("pkg")])
+    fake_rdb.fail_next("p10", 503, 502)
+
+    snapshot = asyncio.run(fetch_branch_snapshot_async("p10", retries=3, retry_backoff=0))
+
+    assert [p.name for p in snapshot] == ["pkg"]
+    assert fake_rdb.count("p10") == 3
+
+
+def test_fetch_async_errors(fake_rdb) -> None:
+    fake_rdb.set_branch("p10", [make_package("pkg")])
+    fake_rdb.fail_next("p10", 500)
+
+    with pytest.raises(BranchNotFoundError):
+        asyncio.run(fetch_branch_binary_packages_async("missing", retries=1))
+    with pytest.raises(AltApiError, match="500"):
+        asyncio.run(fetch_branch_binary_packages_async("p10", retries=1))
+
+
+def test_compare_packages_async_bounded_concurrency(fake_rdb) -> None:
+    fake_rdb.set_branch("a", [make_package("pkg1", version="2.0"), make_package("only-a")])
+    fake_rdb.set_branch("b", [make_package("pkg1", version="1.0")])
+    fake_rdb.set_branch("c", [make_package("pkg1", version="3.0")])
+
+    async def run() -> list[dict[str, object]]:
+        semaphore = asyncio.Semaphore(1)
+        return await asyncio.gather(
+            compare_packages_async("a", "b", semaphore=semaphore),
+            compare_packages_async("a", "c", semaphore=semaphore),
+        )
+
+    ab, ac = asyncio.run(run())
+
+    assert ab["stats"]["higher_in_branch1"] == 1
+    assert ab["stats"]["only_in_branch1"] == 1
+    assert ac["stats"]["higher_in_branch2"] == 1
+
+
+@pytest.mark.parametrize(
+    "framing", [b"Transfer-Encoding: chunked\r\n\r\nzz\r\n", b"Content-Length: ten\r\n\r\n{}"]
+)
+def test_fetch_async_malformed_framing_raises_alt_api_error(monkeypatch, framing: bytes) -> None:
+    async def run() -> None:
+        async def _reply(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            await reader.readuntil(b"\r\n\r\n")
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n" + framing)
+            await writer.drain()
+            writer.close()
+
+        server = await asyncio.start_server(_reply, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        monkeypatch.setattr(api_mod, "ALT_RDB_API_BASE", f"http://127.0.0.1:{port}/api/export")
+        async with server:
+            await fetch_branch_snapshot_async("p10", retries=1)
+
+    with pytest.raises(AltApiError, match="malformed (chunk size|Content-Length)"):
+        asyncio.run(run())
+
+
+def test_https_fetches_share_one_ssl_context(monkeypatch) -> None:
+    import package_comparison_tool.aio as aio_mod
+
+    contexts = []
+
+    async def refuse(host: str, port: int, *, ssl: object = None, limit: int = 0):
+        contexts.append(ssl)
+        raise ConnectionRefusedError(host)
+
+    monkeypatch.setattr(aio_mod.asyncio, "open_connection", refuse)
+    monkeypatch.setattr(api_mod, "ALT_RDB_API_BASE", "https://rdb.example/api/export")
+    for branch in ("a", "b"):
+        with pytest.raises(AltApiError):
+            asyncio.run(fetch_branch_snapshot_async(branch, retries=1))
+
+    assert len(contexts) == 2
+    assert contexts[0] is not None and contexts[0] is contexts[1]
+
+
+def test_compare_packages_async_diffs_off_the_loop(fake_rdb, monkeypatch) -> None:
+    import threading
+
+    import package_comparison_tool.aio as aio_mod
+
+    fake_rdb.set_branch("a", [make_package("pkg1", version="2.0")])
+    fake_rdb.set_branch("b", [make_package("pkg1", version="1.0")])
+    threads = []
+    diff = aio_mod._diff_branches
+    monkeypatch.setattr(aio_mod, "_diff_branches", lambda *a, **k: threads.append(threading.get_ident()) or diff(*a, **k))
+
+    result = asyncio.run(compare_packages_async("a", "b"))
+
+    assert result["stats"]["higher_in_branch1"] == 1
+    assert threads and threads[0] != threading.get_ident()
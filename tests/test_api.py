@@ -1,12 +1,22 @@
 from __future__ import annotations
 
+import asyncio
+
 import pytest
 import requests
 import responses
 
-from package_comparison_tool.api import ALT_RDB_API_BASE, fetch_branch_binary_packages
+from package_comparison_tool.aio import fetch_branch_binary_packages_async
+from package_comparison_tool.api import (
+    ALT_RDB_API_BASE,
+    fetch_branch_binary_packages,
+    fetch_branch_snapshot,
+    iter_branch_binary_packages,
+)
 from package_comparison_tool.exceptions import AltApiError, BranchNotFoundError
 
+from .conftest import make_package
+
 
 def _sample_payload() -> dict[str, object]:
     return {
@@ -94,3 +104,66 @@ def test_explicit_headers_override_user_agent_and_merge_session_headers() -> Non
     assert sent_headers["User-Agent"] == "explicit-UA"  # explicit headers win
     assert sent_headers["X-Test"] == "1"
     assert sent_headers["X-From-Session"] == "yes"
+
+
+@responses.activate
+def test_iter_branch_binary_packages_streams_with_filters() -> None:
+    branch = "sisyphus"
+    url = f"{ALT_RDB_API_BASE}/branch_binary_packages/{branch}"
+    payload = _sample_payload()
+    payload["packages"] = [
+        {**payload["packages"][0], "name": f"pkg{i}", "arch": "noarch" if i % 2 else "x86_64"}
+        for i in range(10)
+    ]
+    responses.add(responses.GET, url, json=payload, status=200)
+
+    packages = list(
+        iter_branch_binary_packages(branch, arches={"noarch"}, max_packages=3, retries=1, chunk_size=16)
+    )
+
+    assert [p.name for p in packages] == ["pkg1", "pkg3", "pkg5"]
+    assert fetch_branch_binary_packages(branch, stream=True, retries=1, arches={"x86_64"})[0].name == "pkg0"
+
+
+@responses.activate
+def test_fetch_branch_snapshot_builds_columns_without_package_objects() -> None:
+    branch = "sisyphus"
+    url = f"{ALT_RDB_API_BASE}/branch_binary_packages/{branch}"
+    responses.add(responses.GET, url, json=_sample_payload(), status=200)
+
+    snapshot = fetch_branch_snapshot(branch, retries=1)
+
+    assert snapshot.branch == branch
+    assert list(snapshot) == fetch_branch_binary_packages(branch, retries=1)
+
+
+@pytest.mark.parametrize("arch_filter", [True, False])
+def test_arch_filter_is_sent_to_server_per_arch(fake_rdb, arch_filter: bool) -> None:
+    fake_rdb.arch_filter = arch_filter  # False: server ignores ?arch=, client filter still applies
+    fake_rdb.set_branch(
+        "p10", [make_package(f"pkg{i}", arch=("noarch", "x86_64", "i586")[i % 3]) for i in range(30)]
+    )
+
+    packages = fetch_branch_binary_packages("p10", arches={"noarch", "x86_64"}, retries=1)
+    expected = fetch_branch_binary_packages("p10", arches={"noarch", "x86_64"}, retries=1, arch_query=False)
+
+    assert set(packages) == set(expected) and len(packages) == 20
+    queries = sorted(path.partition("?")[2] for path, _headers in fake_rdb.requests[:2])
+    assert queries == ["arch=noarch", "arch=x86_64"]
+
+    single = asyncio.run(fetch_branch_binary_packages_async("p10", arches={"noarch"}, retries=1))
+    assert {p.arch for p in single} == {"noarch"} and len(single) == 10
+    assert fake_rdb.requests[-1][0].endswith("?arch=noarch")
+
+
+def test_name_filter_skips_packages_while_parsing(fake_rdb) -> None:
+    from package_comparison_tool.filters import NameFilter
+
+    fake_rdb.set_branch("p10", [make_package(name) for name in ["nginx", "python3-foo", "bash", "nginx-extra"]])
+    name_filter = NameFilter(["^nginx", "bash$"])
+
+    packages = fetch_branch_binary_packages("p10", retries=1, name_filter=name_filter, max_packages=2)
+    snapshot = fetch_branch_snapshot("p10", retries=1, name_filter=name_filter)
+
+    assert [p.name for p in packages] == ["nginx", "bash"]
+    assert snapshot.column("name") == ["nginx", "bash", "nginx-extra"]
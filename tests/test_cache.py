@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import os
+
+import responses
+
+from package_comparison_tool.api import (
+    ALT_RDB_API_BASE,
+    fetch_branch_binary_packages,
+    iter_branch_binary_packages,
+)
+from package_comparison_tool.cache import SnapshotCache
+
+BRANCH = "sisyphus"
+URL = f"{ALT_RDB_API_BASE}/branch_binary_packages/{BRANCH}"
+
+
+def _payload(name: str = "pkg") -> dict[str, object]:
+    return {
+        "packages": [
+            {"name": name, "epoch": 0, "version": "1", "release": "1", "arch": "x86_64", "buildtime": 0, "disttag": ""}
+        ]
+    }
+
+
+@responses.activate
+def test_fresh_entry_is_served_without_request(tmp_path) -> None:
+    responses.add(responses.GET, URL, json=_payload(), headers={"ETag": '"v1"'})
+    cache = SnapshotCache(tmp_path, ttl_s=3600)
+
+    first = fetch_branch_binary_packages(BRANCH, cache=cache, retries=1)
+    second = fetch_branch_binary_packages(BRANCH, cache=cache, retries=1)
+    streamed = list(iter_branch_binary_packages(BRANCH, cache=cache, retries=1))
+
+    assert first == second == streamed
+    assert len(responses.calls) == 1
+
+
+@responses.activate
+def test_stale_entry_is_revalidated_with_conditional_get(tmp_path) -> None:
+    responses.add(
+        responses.GET,
+        URL,
+        json=_payload(),
+        headers={"ETag": '"v1"', "Last-Modified": "Wed, 01 May 2024 00:00:00 GMT"},
+    )
+    responses.add(responses.GET, URL, status=304)
+    cache = SnapshotCache(tmp_path, ttl_s=0)
+
+    fetch_branch_binary_packages(BRANCH, cache=cache, retries=1)
+    packages = fetch_branch_binary_packages(BRANCH, cache=cache, retries=1)
+
+    assert [p.name for p in packages] == ["pkg"]
+    conditional = responses.calls[1].request.headers
+    assert conditional["If-None-Match"] == '"v1"'
+    assert conditional["If-Modified-Since"] == "Wed, 01 May 2024 00:00:00 GMT"
+
+
+@responses.activate
+def test_streaming_cut_off_does_not_commit_partial_body(tmp_path) -> None:
+    payload = _payload()
+    payload["packages"] = payload["packages"] * 50
+    responses.add(responses.GET, URL, json=payload)
+    cache = SnapshotCache(tmp_path)
+
+    list(iter_branch_binary_packages(BRANCH, cache=cache, retries=1, max_packages=1, chunk_size=32))
+
+    assert cache.lookup(URL) is None
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_lru_eviction_keeps_total_size_bounded(tmp_path) -> None:
+    cache = SnapshotCache(tmp_path, max_bytes=25)
+    cache.store("a", b"x" * 10, etag=None, last_modified=None)
+    cache.store("b", b"x" * 10, etag=None, last_modified=None)
+    entry_a = cache.lookup("a")
+    assert entry_a is not None
+    os.utime(cache.lookup("b").body_path, (0, 0))  # make "b" the least recently used
+    cache.read_bytes(entry_a)
+
+    cache.store("c", b"x" * 10, etag=None, last_modified=None)
+
+    assert cache.lookup("a") is not None
+    assert cache.lookup("b") is None
+    assert cache.lookup("c") is not None
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import json
+
 from click.testing import CliRunner
 
 import package_comparison_tool.cli as cli
@@ -98,3 +100,118 @@ def test_cli_debug_shows_traceback(monkeypatch) -> None:
     assert result.exit_code == 1
     assert "Error: boom" in result.output
     assert "Traceback (most recent call last)" in result.output
+
+
+def test_cli_from_snapshot_passes_loaded_branch(monkeypatch, tmp_path) -> None:
+    from package_comparison_tool.models import PackageInfo
+    from package_comparison_tool.snapshot import BranchSnapshot, save_snapshot
+
+    path = tmp_path / "p10.snap"
+    save_snapshot(BranchSnapshot.from_packages([PackageInfo("pkg", 0, "1", "1", "noarch", 0, "")], branch="p10"), path)
+    seen: dict[str, object] = {}
+
+    def _compare(*_args, **kwargs):
+        seen.update(kwargs)
+        return _sample_result()
+
+    monkeypatch.setattr(cli, "compare_packages", _compare)
+
+    result = CliRunner().invoke(cli.main, ["sisyphus", "p10", "--from-snapshot", str(path)])
+    assert result.exit_code == 0, result.output
+    assert list(seen["snapshots"]) == ["p10"]
+
+    result = CliRunner().invoke(cli.main, ["sisyphus", "p9", "--from-snapshot", str(path)])
+    assert result.exit_code == 2
+    assert "not being compared" in result.output
+
+
+def test_cli_more_than_two_branches_uses_matrix(monkeypatch) -> None:
+    seen: list[tuple[str, ...]] = []
+
+    def _matrix(branches, **_kwargs):
+        seen.append(tuple(branches))
+        return {
+            "branches": list(branches),
+            "generated_at": "2024-01-01T00:00:00Z",
+            "comparisons": [_sample_result()],
+            "stats": {"pairs": 1, "differences": 1},
+        }
+
+    monkeypatch.setattr(cli, "compare_matrix", _matrix)
+
+    result = CliRunner().invoke(cli.main, ["sisyphus", "p10", "p9", "--format", "markdown", "--fail-on-diff"])
+
+    assert seen == [("sisyphus", "p10", "p9")]
+    assert result.exit_code == 1
+    assert "# Package comparison matrix: sisyphus, p10, p9" in result.output
+    assert "## Package comparison: a vs b" in result.output
+
+
+def test_cli_since_updates_previous_result(monkeypatch, tmp_path) -> None:
+    import json
+
+    import package_comparison_tool.compare as compare_mod
+    from package_comparison_tool.models import PackageInfo
+
+    branches = {
+        "sisyphus": [PackageInfo("pkg", 0, "2", "alt1", "noarch", 0, ""), PackageInfo("new", 0, "1", "alt1", "noarch", 0, "")],
+        "p10": [PackageInfo("pkg", 0, "1", "alt1", "noarch", 0, "")],
+    }
+    monkeypatch.setattr(compare_mod, "fetch_branch_snapshot", lambda branch, **_kwargs: branches[branch])
+    out = tmp_path / "last.json"
+    args = ["sisyphus", "p10", "--no-cache", "-o", str(out), "--since", str(out)]
+
+    result = CliRunner().invoke(cli.main, args)
+    assert result.exit_code == 0, result.output
+    assert "running a full comparison" in result.output
+    assert (tmp_path / "last.json.p10.snapshot").exists()
+
+    branches["p10"] = [PackageInfo("pkg", 0, "2", "alt1", "noarch", 0, "")]
+    result = CliRunner().invoke(cli.main, args)
+    assert result.exit_code == 0, result.output
+    assert "incrementally" in result.output
+
+    updated = json.loads(out.read_text())
+    assert updated["meta"]["incremental"]["changed_keys"] == 1
+    assert updated["stats"]["higher_in_branch1"] == 0
+    assert [p["name"] for p in updated["packages_only_in_branch1"]] == ["new"]
+
+    # A baseline computed with other options is not patched.
+    result = CliRunner().invoke(cli.main, [*args, "--ignore-arch"])
+    assert result.exit_code == 0, result.output
+    assert "computed with other options; running a full comparison" in result.output
+    assert "incremental" not in json.loads(out.read_text())["meta"]
+
+
+def test_cli_serve_starts_http_server(monkeypatch) -> None:
+    started = {}
+
+    class _Server:
+        server_address = ("127.0.0.1", 9999)
+
+        def serve_forever(self) -> None:
+            raise KeyboardInterrupt
+
+        def server_close(self) -> None:
+            started["closed"] = True
+
+    def _make_server(host, port, *, service):
+        started.update(host=host, port=port, refresh_s=service.store.refresh_s)
+        return _Server()
+
+    monkeypatch.setattr(cli, "make_server", _make_server)
+    result = CliRunner().invoke(cli.main, ["serve", "--port", "9999", "--refresh", "60"])
+
+    assert result.exit_code == 0, result.output
+    assert started == {"host": "127.0.0.1", "port": 9999, "refresh_s": 60.0, "closed": True}
+    assert "Serving on http://127.0.0.1:9999/compare" in result.output
+
+
+def test_cli_json_style_compact(monkeypatch) -> None:
+    runner = CliRunner()
+    monkeypatch.setattr(cli, "compare_packages", lambda *args, **kwargs: _sample_result())
+
+    result = runner.invoke(cli.main, ["--json-style", "compact"])
+
+    assert result.exit_code == 0
+    assert result.output.splitlines()[-1] == json.dumps(_sample_result(), sort_keys=True, separators=(",", ":"))
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import asyncio
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from package_comparison_tool.aio import fetch_branch_snapshot_async
+from package_comparison_tool.api import fetch_branch_snapshot
+from package_comparison_tool.coalesce import SingleFlight, fetch_key
+from package_comparison_tool.filters import NameFilter
+
+from .conftest import make_package
+
+
+def test_concurrent_threads_share_one_fetch(fake_rdb) -> None:
+    fake_rdb.set_branch("sisyphus", [make_package("a"), make_package("b")])
+    fake_rdb.delay_s = 0.2
+    flight: SingleFlight = SingleFlight()
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        snapshots = list(pool.map(lambda _: fetch_branch_snapshot("sisyphus", retries=1, singleflight=flight), range(6)))
+
+    assert fake_rdb.count("sisyphus") == 1
+    assert all(snapshot is snapshots[0] for snapshot in snapshots)
+    assert flight.as_dict() == {"calls": 1, "coalesced": 5, "ttl_hits": 0}
+
+    # Nothing is kept once the call is over unless a TTL is set.
+    fetch_branch_snapshot("sisyphus", retries=1, singleflight=flight)
+    assert fake_rdb.count("sisyphus") == 2
+
+
+def test_async_tasks_share_one_fetch(fake_rdb) -> None:
+    fake_rdb.set_branch("p10", [make_package("a")])
+    fake_rdb.delay_s = 0.2
+    flight: SingleFlight = SingleFlight()
+
+    async def _run() -> list:
+        calls = [fetch_branch_snapshot_async("p10", retries=1, singleflight=flight) for _ in range(4)]
+        return await asyncio.gather(*calls)
+
+    snapshots = asyncio.run(_run())
+    assert fake_rdb.count("p10") == 1
+    assert [len(s) for s in snapshots] == [1, 1, 1, 1]
+
+
+def test_ttl_serves_recent_results_and_failures_are_not_kept() -> None:
+    now = [0.0]
+    flight: SingleFlight[int] = SingleFlight(ttl_s=5.0, clock=lambda: now[0])
+    calls = []
+
+    def _fetch() -> int:
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        return len(calls)
+
+    with pytest.raises(RuntimeError):
+        flight.do("k", _fetch)
+    assert flight.do("k", _fetch) == 2
+    now[0] = 4.0
+    assert flight.do("k", _fetch) == 2
+    now[0] = 5.0
+    assert flight.do("k", _fetch) == 3
+    assert flight.as_dict() == {"calls": 3, "coalesced": 0, "ttl_hits": 1}
+
+
+def test_waiter_timeout_does_not_interrupt_the_leader() -> None:
+    flight: SingleFlight[str] = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def _slow() -> str:
+        started.set()
+        release.wait(5)
+        return "done"
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        leader = pool.submit(flight.do, "k", _slow)
+        started.wait(5)
+        with pytest.raises(TimeoutError):
+            flight.do("k", _slow, timeout=0.05)
+        release.set()
+        assert leader.result() == "done"
+
+
+def test_fetch_key_covers_response_affecting_options() -> None:
+    base = dict(arches={"noarch"}, max_packages=None, arch_query=True, headers={"User-Agent": "x"})
+    filters = (NameFilter(["^python3-"]), NameFilter([re.compile("^python3-")]))
+
+    assert fetch_key("p10", name_filter=filters[0], **base) == fetch_key("p10", name_filter=filters[1], **base)
+    assert fetch_key("p10", name_filter=None, **base) != fetch_key("p11", name_filter=None, **base)
+    assert fetch_key("p10", name_filter=None, **base) != fetch_key(
+        "p10", name_filter=None, **{**base, "headers": {"user-agent": "y"}}
+    )
+    assert fetch_key("p10", name_filter=None, **base) != fetch_key(
+        "p10", name_filter=None, **{**base, "arches": {"x86_64"}}
+    )
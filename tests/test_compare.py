@@ -1,7 +1,12 @@
+import random
 import re
 
+import pytest
+
 import package_comparison_tool.compare as compare_mod
 from package_comparison_tool.models import PackageInfo
+from package_comparison_tool.snapshot import BranchSnapshot
+from package_comparison_tool.version import VersionCache
 
 
 def _pkg(
@@ -33,7 +38,7 @@ def test_compare_packages_arch_aware(monkeypatch) -> None:
             return [_pkg("pkg1", version="1.0", release="2", arch="x86_64"), _pkg("pkg3", arch="noarch")]
         raise AssertionError(branch)
 
-    monkeypatch.setattr(compare_mod, "fetch_branch_binary_packages", fake_fetch)
+    monkeypatch.setattr(compare_mod, "fetch_branch_snapshot", fake_fetch)
 
     result = compare_mod.compare_packages("a", "b")
     assert result["stats"]["only_in_branch1"] == 1
@@ -53,7 +58,7 @@ def test_compare_packages_keeps_highest_evr_per_key(monkeypatch) -> None:
             return [_pkg("pkg1", version="1.0", release="1", arch="x86_64")]
         raise AssertionError(branch)
 
-    monkeypatch.setattr(compare_mod, "fetch_branch_binary_packages", fake_fetch)
+    monkeypatch.setattr(compare_mod, "fetch_branch_snapshot", fake_fetch)
 
     result = compare_mod.compare_packages("a", "b")
     assert result["stats"]["higher_in_branch1"] == 1
@@ -68,7 +73,7 @@ def test_compare_packages_ignore_arch(monkeypatch) -> None:
             return [_pkg("pkg1", version="1.0", release="1", arch="x86_64")]
         raise AssertionError(branch)
 
-    monkeypatch.setattr(compare_mod, "fetch_branch_binary_packages", fake_fetch)
+    monkeypatch.setattr(compare_mod, "fetch_branch_snapshot", fake_fetch)
 
     result = compare_mod.compare_packages("a", "b", ignore_arch=True)
     assert result["stats"]["higher_in_branch1"] == 1
@@ -82,10 +87,218 @@ def test_compare_packages_filters_by_name(monkeypatch) -> None:
             return [_pkg("keepme"), _pkg("another")]
         raise AssertionError(branch)
 
-    monkeypatch.setattr(compare_mod, "fetch_branch_binary_packages", fake_fetch)
+    monkeypatch.setattr(compare_mod, "fetch_branch_snapshot", fake_fetch)
 
     patterns = (re.compile("keep"),)
     result = compare_mod.compare_packages("a", "b", name_patterns=patterns)
     assert result["stats"]["differences"] == 0
     assert result["stats"]["total_branch1_indexed"] == 1
     assert result["stats"]["total_branch2_indexed"] == 1
+
+
+def test_compare_packages_accepts_snapshots(monkeypatch) -> None:
+    def fake_fetch(branch: str, **_kwargs):
+        if branch == "a":
+            return BranchSnapshot.from_packages([_pkg("pkg1", version="2.0"), _pkg("pkg2")], branch=branch)
+        if branch == "b":
+            return BranchSnapshot.from_packages([_pkg("pkg1", version="1.0")], branch=branch)
+        raise AssertionError(branch)
+
+    monkeypatch.setattr(compare_mod, "fetch_branch_snapshot", fake_fetch)
+
+    result = compare_mod.compare_packages("a", "b")
+    assert [p["name"] for p in result["packages_with_higher_version_in_branch1"]] == ["pkg1"]
+    assert [p["name"] for p in result["packages_only_in_branch1"]] == ["pkg2"]
+    assert result["packages_only_in_branch1"][0]["url"].endswith("/a/binary/pkg2/x86_64/")
+
+
+def test_compare_matrix_fetches_each_branch_once(monkeypatch) -> None:
+    calls: list[str] = []
+    data = {
+        "sisyphus": [_pkg("pkg1", version="3.0"), _pkg("new")],
+        "p10": [_pkg("pkg1", version="2.0")],
+        "p9": [_pkg("pkg1", version="1.0"), _pkg("old")],
+    }
+
+    def fake_fetch(branch: str, **_kwargs):
+        calls.append(branch)
+        return data[branch]
+
+    monkeypatch.setattr(compare_mod, "fetch_branch_snapshot", fake_fetch)
+
+    result = compare_mod.compare_matrix(["sisyphus", "p10", "p9"])
+
+    assert sorted(calls) == ["p10", "p9", "sisyphus"]
+    pairs = [(c["branch1"], c["branch2"]) for c in result["comparisons"]]
+    assert pairs == [("sisyphus", "p10"), ("sisyphus", "p9"), ("p10", "p9")]
+    assert result["comparisons"][1]["stats"]["higher_in_branch1"] == 1
+    assert result["comparisons"][1]["stats"]["only_in_branch2"] == 1
+    assert result["stats"]["pairs"] == 3
+    assert result["stats"]["differences"] == sum(c["stats"]["differences"] for c in result["comparisons"])
+
+
+def test_compare_matrix_with_version_cache(monkeypatch) -> None:
+    releases = {"a": "alt1", "b": "alt2", "c": "alt1"}
+
+    def fake_fetch(branch: str, **_kwargs):
+        return [_pkg(f"pkg{i}", version="1.0", release=releases[branch]) for i in range(5)]
+
+    monkeypatch.setattr(compare_mod, "fetch_branch_snapshot", fake_fetch)
+    cache = VersionCache(maxsize=16)
+
+    cached = compare_mod.compare_matrix(["a", "b", "c"], version_cache=cache)
+    plain = compare_mod.compare_matrix(["a", "b", "c"])
+
+    assert cached["stats"] == plain["stats"]
+    stats = cached["meta"]["version_cache"]["rpmvercmp"]
+    # a/c are identical and skipped; a/b and b/c share the ("1.0", "1.0") comparison
+    assert stats == {"hits": 1, "misses": 3, "size": 3, "maxsize": 16}
+    assert "version_cache" not in plain["meta"]
+
+
+@pytest.mark.parametrize("ignore_arch", [False, True])
+def test_merge_engine_matches_hash_engine(monkeypatch, ignore_arch: bool) -> None:
+    rng = random.Random(7)
+
+    def _branch() -> list[PackageInfo]:
+        return [
+            _pkg(
+                f"pkg{rng.randrange(60)}",
+                epoch=rng.choice([0, 0, 0, 1]),
+                version=rng.choice(["1.0", "1.0.0", "1.2", "2.0~rc1"]),
+                release=rng.choice(["alt1", "alt2", "alt1.1"]),
+                arch=rng.choice(["x86_64", "noarch"]),
+                buildtime=rng.randrange(1000),
+            )
+            for _ in range(150)
+        ]
+
+    branches = {"a": _branch(), "b": _branch(), "c": sorted(_branch(), key=lambda p: (p.name, p.arch))}
+    monkeypatch.setattr(compare_mod, "fetch_branch_snapshot", lambda branch, **_kwargs: branches[branch])
+
+    for b1, b2 in [("a", "b"), ("b", "c"), ("c", "a")]:
+        hashed = compare_mod.compare_packages(b1, b2, ignore_arch=ignore_arch)
+        merged = compare_mod.compare_packages(b1, b2, ignore_arch=ignore_arch, engine="merge")
+        del hashed["generated_at"], merged["generated_at"]
+        assert merged == hashed
+
+    matrix = compare_mod.compare_matrix(["a", "b", "c"], ignore_arch=ignore_arch, engine="merge")
+    assert matrix["stats"] == compare_mod.compare_matrix(["a", "b", "c"], ignore_arch=ignore_arch)["stats"]
+
+
+@pytest.mark.parametrize("engine", ["hash", "merge"])
+@pytest.mark.parametrize("ignore_arch", [False, True])
+def test_worker_processes_match_in_process_comparison(monkeypatch, engine, ignore_arch: bool) -> None:
+    rng = random.Random(5)
+
+    def _branch() -> list[PackageInfo]:
+        return [
+            _pkg(
+                f"pkg{rng.randrange(50)}",
+                version=rng.choice(["1.0", "1.1", "2.0"]),
+                arch=rng.choice(["x86_64", "noarch"]),
+                buildtime=rng.randrange(100),
+            )
+            for _ in range(120)
+        ]
+
+    branches = {"a": _branch(), "b": _branch(), "c": _branch()}
+    monkeypatch.setattr(compare_mod, "fetch_branch_snapshot", lambda branch, **_kwargs: branches[branch])
+    options = dict(ignore_arch=ignore_arch, engine=engine)
+
+    pooled = compare_mod.compare_packages("a", "b", workers=3, **options).to_dict()
+    single = compare_mod.compare_packages("a", "b", **options).to_dict()
+    del pooled["generated_at"], single["generated_at"]
+    assert pooled == single
+
+    pooled_matrix = compare_mod.compare_matrix(["a", "b", "c"], pairs=[("a", "b"), ("c", "b")], workers=2, **options)
+    single_matrix = compare_mod.compare_matrix(["a", "b", "c"], pairs=[("a", "b"), ("c", "b")], **options)
+    assert pooled_matrix["stats"] == single_matrix["stats"]
+    for left, right in zip(pooled_matrix["comparisons"], single_matrix["comparisons"], strict=True):
+        del left["generated_at"], right["generated_at"]
+        assert left.to_dict() == right.to_dict()
+
+    with pytest.raises(ValueError, match="workers must be at least 1"):
+        compare_mod.compare_packages("a", "b", workers=0)
+
+
+def test_worker_processes_are_not_forked(monkeypatch) -> None:
+    branches = {"a": [_pkg("pkg1", version="2.0")], "b": [_pkg("pkg1", version="1.0")]}
+    monkeypatch.setattr(compare_mod, "fetch_branch_snapshot", lambda branch, **_kwargs: branches[branch])
+    start_methods = []
+    pool_cls = compare_mod.ProcessPoolExecutor
+
+    def _pool(*args, mp_context=None, **kwargs):
+        start_methods.append(mp_context.get_start_method() if mp_context is not None else None)
+        return pool_cls(*args, mp_context=mp_context, **kwargs)
+
+    monkeypatch.setattr(compare_mod, "ProcessPoolExecutor", _pool)
+
+    assert compare_mod.compare_packages("a", "b", workers=2)["stats"]["higher_in_branch1"] == 1
+    assert start_methods and start_methods[0] in ("forkserver", "spawn")
+
+
+def test_compare_packages_rejects_unknown_engine() -> None:
+    with pytest.raises(ValueError, match="unknown diff engine"):
+        compare_mod.compare_packages("a", "b", engine="btree")  # type: ignore[arg-type]
+
+
+@pytest.mark.parametrize("ignore_arch", [False, True])
+def test_incremental_update_matches_full_comparison(monkeypatch, ignore_arch: bool) -> None:
+    rng = random.Random(11)
+
+    def _random_pkg() -> PackageInfo:
+        return _pkg(
+            f"pkg{rng.randrange(80)}",
+            version=rng.choice(["1.0", "1.1", "2.0"]),
+            release=rng.choice(["alt1", "alt2"]),
+            arch=rng.choice(["x86_64", "noarch"]),
+            buildtime=rng.randrange(3),
+        )
+
+    def _churn(packages: list[PackageInfo]) -> list[PackageInfo]:
+        kept = [p for p in packages if rng.random() > 0.05]
+        return kept + [_random_pkg() for _ in range(8)]
+
+    old = {"a": [_random_pkg() for _ in range(200)], "b": [_random_pkg() for _ in range(200)]}
+    new = {"a": _churn(old["a"]), "b": _churn(old["b"])}
+    branches = old
+    monkeypatch.setattr(compare_mod, "fetch_branch_snapshot", lambda branch, **_kwargs: branches[branch])
+
+    baseline: dict[str, BranchSnapshot] = {}
+    previous = compare_mod.compare_packages("a", "b", ignore_arch=ignore_arch, fetched_snapshots=baseline)
+
+    branches = new
+    updated = compare_mod.compare_packages(
+        "a", "b", ignore_arch=ignore_arch, previous_result=previous, previous_snapshots=baseline
+    )
+    full = compare_mod.compare_packages("a", "b", ignore_arch=ignore_arch)
+
+    assert 0 < updated["meta"]["incremental"]["changed_keys"] < 160
+    for result in (updated, full):
+        del result["generated_at"], result["meta"]
+    assert updated == full
+
+
+def test_incremental_update_checks_branches(monkeypatch) -> None:
+    monkeypatch.setattr(compare_mod, "fetch_branch_snapshot", lambda branch, **_kwargs: [_pkg("p")])
+    previous = compare_mod.compare_packages("a", "b")
+
+    with pytest.raises(ValueError, match="compares a vs b"):
+        compare_mod.compare_packages("a", "c", previous_result=previous, previous_snapshots={})
+    with pytest.raises(ValueError, match="no snapshot for: b"):
+        compare_mod.compare_packages("a", "b", previous_result=previous, previous_snapshots={"a": None})
+
+
+@pytest.mark.parametrize(
+    "options",
+    [{"ignore_arch": True}, {"arches": {"noarch"}}, {"name_patterns": [re.compile("^p")]}, {"max_packages": 5}],
+)
+def test_incremental_update_rejects_other_options(monkeypatch, options: dict) -> None:
+    monkeypatch.setattr(compare_mod, "fetch_branch_snapshot", lambda branch, **_kwargs: [_pkg("p")])
+    baseline: dict[str, BranchSnapshot] = {}
+    previous = compare_mod.compare_packages("a", "b", fetched_snapshots=baseline)
+    assert previous["meta"]["options"]["ignore_arch"] is False
+
+    with pytest.raises(ValueError, match="computed with options"):
+        compare_mod.compare_packages("a", "b", previous_result=previous, previous_snapshots=baseline, **options)
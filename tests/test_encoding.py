@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import io
+import json
+
+import pytest
+
+from package_comparison_tool import encoding, formatting
+from package_comparison_tool.encoding import JsonEncoder
+from package_comparison_tool.formatting import write_json
+from package_comparison_tool.models import PackageInfo
+from package_comparison_tool.result import CompareResult, PackageList
+from package_comparison_tool.snapshot import BranchSnapshot
+
+_DUMPS_OPTIONS = {
+    "pretty": {"indent": 2, "sort_keys": True},
+    "compact": {"separators": (",", ":"), "sort_keys": True},
+}
+
+
+def _lazy_result() -> CompareResult:
+    snapshot = BranchSnapshot.from_packages(
+        [
+            PackageInfo("pkg-ü", 1, "2.0", "alt1", "noarch", 1700000000, 'q"\x01,\n'),
+            PackageInfo("{name}", 0, "1.0", "alt1", "x86_64", 0, ""),
+            PackageInfo("pkg/b", 0, "1.0", "alt1", "x86_64", 2**40, "tag"),
+        ],
+        branch="p10",
+    )
+    result = CompareResult(
+        branch1="p10",
+        branch2="p11",
+        generated_at="2024-01-01T00:00:00+00:00",
+        buckets={
+            "packages_only_in_branch1": PackageList(snapshot, [0, 2, 1], branch="p10"),
+            "packages_only_in_branch2": PackageList(snapshot, [], branch="p11"),
+            "packages_with_higher_version_in_branch1": PackageList(snapshot, [1], branch="p10"),
+            "packages_with_higher_version_in_branch2": PackageList(snapshot, [2], branch="p11"),
+        },
+        stats={"differences": 5},
+    )
+    result["meta"] = {"timings": {"fetch_s": 0.25, "big": 2**70}, "pairs": [[1, 2], []]}
+    return result
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+@pytest.mark.parametrize("style", ["pretty", "compact"])
+def test_json_styles_are_byte_stable(monkeypatch, style: str, use_orjson: bool) -> None:
+    if not use_orjson:
+        monkeypatch.setattr(encoding, "orjson", None)
+        monkeypatch.setattr(formatting, "_ENCODERS", {style: JsonEncoder.for_style(style)})  # type: ignore[arg-type]
+    lazy = _lazy_result()
+    expected = json.dumps(lazy.to_dict(), ensure_ascii=False, **_DUMPS_OPTIONS[style]) + "\n"
+
+    for result in (lazy, lazy.to_dict()):
+        buffer = io.StringIO()
+        write_json(result, buffer, style=style)
+        assert buffer.getvalue() == expected
+
+
+@pytest.mark.parametrize("style", ["pretty", "compact"])
+def test_package_rows_match_flat_encoding_of_package_dicts(style: str) -> None:
+    encoder = JsonEncoder.for_style(style)  # type: ignore[arg-type]
+    packages = _lazy_result()["packages_only_in_branch1"]
+
+    assert list(encoder.package_rows(packages, 2)) == [encoder.flat(row, 2) for row in packages]
+
+
+def test_orjson_and_stdlib_encoders_agree() -> None:
+    row = {"name": "pkg-ü", "epoch": 0, "disttag": 'q"\x01', "big": 2**70, "flag": True, "none": None}
+    for style in ("pretty", "compact"):
+        fast = JsonEncoder.for_style(style)  # type: ignore[arg-type]
+        plain = JsonEncoder(indent=fast.indent, sort_keys=True, separators=(",", fast.key_separator), use_orjson=False)
+        assert plain.backend == "json"
+        for level in (0, 3):
+            assert fast.flat(row, level) == plain.flat(row, level)
+            assert fast.flat({"ratio": 0.1, **row}, level) == plain.flat({"ratio": 0.1, **row}, level)
+
+
+def test_unknown_json_style() -> None:
+    with pytest.raises(ValueError, match="unknown JSON style"):
+        JsonEncoder.for_style("tiny")  # type: ignore[arg-type]
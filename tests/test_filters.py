@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import random
+import re
+
+import pytest
+
+from package_comparison_tool.filters import NameFilter, _literal
+
+PATTERNS = [
+    "nginx",
+    "^python3-",
+    "^LIB",
+    r"gcc-c\+\+",
+    "perl-.*-devel$",
+    r"^kernel-(image|modules)-",
+    r"^(\w)\1",
+    "qt[56]",
+    "(?i)mixed",
+    "",
+]
+
+NAMES = [
+    "nginx",
+    "NGINX-extra",
+    "python3-module-foo",
+    "python-module-foo",
+    "libfoo",
+    "Libbar",
+    "gcc-c++",
+    "perl-Foo-devel",
+    "kernel-image-std-def",
+    "aardvark",
+    "qt5-base",
+    "MIXED-case",
+    "ſtrange",
+    "bash",
+]
+
+
+@pytest.mark.parametrize("flags", [0, re.IGNORECASE])
+def test_name_filter_matches_like_individual_searches(flags: int) -> None:
+    rng = random.Random(3)
+    for _ in range(200):
+        patterns = [re.compile(p, flags) for p in rng.sample(PATTERNS[:-1], rng.randint(1, 5))]
+        name_filter = NameFilter(patterns)
+        for name in NAMES:
+            expected = any(p.search(name) for p in patterns)
+            assert name_filter(name) is expected, (name, [p.pattern for p in patterns])
+            assert name_filter(name) is expected  # memoized answer
+
+
+def test_literals_use_fast_paths() -> None:
+    assert _literal(r"gcc-c\+\+") == "gcc-c++"
+    assert _literal("perl-.*") is None
+    assert _literal(r"foo\d") is None
+
+    name_filter = NameFilter([re.compile(p, re.IGNORECASE) for p in ["^python3-", "nginx", "qt[56]", "ssh$"]])
+    assert name_filter._prefixes_ci == ("python3-",)
+    assert name_filter._substrings is None
+    assert name_filter._substrings_ci.__self__.pattern == "nginx"  # type: ignore[union-attr]
+    assert [r.pattern for r in name_filter._regexes] == ["(?:qt[56])|(?:ssh$)"]
+
+
+def test_empty_pattern_matches_everything_and_no_patterns_is_an_error() -> None:
+    assert NameFilter([""])("anything")
+    with pytest.raises(ValueError):
+        NameFilter([])
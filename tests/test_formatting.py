@@ -1,8 +1,19 @@
 from __future__ import annotations
 
+import io
+import json
+
 import pytest
 
-from package_comparison_tool.formatting import format_markdown, format_summary, render_result
+from package_comparison_tool.formatting import (
+    format_markdown,
+    format_summary,
+    render_result,
+    write_json,
+    write_ndjson,
+    write_result,
+    write_summary,
+)
 
 
 def _pkg(name: str, branch: str) -> dict[str, object]:
@@ -59,3 +70,95 @@ def test_format_markdown_contains_links() -> None:
 def test_render_result_unknown_format() -> None:
     with pytest.raises(ValueError):
         render_result(_sample_result(), fmt="xml")
+
+
+def test_formatters_accept_package_rows() -> None:
+    from package_comparison_tool.models import PackageInfo
+    from package_comparison_tool.snapshot import BranchSnapshot
+
+    result = _sample_result()
+    snapshot = BranchSnapshot.from_packages([PackageInfo("pkg-row", 1, "2.0", "alt1", "noarch", 0, "")])
+    result["packages_only_in_branch1"] = list(snapshot)
+
+    assert "- pkg-row 1:2.0-alt1 [noarch]" in format_summary(result)
+    assert "[pkg-row](https://packages.altlinux.org/ru/a/binary/pkg-row/noarch/)" in format_markdown(result)
+
+
+def test_markdown_rows_keep_their_own_branch() -> None:
+    from package_comparison_tool.models import PackageInfo
+
+    result = _sample_result()
+    result["packages_only_in_branch1"] = [_pkg("pkg-x", "other"), PackageInfo("pkg-row", 0, "1", "alt1", "noarch", 0, "")]
+
+    output = format_markdown(result)
+    assert "| other |" in output
+    assert "| [pkg-row](https://packages.altlinux.org/ru/a/binary/pkg-row/noarch/) | 1-alt1 | noarch | a |" in output
+
+
+@pytest.mark.parametrize("pretty", [True, False])
+def test_write_json_matches_json_dumps(pretty: bool) -> None:
+    result = _sample_result()
+    result["packages_only_in_branch1"].append({**_pkg("pkg-ü", "a"), "disttag": 'q"\x01,\n'})
+    result["meta"] = {"retry": {"attempts": 2}, "empty": {}, "pairs": [[1, 2], []]}
+
+    buffer = io.StringIO()
+    write_json(result, buffer, pretty=pretty)
+
+    options = {"indent": 2, "sort_keys": True} if pretty else {}
+    assert buffer.getvalue() == json.dumps(result, ensure_ascii=False, **options) + "\n"
+
+
+@pytest.mark.parametrize("fmt", ["json", "markdown", "summary"])
+def test_write_result_matches_render_result(fmt: str) -> None:
+    matrix = {
+        "branches": ["a", "b"],
+        "generated_at": "2024-01-01T00:00:00Z",
+        "comparisons": [_sample_result()],
+        "stats": {"pairs": 1, "differences": 2},
+    }
+    for result in (_sample_result(), matrix):
+        buffer = io.StringIO()
+        write_result(result, buffer, fmt=fmt, limit=1)
+        assert buffer.getvalue() == render_result(result, fmt=fmt, limit=1)
+
+
+def test_write_summary_consumes_iterators_lazily() -> None:
+    result = _sample_result()
+    consumed = []
+
+    def _rows():
+        for index in range(1000):
+            consumed.append(index)
+            yield _pkg(f"pkg-{index}", "a")
+
+    result["packages_only_in_branch1"] = _rows()
+    buffer = io.StringIO()
+    write_summary(result, buffer, limit=3)
+
+    assert "- pkg-2 " in buffer.getvalue() and "- pkg-3 " not in buffer.getvalue()
+    assert "... and more (limited to first 3)" in buffer.getvalue()
+    assert len(consumed) == 4
+
+
+def test_write_ndjson_emits_header_packages_and_stats() -> None:
+    buffer = io.StringIO()
+    write_ndjson(_sample_result(), buffer)
+    records = [json.loads(line) for line in buffer.getvalue().splitlines()]
+
+    assert records[0] == {"record": "header", "branch1": "a", "branch2": "b", "generated_at": "2024-01-01T00:00:00Z"}
+    assert [(r["category"], r["name"], r["branch"]) for r in records[1:-1]] == [
+        ("only_in_branch1", "pkg-a", "a"),
+        ("only_in_branch2", "pkg-b", "b"),
+    ]
+    assert records[-1] == {"record": "stats", "stats": _sample_result()["stats"]}
+
+    matrix = {"branches": ["a", "b"], "generated_at": "t", "comparisons": [_sample_result()], "stats": {"pairs": 1}}
+    lines = render_result(matrix, fmt="ndjson").splitlines()
+    assert [json.loads(line)["record"] for line in lines] == [
+        "matrix",
+        "header",
+        "package",
+        "package",
+        "stats",
+        "matrix_stats",
+    ]
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from package_comparison_tool.api import fetch_branch_binary_packages
+from package_comparison_tool.compare import compare_packages
+from package_comparison_tool.hedging import (
+    DEFAULT_HEDGE_AFTER_S,
+    HedgeStats,
+    LatencyTracker,
+    parse_hedge_after,
+)
+
+from .conftest import make_package
+
+
+def test_parse_hedge_after() -> None:
+    assert parse_hedge_after("auto") == "auto"
+    assert parse_hedge_after("0.5") == 0.5
+    assert parse_hedge_after(None) is None
+    with pytest.raises(ValueError):
+        parse_hedge_after("soon")
+    with pytest.raises(ValueError):
+        parse_hedge_after(0)
+
+
+def test_auto_delay_uses_p95_of_recent_fetches() -> None:
+    tracker = LatencyTracker()
+    stats = HedgeStats("auto", tracker=tracker)
+    assert stats.delay() == DEFAULT_HEDGE_AFTER_S  # not enough samples yet
+
+    for i in range(1, 21):
+        tracker.record(i / 10)
+    assert stats.delay() == 1.9
+
+
+def test_stalled_request_is_hedged(fake_rdb) -> None:
+    fake_rdb.set_branch("p10", [make_package("pkg")])
+    fake_rdb.delays = [1.5]  # only the first request stalls
+    stats = HedgeStats(0.05, tracker=LatencyTracker())
+
+    started = time.monotonic()
+    packages = fetch_branch_binary_packages("p10", retries=1, hedge_stats=stats)
+
+    assert [p.name for p in packages] == ["pkg"]
+    assert time.monotonic() - started < 1.0
+    assert fake_rdb.count("p10") == 2
+    assert stats.as_dict() == {"after_s": 0.05, "requests": 1, "hedged": 1, "hedge_wins": 1}
+
+
+def test_compare_reports_hedge_counts(fake_rdb) -> None:
+    fake_rdb.set_branch("a", [make_package("pkg")])
+    fake_rdb.set_branch("b", [make_package("pkg")])
+
+    result = compare_packages("a", "b", hedge_after_s=5.0)
+
+    assert result["meta"]["hedge"] == {"after_s": 5.0, "requests": 2, "hedged": 0, "hedge_wins": 0}
+    assert fake_rdb.count("a") == fake_rdb.count("b") == 1
+    assert "hedge" not in compare_packages("a", "b")["meta"]
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import json
+import pstats
+
+from click.testing import CliRunner
+
+import package_comparison_tool.cli as cli
+from package_comparison_tool.compare import compare_matrix, compare_packages
+from package_comparison_tool.profiling import StageProfiler, stage, use_profiler
+
+from .conftest import make_package
+
+
+def test_nested_stages_are_timed_exclusively() -> None:
+    now = [0.0]
+    profiler = StageProfiler(clock=lambda: now[0], cpu_clock=lambda: now[0] / 2)
+
+    with use_profiler(profiler):
+        with stage("parse", branch="p10"):
+            now[0] += 1.0
+            with stage("download", branch="p10"):
+                now[0] += 3.0
+            now[0] += 1.0
+        profiler.count("p10", "bytes_downloaded", 2_000_000)
+    with stage("render"):  # no profiler active: not recorded
+        now[0] += 5.0
+
+    timings = profiler.as_dict()
+    assert timings["stages"] == {
+        "download": {"wall_s": 3.0, "cpu_s": 1.5, "calls": 1},
+        "parse": {"wall_s": 2.0, "cpu_s": 1.0, "calls": 1},
+    }
+    assert timings["branches"] == {"p10": {"download_s": 3.0, "parse_s": 2.0, "bytes_downloaded": 2_000_000}}
+    assert timings["elapsed_s"] == 10.0
+    report = profiler.report()
+    assert "download" in report and "2.0 MB" in report
+
+
+def test_compare_reports_timings_per_stage_and_branch(fake_rdb) -> None:
+    fake_rdb.set_branch("sisyphus", [make_package("a", version="2.0"), make_package("b")])
+    fake_rdb.set_branch("p10", [make_package("a"), make_package("c", arch="noarch")])
+
+    assert "timings" not in compare_packages("sisyphus", "p10", retries=1)
+
+    result = compare_packages("sisyphus", "p10", retries=1, profiler=StageProfiler())
+    timings = result["timings"]
+    assert {"request", "download", "parse", "prepare", "index", "diff", "evr_compare"} <= set(timings["stages"])
+    for branch in ("sisyphus", "p10"):
+        assert timings["branches"][branch]["packages_parsed"] == 2
+        assert timings["branches"][branch]["bytes_downloaded"] > 0
+
+
+def test_profiler_follows_per_arch_fetch_threads(fake_rdb) -> None:
+    packages = [make_package("a"), make_package("b", arch="noarch"), make_package("c", arch="i586")]
+    fake_rdb.set_branch("sisyphus", packages)
+    fake_rdb.set_branch("p10", packages[:2])
+    profiler = StageProfiler()
+
+    result = compare_matrix(["sisyphus", "p10"], arches={"x86_64", "noarch"}, retries=1, profiler=profiler)
+
+    assert result["timings"]["stages"]["request"]["calls"] == 4
+    assert result["timings"]["branches"]["sisyphus"]["packages_parsed"] == 2
+    assert "fetch_wait" in result["timings"]["stages"]
+
+
+def test_cli_profile_prints_breakdown_and_writes_cprofile_dump(fake_rdb, tmp_path) -> None:
+    fake_rdb.set_branch("sisyphus", [make_package("a")])
+    fake_rdb.set_branch("p10", [make_package("b")])
+    report, prof = tmp_path / "report.json", tmp_path / "run.prof"
+
+    result = CliRunner().invoke(
+        cli.main, ["sisyphus", "p10", "--no-cache", "-o", str(report), "--profile-output", str(prof)]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "Stage" in result.output and "render" in result.output
+    assert "sisyphus" in json.loads(report.read_text(encoding="utf8"))["timings"]["branches"]
+    assert pstats.Stats(str(prof)).total_calls > 0
+
+
+def test_cli_profile_prints_breakdown_when_the_run_fails(fake_rdb) -> None:
+    fake_rdb.set_branch("p10", [make_package("b")])
+    fake_rdb.fail_next("sisyphus", 503)
+
+    result = CliRunner().invoke(cli.main, ["sisyphus", "p10", "--no-cache", "--max-total-retries", "0", "--profile"])
+
+    assert result.exit_code == 1
+    assert "Stage" in result.output and "request" in result.output
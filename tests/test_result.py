@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import json
+
+import package_comparison_tool.compare as compare_mod
+import package_comparison_tool.snapshot as snapshot_mod
+from package_comparison_tool.formatting import render_result
+from package_comparison_tool.models import PackageInfo
+from package_comparison_tool.result import CompareResult, PackageList
+
+
+def _compare(monkeypatch, *, count: int = 40) -> CompareResult:
+    branches = {
+        "a": [PackageInfo(f"pkg{i:02}", 0, "2.0", "alt1", "noarch", 0, "") for i in range(count)],
+        "b": [PackageInfo(f"pkg{i:02}", 0, "1.0", "alt1", "noarch", 0, "") for i in range(count)],
+    }
+    monkeypatch.setattr(compare_mod, "fetch_branch_snapshot", lambda branch, **_kwargs: branches[branch])
+    return compare_mod.compare_packages("a", "b")
+
+
+def _count_dicts(monkeypatch) -> list[str]:
+    built: list[str] = []
+    original = snapshot_mod.package_to_dict
+
+    def _counting(pkg, *, branch):
+        built.append(pkg.name)
+        return original(pkg, branch=branch)
+
+    monkeypatch.setattr(snapshot_mod, "package_to_dict", _counting)
+    return built
+
+
+def test_result_materializes_packages_on_access(monkeypatch) -> None:
+    result = _compare(monkeypatch)
+    built = _count_dicts(monkeypatch)
+
+    assert result["stats"]["higher_in_branch1"] == 40
+    higher = result["packages_with_higher_version_in_branch1"]
+    assert isinstance(higher, PackageList) and len(higher) == 40
+    assert built == []
+
+    assert higher[3]["name"] == "pkg03"
+    assert [p["name"] for p in higher[-2:]] == ["pkg38", "pkg39"]
+    assert built == ["pkg03", "pkg38", "pkg39"]
+
+
+def test_summary_with_limit_builds_only_shown_rows(monkeypatch) -> None:
+    result = _compare(monkeypatch)
+    built = _count_dicts(monkeypatch)
+
+    output = render_result(result, fmt="summary", limit=5)
+
+    assert "Higher versions in a: 40" in output
+    assert "... and more (limited to first 5)" in output
+    assert len(built) == 5
+
+
+def test_to_dict_and_json_match(monkeypatch) -> None:
+    result = _compare(monkeypatch, count=3)
+
+    plain = result.to_dict()
+    assert type(plain["packages_with_higher_version_in_branch1"]) is list
+    assert plain == result
+    assert json.loads(render_result(result, fmt="json")) == json.loads(json.dumps(plain))
+
+    del result["generated_at"]
+    result["meta"] = {}
+    assert "generated_at" not in result and result["meta"] == {}
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import time
+from email.utils import formatdate
+
+import pytest
+
+from package_comparison_tool.api import fetch_branch_binary_packages
+from package_comparison_tool.compare import compare_packages
+from package_comparison_tool.exceptions import AltApiError, DeadlineExceededError
+from package_comparison_tool.retry import Deadline, RetryBudget, RetryPolicy, parse_retry_after
+
+from .conftest import make_package
+
+
+def test_parse_retry_after_seconds_and_http_date() -> None:
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after(formatdate(1_000_030.0, usegmt=True), now=1_000_000.0) == 30.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_policy_full_jitter_and_retry_after() -> None:
+    policy = RetryPolicy(backoff_factor=1.0, max_backoff_s=3.0)
+
+    assert all(0.0 <= policy.delay(attempt) <= min(3.0, 2 ** (attempt - 1)) for attempt in range(1, 6) for _ in range(50))
+    assert policy.delay(1, status=503, retry_after="12") == 12.0
+    assert policy.delay(1, status=500, retry_after="12") <= 1.0  # only honored on 429/503
+    assert RetryPolicy(max_retry_after_s=5).delay(1, status=429, retry_after="600") == 5.0
+
+
+def test_budget_caps_retries_across_requests() -> None:
+    policy = RetryPolicy(attempts=5, backoff_factor=0)
+    budget = RetryBudget(max_retries=2)
+
+    assert policy.next_delay(1, budget) == 0.0
+    assert policy.next_delay(1, budget) == 0.0
+    assert policy.next_delay(1, budget) is None
+    assert budget.as_dict()["budget_exhausted"] == 1
+
+
+def test_delay_beyond_deadline_is_not_charged_to_budget() -> None:
+    policy = RetryPolicy(attempts=5, jitter=False, backoff_factor=2.0)
+    budget = RetryBudget(max_retries=1)
+    now = [0.0]
+    deadline = Deadline(3.0, clock=lambda: now[0])
+
+    assert policy.next_delay(1, budget, deadline=deadline) == 2.0
+    with pytest.raises(DeadlineExceededError):
+        policy.next_delay(2, budget, deadline=deadline)
+    assert budget.as_dict() == {"attempts": 0, "retries": 1, "budget": 1, "budget_exhausted": 0, "sleep_s": 2.0}
+
+
+def test_sessions_do_not_stack_retries_and_retry_after_is_honored(fake_rdb, monkeypatch) -> None:
+    sleeps: list[float] = []
+    monkeypatch.setattr("package_comparison_tool.api.time.sleep", sleeps.append)
+    fake_rdb.set_branch("p10", [make_package("pkg")])
+    fake_rdb.retry_after = "4"
+    fake_rdb.fail_next("p10", 503, 503, 503, 503)
+
+    with pytest.raises(AltApiError, match="503"):
+        fetch_branch_binary_packages("p10", retries=2)
+
+    assert fake_rdb.count("p10") == 2
+    assert sleeps == [4.0]
+
+
+def test_compare_shares_retry_budget_and_reports_it(fake_rdb, monkeypatch) -> None:
+    monkeypatch.setattr("package_comparison_tool.api.time.sleep", lambda _delay: None)
+    fake_rdb.set_branch("a", [make_package("pkg")])
+    fake_rdb.set_branch("b", [make_package("pkg")])
+    fake_rdb.fail_next("a", 502)
+    fake_rdb.fail_next("b", 502, 502)
+
+    result = compare_packages("a", "b", retries=5, retry_backoff=0, max_total_retries=3)
+    assert result["meta"]["retry"] == {
+        "attempts": 5,
+        "retries": 3,
+        "budget": 3,
+        "budget_exhausted": 0,
+        "sleep_s": 0.0,
+    }
+
+    fake_rdb.fail_next("a", 502, 502)
+    fake_rdb.fail_next("b", 502, 502)
+    with pytest.raises(AltApiError, match="502"):
+        compare_packages("a", "b", retries=5, retry_backoff=0, max_total_retries=3)
+
+
+def test_deadline_clamps_timeouts_and_sleeps() -> None:
+    now = [100.0]
+    deadline = Deadline(10.0, clock=lambda: now[0])
+
+    assert deadline.timeout(30.0, "fetching") == 10.0
+    now[0] += 8.0
+    assert deadline.timeout(30.0, "fetching") == 2.0
+    assert deadline.allows(1.5) and not deadline.allows(2.5)
+    now[0] += 2.0
+    with pytest.raises(DeadlineExceededError, match="Deadline of 10s exceeded while fetching"):
+        deadline.check("fetching")
+
+
+def test_compare_fails_fast_once_deadline_is_spent(fake_rdb, monkeypatch) -> None:
+    sleeps: list[float] = []
+    monkeypatch.setattr("package_comparison_tool.api.time.sleep", sleeps.append)
+    fake_rdb.set_branch("a", [make_package("pkg")])
+    fake_rdb.set_branch("b", [make_package("pkg")])
+    fake_rdb.retry_after = "120"
+    fake_rdb.fail_next("b", 503)
+
+    with pytest.raises(DeadlineExceededError):
+        compare_packages("a", "b", timeout_s=30, deadline_s=5)
+    assert sleeps == []  # a backoff sleep that would outlast the deadline is never started
+
+
+def test_stalled_server_is_bounded_by_deadline(fake_rdb) -> None:
+    fake_rdb.set_branch("a", [make_package("pkg")])
+    fake_rdb.delay_s = 1.0
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceededError):
+        fetch_branch_binary_packages("a", timeout_s=30, deadline=Deadline(0.2))
+    assert time.monotonic() - started < 0.9
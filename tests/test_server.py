@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlencode
+
+import pytest
+
+from package_comparison_tool.server import BranchStore, ComparisonService, _Query, make_server
+
+from .conftest import make_package
+
+
+@pytest.fixture
+def serve(fake_rdb):
+    servers = []
+
+    def _start(**service_kwargs: object) -> str:
+        store = BranchStore(refresh_s=service_kwargs.pop("refresh_s", 300.0), retries=1)  # type: ignore[arg-type]
+        server = make_server("127.0.0.1", 0, service=ComparisonService(store, **service_kwargs))  # type: ignore[arg-type]
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield _start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _get(url: str) -> tuple[int, str, bytes]:
+    try:
+        with urllib.request.urlopen(url, timeout=10) as response:
+            return response.status, response.headers["Content-Type"], response.read()
+    except urllib.error.HTTPError as exc:
+        return exc.code, exc.headers["Content-Type"], exc.read()
+
+
+def test_compare_is_served_from_warm_snapshots(fake_rdb, serve) -> None:
+    fake_rdb.set_branch("sisyphus", [make_package("a", version="2.0"), make_package("b")])
+    fake_rdb.set_branch("p10", [make_package("a"), make_package("c", arch="noarch")])
+    base = serve()
+    url = f"{base}/compare?{urlencode({'branch1': 'sisyphus', 'branch2': 'p10'})}"
+
+    status, content_type, body = _get(url)
+    assert (status, content_type) == (200, "application/json")
+    result = json.loads(body)
+    assert result["stats"]["higher_in_branch1"] == 1
+    assert [p["name"] for p in result["packages_only_in_branch2"]] == ["c"]
+
+    assert _get(url)[2] == body
+    assert fake_rdb.count("sisyphus") == fake_rdb.count("p10") == 1
+
+    status, content_type, body = _get(f"{base}/compare?branch1=sisyphus&branch2=p10&format=markdown&arch=noarch")
+    assert status == 200 and content_type.startswith("text/markdown")
+    assert fake_rdb.requests[-1][0].endswith("?arch=noarch")
+
+    metrics = _get(f"{base}/metrics")[2].decode()
+    assert "package_comparison_result_cache_hits_total 1" in metrics
+    assert "package_comparison_snapshot_fetches_total 4" in metrics
+    assert 'package_comparison_requests_total{path="/compare",status="200"} 3' in metrics
+
+
+def test_stale_snapshots_are_revalidated_conditionally(fake_rdb, serve) -> None:
+    fake_rdb.set_branch("sisyphus", [make_package("a")], etag='"s1"')
+    fake_rdb.set_branch("p10", [make_package("a")], etag='"p1"')
+    base = serve(refresh_s=0.0)
+    url = f"{base}/compare?branch1=sisyphus&branch2=p10&format=summary"
+
+    first = _get(url)[2]
+    assert _get(url)[2] == first
+    assert fake_rdb.requests[-1][1]["If-None-Match"] == '"p1"'
+    assert "package_comparison_snapshot_not_modified_total 2" in _get(f"{base}/metrics")[2].decode()
+
+    fake_rdb.set_branch("p10", [make_package("a"), make_package("b")], etag='"p2"')
+    result = _get(url.replace("summary", "json"))[2]
+    assert json.loads(result)["stats"]["only_in_branch2"] == 1
+
+
+def test_compare_errors(fake_rdb, serve) -> None:
+    fake_rdb.set_branch("p10", [make_package("a")])
+    base = serve()
+
+    assert _get(f"{base}/compare?branch1=p10")[0] == 400
+    assert _get(f"{base}/compare?branch1=p10&branch2=p10&format=xml")[0] == 400
+    assert _get(f"{base}/compare?branch1=p10&branch2=p10&filter=(")[0] == 400
+    assert _get(f"{base}/compare?branch1=p10&branch2=p10&filter=[")[0] == 400
+    status, _, body = _get(f"{base}/compare?branch1=p10&branch2=missing")
+    assert status == 404 and "missing" in json.loads(body)["error"]
+    assert _get(f"{base}/nope")[0] == 404
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [["(a%2B)%2B$"], ["a{1,50}b"], ["x" * 101], [f"pkg{i}" for i in range(17)]],
+    ids=["nested-quantifier", "repetition", "too-long", "too-many"],
+)
+def test_risky_filters_are_rejected(fake_rdb, serve, filters: list[str]) -> None:
+    fake_rdb.set_branch("p10", [make_package("a")])
+    base = serve()
+    query = "".join(f"&filter={pattern}" for pattern in filters)
+
+    status, _, body = _get(f"{base}/compare?branch1=p10&branch2=p10{query}")
+    assert status == 400, body
+    assert fake_rdb.requests == []
+
+    assert _get(f"{base}/compare?branch1=p10&branch2=p10&filter=^a$&filter=[ab]%2B&filter=a\\(")[0] == 200
+
+
+def test_concurrency_limit_rejects_when_saturated(fake_rdb, serve) -> None:
+    fake_rdb.set_branch("p10", [make_package("a")])
+    fake_rdb.set_branch("p11", [make_package("a")])
+    fake_rdb.delays = [0.5]
+    base = serve(max_concurrent=1, queue_timeout_s=0.05)
+
+    slow = threading.Thread(target=_get, args=(f"{base}/compare?branch1=p10&branch2=p11",))
+    slow.start()
+    while not fake_rdb.requests:
+        time.sleep(0.01)
+    status, _, _ = _get(f"{base}/compare?branch1=p11&branch2=p10")
+    slow.join()
+    assert status == 503
+    assert "package_comparison_rejected_total 1" in _get(f"{base}/metrics")[2].decode()
+
+
+def test_crafted_branch_names_are_rejected(fake_rdb, serve) -> None:
+    fake_rdb.set_branch("p10", [make_package("a")])
+    base = serve()
+
+    for branch in ("../../secret", "p10?arch=x", "p10#frag", "..", "p10/x"):
+        query = urlencode({"branch1": branch, "branch2": "p10"})
+        assert _get(f"{base}/compare?{query}")[0] == 400
+    assert fake_rdb.requests == []
+    with pytest.raises(ValueError, match="invalid branch name"):
+        BranchStore().get("../p10")
+
+
+def test_store_evicts_least_recently_used_snapshots(fake_rdb) -> None:
+    for branch in ("p9", "p10", "p11"):
+        fake_rdb.set_branch(branch, [make_package("a")])
+    store = BranchStore(retries=1, max_snapshots=2)
+
+    store.get("p9")
+    store.get("p10")
+    store.get("p9")
+    store.get("p11")
+
+    assert len(store) == 2
+    store.get("p9")
+    assert fake_rdb.count("p9") == 1  # still warm
+    store.get("p10")
+    assert fake_rdb.count("p10") == 2  # evicted, fetched again
+
+
+def test_multi_arch_result_cache_hit_skips_merging(fake_rdb) -> None:
+    packages = [make_package("a"), make_package("b", arch="noarch")]
+    fake_rdb.set_branch("p10", packages)
+    fake_rdb.set_branch("p11", packages[:1])
+    service = ComparisonService(BranchStore(retries=1))
+    merges = []
+    merge = service._merge
+    service._merge = lambda branch, loaded: merges.append(branch) or merge(branch, loaded)  # type: ignore[method-assign]
+    query = _Query.parse("branch1=p10&branch2=p11&arch=x86_64,noarch")
+
+    first = service.compare(query)
+    assert service.compare(query) == first
+    assert merges == ["p10", "p11"]
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from array import array
+
+import pytest
+
+from package_comparison_tool.models import PackageInfo
+from package_comparison_tool.snapshot import BranchSnapshot, load_snapshot, save_snapshot
+
+
+def _packages() -> list[PackageInfo]:
+    return [
+        PackageInfo("pkg1", 0, "1.0", "alt1", "x86_64", 100, "sisyphus+1"),
+        PackageInfo("pkg2", 1, "1.0", "alt1", "noarch", 200, "sisyphus+1"),
+        PackageInfo("pkg1", 0, "1.0", "alt2", "aarch64", 300, "sisyphus+2"),
+    ]
+
+
+def test_snapshot_rows_are_compatible_with_package_info() -> None:
+    packages = _packages()
+    snapshot = BranchSnapshot.from_packages(packages, branch="sisyphus")
+
+    assert len(snapshot) == 3
+    assert list(snapshot) == packages
+    assert snapshot[1].epoch == 1
+    assert snapshot[-1].arch == "aarch64"
+    assert hash(snapshot[0]) == hash(packages[0])
+    assert snapshot[2].to_dict(branch="sisyphus") == packages[2].to_dict(branch="sisyphus")
+    assert snapshot.to_packages() == packages
+    with pytest.raises(IndexError):
+        snapshot[3]
+
+
+def test_snapshot_stores_interned_columns() -> None:
+    snapshot = BranchSnapshot.from_packages(_packages())
+
+    assert isinstance(snapshot.epoch, array) and snapshot.epoch.typecode == "q"
+    assert isinstance(snapshot.buildtime, array) and snapshot.buildtime.typecode == "q"
+    assert len(snapshot.tables["name"]) == 2
+    assert len(snapshot.tables["version"]) == 1
+    assert list(snapshot.codes["name"]) == [0, 1, 0]
+    assert snapshot.column("release") == ["alt1", "alt1", "alt2"]
+
+
+def test_save_and_load_snapshot_round_trip(tmp_path) -> None:
+    snapshot = BranchSnapshot.from_packages(_packages() + [PackageInfo("пакет", 0, "1", "", "", 0, "")], branch="p10")
+    path = tmp_path / "p10.snap"
+
+    save_snapshot(snapshot, path)
+    loaded = load_snapshot(path)
+
+    assert loaded.branch == "p10"
+    assert list(loaded) == list(snapshot)
+    assert loaded.column("name") == snapshot.column("name")
+    with pytest.raises(TypeError):
+        loaded.append("x", 0, "1", "1", "noarch", 0, "")
+
+
+def test_load_snapshot_rejects_other_files(tmp_path) -> None:
+    path = tmp_path / "not.snap"
+    path.write_bytes(b"{}")
+
+    with pytest.raises(ValueError):
+        load_snapshot(path)
+
+
+def test_load_snapshot_rejects_truncated_files(tmp_path) -> None:
+    path = tmp_path / "p10.snap"
+    save_snapshot(BranchSnapshot.from_packages(_packages(), branch="p10"), path)
+    data = path.read_bytes()
+
+    for size in (len(data) - 1, len(data) // 2, 40, 30):
+        path.write_bytes(data[:size])
+        with pytest.raises(ValueError, match="truncated snapshot file"):
+            load_snapshot(path)
+
+
+def test_loaded_snapshot_can_be_closed(tmp_path) -> None:
+    path = tmp_path / "p10.snap"
+    save_snapshot(BranchSnapshot.from_packages(_packages(), branch="p10"), path)
+
+    with load_snapshot(path) as snapshot:
+        assert snapshot.column("name")[0] == _packages()[0].name
+    assert snapshot._buffer is None
+    snapshot.close()  # idempotent
+    BranchSnapshot.from_packages(_packages()).close()  # in-memory: no-op
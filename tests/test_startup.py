@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import subprocess
+import sys
+
+import pytest
+
+# Modules the CLI must not load before it actually compares something.
+_HEAVY_MODULES = (
+    "requests",
+    "urllib3",
+    "concurrent.futures",
+    "package_comparison_tool.api",
+    "package_comparison_tool.compare",
+    "package_comparison_tool.formatting",
+    "package_comparison_tool.server",
+)
+# ``import package_comparison_tool.cli`` takes ~50 ms here (mostly click), against ~250 ms when it
+# imported the whole package eagerly; only checked with ``--startup-timing``.
+_STARTUP_BUDGET_US = 150_000
+
+
+def _loaded_modules(code: str) -> set[str]:
+    """Names in ``sys.modules`` after running ``code`` in a fresh interpreter."""
+
+    probe = f"{code}\nimport sys\nprint('\\n'.join(sys.modules))"
+    proc = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True)
+    return set(proc.stdout.splitlines())
+
+
+def _import_times(code: str) -> dict[str, int]:
+    """Cumulative import time (µs) of every module loaded by ``code``, from ``-X importtime``."""
+
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_cli_import_does_not_load_heavy_modules() -> None:
+    loaded = _loaded_modules("import package_comparison_tool.cli")
+
+    assert "package_comparison_tool.cli" in loaded
+    assert not set(_HEAVY_MODULES) & loaded
+
+
+@pytest.mark.parametrize("args", [["--version"], ["--help"], ["serve", "--help"], ["--jobs", "0"]])
+def test_fast_paths_do_not_load_heavy_modules(args: list[str]) -> None:
+    code = f"from package_comparison_tool.cli import main\ntry:\n    main({args!r})\nexcept SystemExit:\n    pass"
+
+    assert not set(_HEAVY_MODULES) & _loaded_modules(code)
+
+
+@pytest.mark.startup_timing
+def test_cli_import_stays_within_startup_budget() -> None:
+    best = min(_import_times("import package_comparison_tool.cli")["package_comparison_tool.cli"] for _ in range(3))
+
+    assert best < _STARTUP_BUDGET_US, f"CLI import took {best / 1000:.1f} ms"
+
+
+def test_version_option() -> None:
+    proc = subprocess.run(
+        [sys.executable, "-c", "from package_comparison_tool.cli import main; main(['--version'])"],
+        capture_output=True,
+        text=True,
+    )
+
+    assert proc.returncode == 0
+    assert proc.stdout.strip() == "package-comparison, version 1.0.0"
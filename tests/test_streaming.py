@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from package_comparison_tool.exceptions import AltApiError
+from package_comparison_tool.streaming import PayloadParser, iter_payload_packages
+
+
+def _chunks(data: bytes, size: int) -> list[bytes]:
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+def _payload() -> dict[str, object]:
+    return {
+        "request_args": {"arch": None},
+        "length": 12345,
+        "packages": [
+            {"name": "pkg-ü", "epoch": 0, "version": "1.0", "release": "alt1", "arch": "x86_64"},
+            {"name": "pkg2", "epoch": 1, "version": "2", "release": "alt2", "arch": "noarch"},
+        ],
+        "trailer": [1, 2, {"x": "]}"}],
+    }
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 100_000])
+def test_iter_payload_packages_matches_json_loads_for_any_chunking(size: int) -> None:
+    data = json.dumps(_payload(), ensure_ascii=False, indent=1).encode("utf8")
+
+    packages = list(iter_payload_packages(_chunks(data, size)))
+
+    assert packages == _payload()["packages"]
+
+
+def test_iter_payload_packages_yields_before_stream_ends() -> None:
+    def gen():
+        yield b'{"packages": [{"name": "first"}, '
+        raise AssertionError("second chunk must not be read before the first package is yielded")
+
+    stream = iter_payload_packages(gen())
+    assert next(stream) == {"name": "first"}
+
+
+@pytest.mark.parametrize(
+    "body",
+    [b"", b"not-json", b'{"packages": [{"name": "a"}', b'{"packages": []} trailing', b'{"packages": {}}'],
+)
+def test_iter_payload_packages_rejects_invalid_payloads(body: bytes) -> None:
+    with pytest.raises(AltApiError):
+        list(iter_payload_packages(_chunks(body, 4)))
+
+
+def test_iter_payload_packages_non_object_payload_yields_nothing() -> None:
+    assert list(iter_payload_packages([b"[1, 2, 3]"])) == []
+
+
+def test_payload_parser_push_api_matches_pull_api() -> None:
+    data = json.dumps(_payload(), ensure_ascii=False).encode("utf8")
+    parser = PayloadParser()
+
+    packages: list[object] = []
+    for chunk in _chunks(data, 5):
+        packages += parser.feed(chunk)
+    packages += parser.close()
+
+    assert packages == _payload()["packages"]
+    with pytest.raises(AltApiError):
+        PayloadParser().close()
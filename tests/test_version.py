@@ -1,4 +1,19 @@
-from package_comparison_tool.version import EVR, compare_evr, compare_version_release, rpmvercmp
+import itertools
+import random
+
+import pytest
+
+from package_comparison_tool.version import (
+    EVR,
+    VersionCache,
+    compare_evr,
+    compare_evr_many,
+    compare_version_release,
+    evr_key,
+    rpmvercmp,
+    use_version_cache,
+    version_key,
+)
 
 
 def test_rpmvercmp_trailing_zeros_are_equal() -> None:
@@ -26,3 +41,79 @@ def test_compare_version_release_examples() -> None:
 def test_compare_evr_respects_epoch() -> None:
     assert compare_evr(EVR(epoch=1, version="1.0", release="1"), EVR(epoch=0, version="9.0", release="1")) == 1
 
+
+def _sign(value: int) -> int:
+    return (value > 0) - (value < 0)
+
+
+def _trailing_zero_ambiguous(a: str, b: str) -> bool:
+    # rpmvercmp is not transitive here: "1" == "1.0" but "1" < "1.0~rc" < "1.0".
+    rc = rpmvercmp(a, b)
+    return any(rpmvercmp(a + ".0" * k, b) != rc or rpmvercmp(a, b + ".0" * k) != rc for k in range(1, 4))
+
+
+def test_version_key_agrees_with_rpmvercmp() -> None:
+    alphabet = "01a.~^"
+    values = ["".join(p) for n in range(4) for p in itertools.product(alphabet, repeat=n)]
+    rng = random.Random(0)
+    values += ["".join(rng.choice("0129ab_.-~^") for _ in range(rng.randint(4, 9))) for _ in range(400)]
+    keys = {value: version_key(value) for value in values}
+
+    mismatches = [
+        (a, b)
+        for a in values
+        for b in values[:: 7 if len(values) > 1000 else 1]
+        if _sign(rpmvercmp(a, b)) != (keys[a] > keys[b]) - (keys[a] < keys[b])
+        and not _trailing_zero_ambiguous(a, b)
+    ]
+    assert mismatches == []
+
+
+def test_evr_key_sorts_like_compare_evr() -> None:
+    evrs = [
+        EVR(1, "0.9", "alt1"),
+        EVR(0, "1.0", "alt2"),
+        EVR(0, "1.0~rc1", "alt1"),
+        EVR(0, "1.0", "alt1.p10.1"),
+        EVR(0, "1.0.1", "alt1"),
+    ]
+
+    ordered = sorted(evrs, key=evr_key)
+
+    assert all(compare_evr(x, y) < 0 for x, y in itertools.pairwise(ordered))
+    assert evr_key(EVR(0, "1", "alt1")) == evr_key(EVR(0, "1.0.0", "alt1"))
+
+
+def test_version_cache_memoizes_only_while_active() -> None:
+    cache = VersionCache(maxsize=2)
+
+    with use_version_cache(cache):
+        assert rpmvercmp("1.0", "1.0~rc") == 1
+        assert rpmvercmp("1.0", "1.0~rc") == 1
+        assert version_key("alt1") == version_key("alt1")
+    rpmvercmp("1.0", "1.0~rc")  # outside the block: not recorded
+
+    stats = cache.stats()
+    assert stats["rpmvercmp"] == {"hits": 1, "misses": 1, "size": 1, "maxsize": 2}
+    assert stats["version_key"]["hits"] == 1
+
+    cache.clear()
+    assert cache.stats()["rpmvercmp"]["size"] == 0
+
+
+def test_compare_evr_many_matches_compare_evr() -> None:
+    left = [(0, "1.0", "alt1"), (1, "1.0", "alt1"), (0, "1.0", "alt2"), (0, "2.0", "alt1"), (0, "1.0", "alt2")]
+    right = [(0, "1.0", "alt1"), (0, "9.0", "alt1"), (0, "1.0", "alt10"), (0, "1.10", "alt1"), (0, "1.0", "alt10")]
+
+    with use_version_cache(VersionCache()) as cache:
+        result = compare_evr_many(left, right)
+
+    expected = [compare_evr(EVR(*a), EVR(*b)) for a, b in zip(left, right, strict=True)]
+    assert list(result) == expected == [0, 1, -1, 1, -1]
+    # identical and epoch-settled pairs are skipped; the repeated pair is compared once
+    assert cache.stats()["rpmvercmp"]["misses"] == 3
+
+
+def test_compare_evr_many_rejects_length_mismatch() -> None:
+    with pytest.raises(ValueError):
+        compare_evr_many([(0, "1", "1")], [])